@@ -1,411 +1,3418 @@
 # standard imports
+import argparse
+import base64
+import collections
+import concurrent.futures
+import contextlib
+import contextvars
+import cProfile
 import datetime
+import email.utils
+import functools
+import gzip
+import hashlib
+import hmac
+import http.client
+import http.server
 import io
 import json
+import math
 import os
+import pstats
+import random
 import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from urllib.parse import urlsplit
+from typing import Callable, Iterable, Iterator, List, MutableSequence, Optional, Set, TextIO, Tuple
 
 # lib imports
 from dotenv import load_dotenv
 import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.auth import AuthBase
 
 # global variables
 AVATAR_SIZE = 40
+HTTP_POOL_SIZE = 4
+BATCH_MAX_WORKERS = 8
+WEBHOOK_MAX_WORKERS = 8
+WEBHOOK_TIMEOUT = 30  # seconds
+API_CACHE_MAX_AGE = 7 * 24 * 60 * 60  # seconds
+API_CACHE_MAX_SIZE = 10 * 1024 * 1024  # bytes
+API_MAX_RETRIES = 3
+API_RETRY_BACKOFF = 1  # seconds
+API_RETRY_MAX_WAIT = 60  # seconds
+API_RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+API_TIME_BUDGET = 300  # seconds
+API_HEDGE_DELAY = 2  # seconds, until enough latencies are known
+API_LATENCY_SAMPLES = 100  # latencies of recent GET requests, for the hedge delay
+API_LATENCY_MIN_SAMPLES = 5
+RATE_LIMIT_RESERVE = 10
+OUTPUT_BUFFER_SIZE = 1024 * 1024  # bytes
+RELEASE_INDEX_PAGE_SIZE = 100  # the maximum page size of the releases endpoint
+COMPARE_PAGE_SIZE = 100  # commits per page of the compare endpoint
+PROBE_CHUNK_SIZE = 16 * 1024  # bytes read at a time from a streamed response
+PROBE_OVERLAP = 1024  # bytes of the previous chunk searched again, for fields split between chunks
+PROBE_DRAIN_SIZE = 64 * 1024  # bytes read past the fields, so the connection can be reused
+PROFILE_TOP = 25  # functions and allocation sites listed in the profile report
+CASSETTE_MODES = ('record', 'replay', 'replay_timed')
+PULL_REQUEST_BATCH_SIZE = 50  # pull requests per GraphQL query
+PULL_REQUEST_MAX_LABELS = 20  # labels fetched per pull request
+TRACE_MAX_SPANS = 1000  # spans kept outside of a run
+
+# release notes sections of the changes, by pull request label, in order; other changes come last
+RELEASE_NOTES_GROUPS = (
+    ('Features', frozenset({'enhancement', 'feature', 'feat'})),
+    ('Fixes', frozenset({'bug', 'bugfix', 'fix'})),
+    ('Dependencies', frozenset({'dependencies', 'deps'})),
+)
+RELEASE_NOTES_OTHER_GROUP = 'Other Changes'
+BREAKING_CHANGE_LABELS = frozenset({'breaking', 'breaking change', 'breaking-change'})
+
+# squash and merge commit subject, e.g. "feat: add a feature (#123)"
+RE_SQUASH_SUBJECT = re.compile(r'^(?P<title>.*) \(#(?P<pr_number>\d+)\)$')
+
+# GitHub noreply commit email, e.g. "12345+user@users.noreply.github.com" or "12345+app[bot]@users.noreply.github.com"
+RE_NOREPLY_EMAIL = re.compile(
+    r'^(?:\d+\+)?(?P<username>[a-zA-Z\d\-]{1,39})(?:\[bot])?@users\.noreply\.github\.com$')
+
+# pull request URL in a release notes entry
+RE_PR_URL = re.compile(r'https://github\.com/(?P<repository>[a-zA-Z\d\-]{0,38}/[a-zA-Z\d-]+)/pull/(?P<pr_number>\d+)')
+
+# conventional commit subject of a breaking change in a release notes entry, e.g. "* feat!: remove a feature"
+RE_BREAKING_CHANGE_ENTRY = re.compile(r'^\* [a-z]+(?:\([^)]*\))?!:')
+
+# contributor mentions (" by @user" or "* @user") and PR URLs in the release body
+# the leading lookahead lets the regex engine skip positions that cannot start a token
+RE_RELEASE_BODY_TOKEN = re.compile(
+    r'(?=[ *h])(?:'
+    r'(?P<prefix> by |\* )@(?P<username>[a-zA-Z\d\-]{1,38})'
+    r'|(?P<pr_url>https://github\.com/[a-zA-Z\d\-]{0,38}/[a-zA-Z\d-]+/pull/(?P<pr_number>\d+))'
+    r')'
+)
+
+# query for the repository merge settings, the latest release, and whether a release tag exists
+GRAPHQL_REPO_STATE_QUERY = """
+query($owner: String!, $name: String!, $tagName: String!) {
+  repository(owner: $owner, name: $name) {
+    squashMergeAllowed
+    mergeCommitAllowed
+    rebaseMergeAllowed
+    latestRelease {
+      tagName
+    }
+    release(tagName: $tagName) {
+      id
+    }
+  }
+}
+"""
+
+# fields of the event payload read by the action, the only ones kept by the partial event parse
+GITHUB_EVENT_FIELDS = frozenset({'commits', 'default_branch', 'head', 'pull_request', 'repository', 'sha', 'timestamp'})
+
+# spans recorded by `trace_span` outside of a `ReleasePlanner` run, the most recent ones only, so calls to the module
+# functions in a long-running process do not grow it without bound
+TRACE = collections.deque(maxlen=TRACE_MAX_SPANS)
 
-# Load the environment variables from the Environment File
-load_dotenv()
+# release tag names by repository, loaded by `get_release_index`
+RELEASE_INDEX = {}
+
+# repository state by tag name and repository, loaded by `get_graphql_repo_state`
+GRAPHQL_REPO_STATE = {}
+
+# rate limit budget, updated from the headers of every API response
+RATE_LIMIT = dict(
+    remaining=None,
+    reset=None,
+)
+
+# latencies of recent GET requests, in seconds, used by `get_hedge_delay`
+API_LATENCIES = collections.deque(maxlen=API_LATENCY_SAMPLES)
 
 # root directory of this action
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# Get the repository name from the environment variables
-REPOSITORY_NAME = os.environ["GITHUB_REPOSITORY"]
+# GitHub API URL, unless the runner sets GITHUB_API_URL
+DEFAULT_GITHUB_API_URL = 'https://api.github.com'
 
-# Get the GitHub API token from the environment variables
-GITHUB_API_TOKEN = os.environ["INPUT_GITHUB_TOKEN"]
+# the `ReleasePlanner` active in the current context, see `ReleasePlanner.activate`
+ACTIVE_PLANNER = contextvars.ContextVar('ACTIVE_PLANNER', default=None)
 
-# Define the headers for the GitHub API
-GITHUB_HEADERS = {'Authorization': f'token {GITHUB_API_TOKEN}'}
+# per-run state of the active `ReleasePlanner`: the trace spans, the memos and the API deadline
+ACTIVE_RUN = contextvars.ContextVar('ACTIVE_RUN', default=None)
 
+# the profile recorded by `profile_run` in the current context
+ACTIVE_PROFILE = contextvars.ContextVar('ACTIVE_PROFILE', default=None)
 
-class TimestampUTC:
-    """
-    Timestamp class to handle the timestamp conversion.
 
-    Attributes
-    ----------
-    timestamp : datetime.datetime
-        The timestamp in datetime format.
-    year : int
-        The year of the timestamp.
-    month : str
-        The month of the timestamp, zero-padded.
-    day : str
-        The day of the timestamp, zero-padded.
-    hour : str
-        The hour of the timestamp, zero-padded.
-    minute : str
-        The minute of the timestamp, zero-padded.
-    second : str
-        The second of the timestamp, zero-padded.
+class APITimeBudgetExceeded(requests.exceptions.Timeout):
+    """
+    The API time budget of the run was used up before an API call could be made.
     """
-    def __init__(self, iso_timestamp: str):
-        # use datetime.datetime and convert created at to yyyy.m.d-hhmmss
-        # GitHub can provide timestamps in different formats, ensure we handle them all using `fromisoformat`
-        # timestamp: "2023-01-25T10:43:35Z"
-        # timestamp "2024-07-14T13:17:25-04:00"
-        self.timestamp = datetime.datetime.fromisoformat(iso_timestamp).astimezone(datetime.timezone.utc)
-        self.year = self.timestamp.year
-        self.month = str(self.timestamp.month).zfill(2)
-        self.day = str(self.timestamp.day).zfill(2)
-        self.hour = str(self.timestamp.hour).zfill(2)
-        self.minute = str(self.timestamp.minute).zfill(2)
-        self.second = str(self.timestamp.second).zfill(2)
-
-    def __repr__(self):
-        class_name = type(self).__name__
-        return f"{class_name}(y{self.year}.m{self.month}.d{self.day}.h{self.hour}.m{self.minute}.s{self.second})"
-
-    def __str__(self):
-        return f"{self.year=}, {self.month=}, {self.day=}, {self.hour=}, {self.minute=}, {self.second=}"
 
 
-def append_github_step_summary(message: str):
+class GitHubTokenAuth(AuthBase):
     """
-    Append a message to the GitHub Status Summary.
+    Authenticate GitHub API requests with a token.
 
     Parameters
     ----------
-    message : str
-        The message to append to the GitHub Status Summary. This support markdown.
+    token : Optional[str]
+        The token. If ``None``, ``INPUT_GITHUB_TOKEN`` is read when a request is sent. No ``Authorization`` header is
+        sent if the token is empty.
     """
-    with open(os.path.abspath(os.environ["GITHUB_STEP_SUMMARY"]), "a") as f:
-        f.write(f'{message}\n')
+    def __init__(self, token: Optional[str] = None):
+        self.token = token
 
+    def __call__(self, request: requests.PreparedRequest) -> requests.PreparedRequest:
+        token = os.getenv('INPUT_GITHUB_TOKEN', '') if self.token is None else self.token
+        if token:
+            request.headers['Authorization'] = f'token {token}'
+        return request
 
-def set_github_action_output(output_name: str, output_value: str):
+
+def set_session_pool_size(session: requests.Session, pool_size: int):
     """
-    Set the output value by writing to the outputs in the Environment File, mimicking the behavior defined <here
-    https://docs.github.com/en/actions/using-workflows/workflow-commands-for-github-actions#setting-an-output-parameter>__.
+    Set the number of pooled connections of an HTTP session.
 
     Parameters
     ----------
-    output_name : str
-        Name of the output.
-    output_value : str
-        Value of the output.
+    session : requests.Session
+        The session.
+    pool_size : int
+        Maximum number of connections kept alive per host.
     """
-    with open(os.path.abspath(os.environ["GITHUB_OUTPUT"]), "a") as f:
-        f.write(f'{output_name}<<EOF\n')
-        f.write(output_value)
-        f.write('\nEOF\n')
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
 
 
-def check_release(version: str) -> bool:
+def create_session(token: Optional[str] = None) -> requests.Session:
     """
-    Check if the release exists in the GitHub API.
+    Create an HTTP session for the GitHub API.
 
-    This function will check if the release exists in the GitHub API.
+    The session keeps connections alive and pools them, so consecutive API calls reuse the same TCP/TLS connection
+    instead of performing a new handshake for every request.
 
     Parameters
     ----------
-    version : str
-        Version number of the release.
+    token : Optional[str]
+        GitHub API token. If ``None``, ``INPUT_GITHUB_TOKEN`` is read when a request is sent.
 
     Returns
     -------
-    bool
-        True if the release exists, False otherwise.
+    requests.Session
+        Session authenticated with the token.
     """
-    # Get the release from the GitHub API
-    version_prefix = os.getenv('INPUT_TAG_PREFIX', 'v')
-    github_api_url = f'https://api.github.com/repos/{REPOSITORY_NAME}/releases/tags/{version_prefix}{version}'
-    response = requests.get(github_api_url, headers=GITHUB_HEADERS)
+    session = requests.Session()
+    set_session_pool_size(session=session, pool_size=HTTP_POOL_SIZE)
+    session.auth = GitHubTokenAuth(token=token)
+    return session
 
-    # Check if the release exists
-    if response.status_code == 200:
-        return True
-    else:
-        return False
 
+# session used by every GitHub API call outside of a `ReleasePlanner`
+SESSION = create_session()
 
-def get_github_event() -> dict:
+
+def get_exchange_key(method: str, url: str, body) -> tuple:
     """
-    Get the GitHub event from the environment variables.
+    Get the key that a recorded exchange is replayed for.
+
+    Parameters
+    ----------
+    method : str
+        HTTP method.
+    url : str
+        Full URL of the request, with the query string.
+    body : Optional[Union[bytes, str]]
+        Body of the request.
 
     Returns
     -------
-    dict
-        Dictionary containing the GitHub event.
+    tuple
+        The key.
     """
-    github_event_path = os.environ['GITHUB_EVENT_PATH']
-    with open(github_event_path, 'r') as f:
-        github_event = json.load(f)
-    return github_event
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    return method, url, body or None
 
 
-def get_repo_default_branch() -> str:
+def record_exchange(request: requests.PreparedRequest, response: requests.Response, elapsed: float) -> dict:
     """
-    Get the default branch of the repository from the GitHub event context.
+    Record an API exchange for a cassette.
+
+    The ``Authorization`` header is left out, and the body is stored decoded.
+
+    Parameters
+    ----------
+    request : requests.PreparedRequest
+        The request.
+    response : requests.Response
+        The response, with its content read.
+    elapsed : float
+        Seconds from sending the request to reading the whole response.
 
     Returns
     -------
-    str
-        Default branch of the repository.
+    dict
+        The exchange.
     """
-    # get default branch from event context
-    github_event = get_github_event()
-    return github_event['repository']['default_branch']
+    method, url, request_body = get_exchange_key(method=request.method, url=request.url, body=request.body)
+    exchange = dict(
+        method=method,
+        url=url,
+        request_headers={name: value for name, value in request.headers.items() if name.lower() != 'authorization'},
+        request_body=request_body,
+        status=response.status_code,
+        # the body is stored decoded, with its real length
+        headers={
+            name: value for name, value in response.headers.items()
+            if name.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')
+        },
+        elapsed=round(elapsed, 6),
+    )
+    try:
+        exchange['body'] = response.content.decode('utf-8')
+    except UnicodeDecodeError:
+        exchange['body'] = base64.b64encode(response.content).decode('ascii')
+        exchange['body_encoding'] = 'base64'
+    return exchange
 
 
-def get_repo_squash_and_merge_required() -> bool:
+def build_exchange_response(request: requests.PreparedRequest, exchange: dict) -> requests.Response:
     """
-    Check if squash and merge is required for the repository.
+    Build the response of a recorded exchange.
+
+    Parameters
+    ----------
+    request : requests.PreparedRequest
+        The request being replayed.
+    exchange : dict
+        The exchange, see ``record_exchange``.
 
     Returns
     -------
-    bool
-        True if squash and merge is required, False otherwise.
+    requests.Response
+        The response, with a raw body so it can be streamed.
+    """
+    if exchange.get('body_encoding') == 'base64':
+        content = base64.b64decode(exchange['body'])
+    else:
+        content = exchange['body'].encode('utf-8')
 
-    Raises
-    ------
-    KeyError
-        If the required keys are not found in the GitHub API response.
-        Ensure the token has the `"Metadata" repository permissions (read)` scope.
+    response = requests.Response()
+    response.status_code = exchange['status']
+    response.reason = http.client.responses.get(exchange['status'], '')
+    response.headers = requests.structures.CaseInsensitiveDict(exchange['headers'])
+    response.headers['Content-Length'] = str(len(content))
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.raw = io.BytesIO(content)
+    response.url = request.url
+    response.request = request
+    return response
+
+
+class RecordingAdapter(HTTPAdapter):
     """
-    github_api_url = f'https://api.github.com/repos/{REPOSITORY_NAME}'
-    response = requests.get(url=github_api_url, headers=GITHUB_HEADERS)
-    repo_info = response.json()
+    Transport adapter that sends requests over the network, and records the exchanges.
 
-    try:
-        allow_squash_merge = repo_info['allow_squash_merge']
-        allow_merge_commit = repo_info['allow_merge_commit']
-        allow_rebase_merge = repo_info['allow_rebase_merge']
-    except KeyError:
-        msg = ('::error:: Could not find the required keys in the GitHub API response. '
-               'Ensure the token has the `"Metadata" repository permissions (read)` scope.')
-        print(msg)
-        raise KeyError(msg)
+    Responses are read whole, so that they can be recorded, even for streamed requests.
 
-    if allow_squash_merge and not allow_merge_commit and not allow_rebase_merge:
-        return True
-    else:
-        print('::error:: The repository must have ONLY squash and merge enabled.')
-        print('::warning:: DO NOT re-run this job after changing the repository settings.'
-              'Wait until a new commit is made.')
-        return False
+    Attributes
+    ----------
+    exchanges : list
+        The recorded exchanges, in the order their responses were read.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.exchanges = []
+        self._lock = threading.Lock()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        start = time.perf_counter()
+        response = super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+        response.content
+        exchange = record_exchange(request=request, response=response, elapsed=time.perf_counter() - start)
+        with self._lock:
+            self.exchanges.append(exchange)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Transport adapter that answers requests with recorded exchanges, without the network.
 
+    Exchanges are matched by method, URL and body. Exchanges with the same key are replayed in the order they were
+    recorded, and the last one is repeated once they run out.
 
-def get_push_event_details() -> dict:
+    Parameters
+    ----------
+    exchanges : Iterable[dict]
+        The recorded exchanges, see ``record_exchange``.
+    timed : bool
+        Whether to wait for the recorded latency of each exchange. A request whose read timeout is shorter than the
+        recorded latency times out.
     """
-    Get the details of the GitHub push event from the API.
+    def __init__(self, exchanges: Iterable[dict], timed: bool = False):
+        super().__init__()
+        self.timed = timed
+        self.exchanges = {}
+        for exchange in exchanges:
+            key = get_exchange_key(method=exchange['method'], url=exchange['url'], body=exchange['request_body'])
+            self.exchanges.setdefault(key, []).append(exchange)
+        self.replayed = collections.Counter()
+        self._lock = threading.Lock()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        key = get_exchange_key(method=request.method, url=request.url, body=request.body)
+        with self._lock:
+            exchanges = self.exchanges.get(key)
+            if not exchanges:
+                raise requests.exceptions.ConnectionError(
+                    f'No recorded exchange for {request.method} {request.url}', request=request)
+            exchange = exchanges[min(self.replayed[key], len(exchanges) - 1)]
+            self.replayed[key] += 1
+
+        if self.timed:
+            read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+            if read_timeout is not None and exchange['elapsed'] > read_timeout:
+                time.sleep(read_timeout)
+                raise requests.exceptions.ReadTimeout(
+                    f'Recorded exchange for {request.method} {request.url} took {exchange["elapsed"]:.3f} seconds',
+                    request=request,
+                )
+            time.sleep(exchange['elapsed'])
+
+        return build_exchange_response(request=request, exchange=exchange)
+
+    def close(self):
+        pass
+
+
+def read_cassette(path: str) -> List[dict]:
+    """
+    Read the exchanges of a cassette file.
 
-    This function will get the details of the GitHub push event from the API.
+    Parameters
+    ----------
+    path : str
+        Path of the cassette, a JSON Lines file of exchanges. Files ending in ``.gz`` are gzip compressed.
 
     Returns
     -------
-    dict
-        Dictionary containing the details of the push event.
+    List[dict]
+        The exchanges.
     """
-    # default
-    push_event_details = dict(
-        publish_release=False,
-        release_commit='',
-        release_version='',
-    )
-
-    github_event = get_github_event()
-
-    is_pull_request = True if github_event.get("pull_request") else False
-
-    try:
-        # set sha to the head sha of the pull request
-        github_sha = github_event["pull_request"]["head"]["sha"]
-    except KeyError:
-        # not a pull request event
-        github_sha = os.environ["GITHUB_SHA"]
-    push_event_details['release_commit'] = github_sha
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(os.path.abspath(path), 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
 
-    if is_pull_request:
-        return push_event_details
 
-    # this is a push event
-    # check if squash and merge is required
-    if get_repo_squash_and_merge_required():
-        msg = (":exclamation: ERROR: Squash and merge is not enabled for this repository. "
-               "Please ensure ONLY squash and merge is enabled. "
-               "**DO NOT** re-run this job after changing the repository settings. Wait until a new commit is made.")
-        append_github_step_summary(message=msg)
-        print(f'::error:: {msg}')
-        raise SystemExit(2)
+def write_cassette(path: str, exchanges: Iterable[dict]):
+    """
+    Write exchanges to a cassette file, one compact JSON object per line.
 
-    # ensure there is only 1 commit in the github context
-    if len(github_event["commits"]) != 1:
-        msg = (":exclamation: ERROR: This action only supports a single commit push event. "
-               "Please ensure ONLY squash and merge is enabled. "
-               "**DO NOT** re-run this job after changing the repository settings. Wait until a new commit is made.")
-        append_github_step_summary(message=msg)
-        print(f'::error:: {msg}')
-        raise SystemExit(3)
+    Parameters
+    ----------
+    path : str
+        Path of the cassette. Files ending in ``.gz`` are gzip compressed.
+    exchanges : Iterable[dict]
+        The exchanges, see ``record_exchange``.
+    """
+    path = os.path.abspath(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt', encoding='utf-8') as f:
+        for exchange in exchanges:
+            f.write(json.dumps(exchange, separators=(',', ':')) + '\n')
 
-    # not a pull request, so publish
-    push_event_details['publish_release'] = True
 
-    # get the commit
-    commit_timestamp = github_event["commits"][0]['timestamp']
+@contextlib.contextmanager
+def use_cassette(session: requests.Session, path: str, mode: str = 'replay') -> Iterator[Optional[BaseAdapter]]:
+    """
+    Record the API exchanges of a session to a cassette, or replay them from it.
 
-    ts = TimestampUTC(iso_timestamp=commit_timestamp)
+    Parameters
+    ----------
+    session : requests.Session
+        The session.
+    path : str
+        Path of the cassette, see ``read_cassette``. Nothing is recorded or replayed if empty.
+    mode : str
+        ``record`` to send the requests and write the exchanges to the cassette when the block completes, ``replay``
+        to answer them from the cassette without latency, or ``replay_timed`` to answer them with their recorded
+        latency.
+
+    Yields
+    ------
+    Optional[BaseAdapter]
+        The ``RecordingAdapter`` or ``ReplayAdapter`` mounted on the session, or ``None`` if there is no cassette.
 
-    if os.getenv('INPUT_DOTNET', 'false').lower() == 'true':
-        # dotnet versioning
-        build = f"{ts.hour}{ts.minute}"
-        revision = ts.second
-        release_version = f"{ts.year}.{int(ts.month)}{ts.day}.{int(build)}.{int(revision)}"
+    Raises
+    ------
+    ValueError
+        If the mode is unknown.
+    """
+    if not path:
+        yield None
+        return
+    if mode not in CASSETTE_MODES:
+        raise ValueError(f'Unknown cassette mode {mode!r}, expected one of {", ".join(CASSETTE_MODES)}')
+
+    if mode == 'record':
+        pool_size = getattr(session.get_adapter('https://'), '_pool_maxsize', HTTP_POOL_SIZE)
+        adapter = RecordingAdapter(pool_connections=1, pool_maxsize=pool_size)
     else:
-        # default versioning
-        build = f"{ts.hour}{ts.minute}{ts.second}"
-        release_version = f"{ts.year}.{int(ts.month)}{ts.day}.{int(build)}"
+        adapter = ReplayAdapter(exchanges=read_cassette(path=path), timed=mode == 'replay_timed')
 
-    push_event_details['release_version'] = release_version
-    return push_event_details
+    previous_adapters = dict(session.adapters)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    try:
+        yield adapter
+        # a failed block would leave an incomplete cassette
+        if mode == 'record':
+            write_cassette(path=path, exchanges=adapter.exchanges)
+    finally:
+        session.adapters.clear()
+        session.adapters.update(previous_adapters)
+        adapter.close()
 
 
-def process_release_body(release_body: str) -> str:
+def get_input(name: str, default: str = '') -> str:
     """
-    Process the provided release body.
+    Get the value of an action input.
 
-    Replace contributor mentions and PR numbers with GitHub URLs.
+    Inputs given to the active ``ReleasePlanner`` take precedence over the ``INPUT_*`` environment variables.
 
     Parameters
     ----------
-    release_body : str
-       The release body.
+    name : str
+        Name of the input, e.g. ``tag_prefix``.
+    default : str
+        Value if the input is not set.
 
     Returns
     -------
     str
-       Processed release body.
+        Value of the input.
     """
-    # replace contributor mentions with GitHub profile
-    processed_body = ''
-    contributors = {}
-    re_username = re.compile(r'@([a-zA-Z\d\-]{0,38})')
-    re_pr_url = re.compile(r'(https://github\.com/([a-zA-Z\d\-]{0,38})/([a-zA-Z\d-]+)/pull/(\d+))')
-    for line in io.StringIO(release_body).readlines():
-        split_line = line.rsplit(' by ', 1)
-
-        # find the username
-        username_search = re_username.search(split_line[1] if len(split_line) > 1 else line)
-        if not username_search:
-            processed_body += line
-            continue
-
-        username = username_search.group(1)
-
-        update_pr_url = False
-        username_url = f'https://github.com/{username}'
-        username_url_md = f'[@{username}]({username_url})'
-
-        if username in contributors:
-            contributors[username]['contributions'] += 1
-        else:
-            contributors[username] = {
-                'contributions': 1,
-                'url': username_url,
-            }
-
-        if ' by @' in line:
-            # replace the mention with a GitHub profile URL
-            line = line.replace(f' by @{username}', f' by {username_url_md}')
-            update_pr_url = True
-        if '* @' in line:
-            # replace the mention with a GitHub profile URL
-            line = line.replace(f'* @{username}', f'* {username_url_md}')
-            update_pr_url = True
-        if update_pr_url:
-            pr_search = re_pr_url.search(line)
-            if not pr_search:
-                processed_body += line
-                continue
+    planner = ACTIVE_PLANNER.get()
+    if planner is not None and name in planner.inputs:
+        return planner.inputs[name]
+    return os.getenv(f'INPUT_{name.upper()}', default)
 
-            pr_url = pr_search.group(1)
-            pr_number = pr_search.group(4)
 
-            # replace the pr url with a Markdown link
-            line = line.replace(pr_url, f'[#{pr_number}]({pr_url})')
+def get_repository() -> str:
+    """
+    Get the default repository of API calls.
 
-        processed_body += line
+    Returns
+    -------
+    str
+        Repository of the active ``ReleasePlanner``, or the ``GITHUB_REPOSITORY`` of the workflow run.
+    """
+    planner = ACTIVE_PLANNER.get()
+    if planner is not None:
+        return planner.repository
+    return os.environ['GITHUB_REPOSITORY']
 
-    # add contributors to the release notes
-    if contributors:
-        # sort contributors by contributions count
-        contributors = dict(sorted(contributors.items(), key=lambda item: (-item[1]['contributions'], item[0])))
 
-        processed_body += '\n\n---\n'
-        processed_body += '## Contributors\n'
-        for contributor, details in contributors.items():
-            # add the contributor's avatar
-            # use <img> tag to ensure the image is the correct size as unchanged avatars cannot use the size query
-            processed_body += (
-                f'<a href="{details["url"]}" '
-                'target="_blank" '
-                'rel="external noopener noreferrer" '
-                f'aria-label="GitHub profile of contributor, {contributor}" '
-                '>'
-                f'<img src="{details["url"]}.png?size={AVATAR_SIZE}" '
-                f'width="{AVATAR_SIZE}" '
-                f'height="{AVATAR_SIZE}" '
-                f'alt="{contributor}" '
-                f'title="{contributor}: {details["contributions"]} '
-                f'{"merges" if details["contributions"] > 1 else "merge"}" '
-                '></a>')
-    processed_body += '\n'
+def get_api_url() -> str:
+    """
+    Get the root URL of the GitHub API.
 
-    return processed_body
+    Returns
+    -------
+    str
+        API URL of the active ``ReleasePlanner``, or ``GITHUB_API_URL``, without a trailing slash.
+    """
+    planner = ACTIVE_PLANNER.get()
+    if planner is not None:
+        return planner.api_url
+    return os.getenv('GITHUB_API_URL', DEFAULT_GITHUB_API_URL).rstrip('/')
 
 
-def generate_release_body(tag_name: str, target_commitish: str) -> str:
+def get_default_graphql_url(api_url: str) -> str:
     """
-    Generate the release body, by comparing this SHA to the previous latest release.
+    Get the URL of the GraphQL API that goes with a root URL of the REST API.
 
     Parameters
     ----------
-    tag_name : str
-        Tag name of the release.
-    target_commitish : str
-        The commitish value that determines where the Git tag is created from.
+    api_url : str
+        Root URL of the REST API, without a trailing slash.
 
     Returns
     -------
     str
-        Release body.
+        The GraphQL URL, e.g. ``https://api.github.com/graphql``, or ``https://host/api/graphql`` for the
+        ``https://host/api/v3`` API of GitHub Enterprise Server.
     """
-    # Get the latest release from the GitHub API
-    github_api_url = f'https://api.github.com/repos/{REPOSITORY_NAME}/releases/latest'
-    response = requests.get(github_api_url, headers=GITHUB_HEADERS)
+    return f"{re.sub(r'/v3$', '', api_url)}/graphql"
 
-    # Check if the release exists
-    if not response.status_code == 200:
-        return ''
 
-    latest_release = response.json()
+def get_graphql_url() -> str:
+    """
+    Get the URL of the GitHub GraphQL API.
 
-    # generate release notes
-    github_api_url = f'https://api.github.com/repos/{REPOSITORY_NAME}/releases/generate-notes'
-    data = {
-        'tag_name': tag_name,
+    Returns
+    -------
+    str
+        GraphQL URL of the active ``ReleasePlanner``, or ``GITHUB_GRAPHQL_URL``, or the URL that goes with
+        ``GITHUB_API_URL``.
+    """
+    planner = ACTIVE_PLANNER.get()
+    if planner is not None:
+        return planner.graphql_url
+    return os.getenv('GITHUB_GRAPHQL_URL') or get_default_graphql_url(api_url=get_api_url())
+
+
+def get_session() -> requests.Session:
+    """
+    Get the HTTP session for API calls.
+
+    Returns
+    -------
+    requests.Session
+        Session of the active ``ReleasePlanner``, or the shared ``SESSION``.
+    """
+    planner = ACTIVE_PLANNER.get()
+    if planner is not None:
+        return planner.session
+    return SESSION
+
+
+def get_rate_limit() -> dict:
+    """
+    Get the rate limit budget of the API token in use.
+
+    Returns
+    -------
+    dict
+        Rate limit of the active ``ReleasePlanner``, or the shared ``RATE_LIMIT``.
+    """
+    planner = ACTIVE_PLANNER.get()
+    if planner is not None:
+        return planner.rate_limit
+    return RATE_LIMIT
+
+
+def get_api_latencies() -> collections.deque:
+    """
+    Get the latencies of recent GET requests.
+
+    Returns
+    -------
+    collections.deque
+        Latencies of the active ``ReleasePlanner``, or the shared ``API_LATENCIES``.
+    """
+    planner = ACTIVE_PLANNER.get()
+    if planner is not None:
+        return planner.api_latencies
+    return API_LATENCIES
+
+
+def get_trace() -> MutableSequence[dict]:
+    """
+    Get the list that spans are recorded to.
+
+    Returns
+    -------
+    MutableSequence[dict]
+        Spans of the active ``ReleasePlanner`` run, or the shared ``TRACE``.
+    """
+    run = ACTIVE_RUN.get()
+    if run is not None:
+        return run['trace']
+    return TRACE
+
+
+def get_memo(name: str) -> dict:
+    """
+    Get a memo of API results.
+
+    Inside a ``ReleasePlanner`` run, the memo only lives for the run, so a long-running planner does not return stale
+    results in later runs. Otherwise, the module-level memo lives for the process.
+
+    Parameters
+    ----------
+    name : str
+        Name of the memo, ``release_index`` or ``graphql_repo_state``.
+
+    Returns
+    -------
+    dict
+        The memo.
+    """
+    run = ACTIVE_RUN.get()
+    if run is not None:
+        return run[name]
+    return dict(release_index=RELEASE_INDEX, graphql_repo_state=GRAPHQL_REPO_STATE)[name]
+
+
+def submit_in_context(
+        executor: concurrent.futures.Executor,
+        fn,
+        *args,
+        **kwargs,
+) -> concurrent.futures.Future:
+    """
+    Submit a call to an executor, running it in a copy of the current context.
+
+    Worker threads do not inherit context variables, so this carries the active ``ReleasePlanner`` and its run over.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+        The executor.
+    fn : Callable
+        Function to call.
+    *args
+        Positional arguments of the call.
+    **kwargs
+        Keyword arguments of the call.
+
+    Returns
+    -------
+    concurrent.futures.Future
+        Future of the call.
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class TimestampUTC:
+    """
+    Timestamp class to handle the timestamp conversion.
+
+    Attributes
+    ----------
+    timestamp : datetime.datetime
+        The timestamp in datetime format.
+    year : int
+        The year of the timestamp.
+    month : str
+        The month of the timestamp, zero-padded.
+    day : str
+        The day of the timestamp, zero-padded.
+    hour : str
+        The hour of the timestamp, zero-padded.
+    minute : str
+        The minute of the timestamp, zero-padded.
+    second : str
+        The second of the timestamp, zero-padded.
+    """
+    __slots__ = ('timestamp', 'year', 'month', 'day', 'hour', 'minute', 'second')
+
+    def __init__(self, iso_timestamp: str):
+        # use datetime.datetime and convert created at to yyyy.m.d-hhmmss
+        # GitHub can provide timestamps in different formats, ensure we handle them all using `fromisoformat`
+        # timestamp: "2023-01-25T10:43:35Z"
+        # timestamp "2024-07-14T13:17:25-04:00"
+        self.timestamp = datetime.datetime.fromisoformat(iso_timestamp).astimezone(datetime.timezone.utc)
+        self.year = self.timestamp.year
+        self.month = str(self.timestamp.month).zfill(2)
+        self.day = str(self.timestamp.day).zfill(2)
+        self.hour = str(self.timestamp.hour).zfill(2)
+        self.minute = str(self.timestamp.minute).zfill(2)
+        self.second = str(self.timestamp.second).zfill(2)
+
+    def __repr__(self):
+        class_name = type(self).__name__
+        return f"{class_name}(y{self.year}.m{self.month}.d{self.day}.h{self.hour}.m{self.minute}.s{self.second})"
+
+    def __str__(self):
+        return f"{self.year=}, {self.month=}, {self.day=}, {self.hour=}, {self.minute=}, {self.second=}"
+
+
+def format_release_version(timestamp: TimestampUTC, dotnet: bool = False) -> str:
+    """
+    Format the release version of a commit timestamp.
+
+    Parameters
+    ----------
+    timestamp : TimestampUTC
+        The commit timestamp.
+    dotnet : bool
+        Whether to format a dotnet version (4 components, e.g. ``yyyy.mmdd.hhmm.ss``) instead of the default version
+        (3 components, e.g. ``yyyy.mmdd.hhmmss``).
+
+    Returns
+    -------
+    str
+        The release version. Leading zeros of each component are dropped, except for the day.
+    """
+    if dotnet:
+        build = f"{timestamp.hour}{timestamp.minute}"
+        revision = timestamp.second
+        return f"{timestamp.year}.{int(timestamp.month)}{timestamp.day}.{int(build)}.{int(revision)}"
+
+    build = f"{timestamp.hour}{timestamp.minute}{timestamp.second}"
+    return f"{timestamp.year}.{int(timestamp.month)}{timestamp.day}.{int(build)}"
+
+
+def compute_release_versions(timestamps: Iterable[str]) -> dict:
+    """
+    Compute the release versions of many commit timestamps at once.
+
+    The versions are assembled from the date and the time of day, each formatted once per distinct value. Timestamps
+    in UTC notation (``yyyy-mm-ddThh:mm:ssZ``) are read from the string directly, without ``datetime``. Other
+    timestamps are converted to UTC with ``datetime`` first.
+
+    Both version schemes have a resolution of one second, so commits made in the same second get the same version.
+    These collisions are reported.
+
+    Parameters
+    ----------
+    timestamps : Iterable[str]
+        ISO 8601 commit timestamps.
+
+    Returns
+    -------
+    dict
+        Dictionary with the keys ``versions`` and ``dotnet_versions``, lists of the versions in the order of the
+        timestamps, and ``collisions``, the indices of the timestamps that share a version, by version.
+    """
+    versions = []
+    dotnet_versions = []
+    first_indices = {}
+    collisions = {}
+    dates = {}
+    times = {}
+
+    for index, iso_timestamp in enumerate(timestamps):
+        if len(iso_timestamp) == 20 and iso_timestamp[-1] == 'Z':
+            # UTC notation, e.g. "2023-01-25T10:43:35Z"
+            date_key = iso_timestamp[:10]
+            time_key = iso_timestamp[11:19]
+            date = dates.get(date_key)
+            if date is None:
+                date = dates[date_key] = f'{int(date_key[:4])}.{int(date_key[5:7])}{date_key[8:10]}'
+            time_of_day = times.get(time_key)
+            if time_of_day is None:
+                time_of_day = times[time_key] = (
+                    f'.{int(time_key[:2] + time_key[3:5] + time_key[6:8])}',
+                    f'.{int(time_key[:2] + time_key[3:5])}.{int(time_key[6:8])}',
+                )
+        else:
+            # UTC offset notation, e.g. "2024-07-14T13:17:25-04:00"
+            utc = datetime.datetime.fromisoformat(iso_timestamp).astimezone(datetime.timezone.utc)
+            date_key = (utc.year, utc.month, utc.day)
+            time_key = (utc.hour, utc.minute, utc.second)
+            date = dates.get(date_key)
+            if date is None:
+                date = dates[date_key] = f'{utc.year}.{utc.month}{utc.day:02d}'
+            time_of_day = times.get(time_key)
+            if time_of_day is None:
+                time_of_day = times[time_key] = (
+                    f'.{utc.hour * 10000 + utc.minute * 100 + utc.second}',
+                    f'.{utc.hour * 100 + utc.minute}.{utc.second}',
+                )
+
+        version = date + time_of_day[0]
+        versions.append(version)
+        dotnet_versions.append(date + time_of_day[1])
+
+        first_index = first_indices.setdefault(version, index)
+        if first_index != index:
+            collisions.setdefault(version, [first_index]).append(index)
+
+    return dict(
+        versions=versions,
+        dotnet_versions=dotnet_versions,
+        collisions=collisions,
+    )
+
+
+def append_github_step_summary(message: str):
+    """
+    Append a message to the GitHub Status Summary.
+
+    Parameters
+    ----------
+    message : str
+        The message to append to the GitHub Status Summary. This support markdown.
+    """
+    if not os.getenv("GITHUB_STEP_SUMMARY"):
+        # not running in a workflow step, e.g. in batch mode
+        return
+
+    with open(os.path.abspath(os.environ["GITHUB_STEP_SUMMARY"]), "a") as f:
+        f.write(f'{message}\n')
+
+
+def get_heredoc_delimiter(value: str) -> str:
+    """
+    Get a random heredoc delimiter that does not occur in the value.
+
+    Parameters
+    ----------
+    value : str
+        The value to delimit.
+
+    Returns
+    -------
+    str
+        The delimiter.
+    """
+    while True:
+        delimiter = f'ghadelimiter_{uuid.uuid4()}'
+        if delimiter not in value:
+            return delimiter
+
+
+def format_github_action_output(output_name: str, output_value: str) -> List[str]:
+    """
+    Format an output for the outputs Environment File, using a random heredoc delimiter.
+
+    Parameters
+    ----------
+    output_name : str
+        Name of the output.
+    output_value : str
+        Value of the output.
+
+    Returns
+    -------
+    List[str]
+        Chunks to write. The value is not copied, so large values are streamed as is.
+    """
+    delimiter = get_heredoc_delimiter(value=output_value)
+    return [f'{output_name}<<{delimiter}\n', output_value, f'\n{delimiter}\n']
+
+
+def set_github_action_output(output_name: str, output_value: str):
+    """
+    Set the output value by writing to the outputs in the Environment File, mimicking the behavior defined <here
+    https://docs.github.com/en/actions/using-workflows/workflow-commands-for-github-actions#setting-an-output-parameter>__.
+
+    Parameters
+    ----------
+    output_name : str
+        Name of the output.
+    output_value : str
+        Value of the output.
+    """
+    with open(os.path.abspath(os.environ["GITHUB_OUTPUT"]), "a") as f:
+        f.writelines(format_github_action_output(output_name=output_name, output_value=output_value))
+
+
+class GitHubFileWriter:
+    """
+    Collect job outputs and step summary messages, and write them with one buffered write per file.
+
+    Writing everything at the end keeps the number of file operations on the runner's file system low, and an
+    interrupted run does not leave a partial set of outputs behind.
+
+    Attributes
+    ----------
+    outputs : List[str]
+        Chunks for the outputs Environment File.
+    summary : List[str]
+        Chunks for the step summary.
+    """
+    def __init__(self):
+        self.outputs = []
+        self.summary = []
+
+    def set_output(self, output_name: str, output_value: str):
+        """
+        Add an output.
+
+        Parameters
+        ----------
+        output_name : str
+            Name of the output.
+        output_value : str
+            Value of the output.
+        """
+        self.outputs.extend(format_github_action_output(output_name=output_name, output_value=output_value))
+
+    def append_summary(self, message: str):
+        """
+        Add a message to the step summary.
+
+        Parameters
+        ----------
+        message : str
+            The message to append to the GitHub Status Summary. This support markdown.
+        """
+        self.summary.extend((message, '\n'))
+
+    def flush(self):
+        """
+        Write the collected outputs and summary messages, and clear them.
+
+        Files whose environment variable is not set are skipped, e.g. when running outside a workflow step.
+        """
+        for env_var, chunks in (('GITHUB_OUTPUT', self.outputs), ('GITHUB_STEP_SUMMARY', self.summary)):
+            if not chunks:
+                continue
+            if not os.getenv(env_var):
+                chunks.clear()
+                continue
+            with open(os.path.abspath(os.environ[env_var]), "a", buffering=OUTPUT_BUFFER_SIZE) as f:
+                f.writelines(chunks)
+            chunks.clear()
+
+
+def get_api_cache_dir() -> str:
+    """
+    Get the directory of the on-disk API response cache.
+
+    Returns
+    -------
+    str
+        Absolute path of the cache directory, or an empty string if the cache is disabled.
+    """
+    cache_dir = get_input('api_cache_dir', '')
+    return os.path.abspath(cache_dir) if cache_dir else ''
+
+
+def get_api_cache_path(cache_dir: str, url: str) -> str:
+    """
+    Get the path of the cache entry for a URL.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the API response cache.
+    url : str
+        Full URL of the request.
+
+    Returns
+    -------
+    str
+        Path of the cache entry.
+    """
+    return os.path.join(cache_dir, f'{hashlib.sha256(url.encode("utf-8")).hexdigest()}.json')
+
+
+def read_api_cache(cache_dir: str, url: str) -> Optional[dict]:
+    """
+    Read the cache entry for a URL.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the API response cache.
+    url : str
+        Full URL of the request.
+
+    Returns
+    -------
+    Optional[dict]
+        The cache entry, or ``None`` if there is no usable entry.
+    """
+    try:
+        with open(get_api_cache_path(cache_dir=cache_dir, url=url), 'r') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if entry.get('url') != url:
+        return None
+    return entry
+
+
+def write_cache_file(cache_dir: str, path: str, data: dict):
+    """
+    Write a JSON file to the cache directory.
+
+    The file is written to a temporary file first and then moved into place, so concurrent readers never see a
+    partially written file.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the API response cache.
+    path : str
+        Path of the file, inside the cache directory.
+    data : dict
+        Data to write.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def write_api_cache(cache_dir: str, url: str, response: requests.Response, content: Optional[str] = None):
+    """
+    Store a response in the cache, if it carries a validator (``ETag`` or ``Last-Modified``).
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the API response cache.
+    url : str
+        Full URL of the request.
+    response : requests.Response
+        Response to store.
+    content : Optional[str]
+        Content to store instead of the response body, e.g. the fields read from a streamed response.
+    """
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if not etag and not last_modified:
+        return
+
+    entry = dict(
+        url=url,
+        etag=etag,
+        last_modified=last_modified,
+        content=response.text if content is None else content,
+    )
+
+    write_cache_file(cache_dir=cache_dir, path=get_api_cache_path(cache_dir=cache_dir, url=url), data=entry)
+
+    prune_api_cache(cache_dir=cache_dir)
+
+
+def prune_api_cache(cache_dir: str):
+    """
+    Evict old entries from the API response cache.
+
+    Entries not used for longer than ``INPUT_API_CACHE_MAX_AGE`` seconds are removed. Afterward, the least recently
+    used entries are removed until the cache is no larger than ``INPUT_API_CACHE_MAX_SIZE`` bytes. Runs that share the
+    cache directory may prune it at the same time, so entries that are already gone are skipped.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the API response cache.
+    """
+    max_age = int(get_input('api_cache_max_age', str(API_CACHE_MAX_AGE)))
+    max_size = int(get_input('api_cache_max_size', str(API_CACHE_MAX_SIZE)))
+    now = time.time()
+
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        if now - stat.st_mtime > max_age:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(entry.path)
+        else:
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    # least recently used first
+    entries.sort()
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total_size <= max_size:
+            break
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        total_size -= size
+
+
+def load_cached_response(entry: dict) -> requests.Response:
+    """
+    Build a response object from a cache entry.
+
+    Parameters
+    ----------
+    entry : dict
+        The cache entry.
+
+    Returns
+    -------
+    requests.Response
+        Response with the cached content and a status code of 200.
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response.url = entry['url']
+    response.encoding = 'utf-8'
+    response._content = entry['content'].encode('utf-8')
+    response._content_consumed = True
+    return response
+
+
+@contextlib.contextmanager
+def trace_span(name: str, **attributes) -> Iterator[dict]:
+    """
+    Record the duration of a block as a span, see ``get_trace``.
+
+    Parameters
+    ----------
+    name : str
+        Name of the span.
+    **attributes
+        Additional attributes of the span.
+
+    Yields
+    ------
+    dict
+        The span, attributes can be added to it inside the block.
+    """
+    span = dict(name=name, start=time.time(), **attributes)
+    start = time.perf_counter()
+    try:
+        yield span
+    finally:
+        span['duration'] = time.perf_counter() - start
+        get_trace().append(span)
+
+
+def traced(func):
+    """
+    Decorate a function to record each call as a span.
+
+    Parameters
+    ----------
+    func : callable
+        The function to trace.
+
+    Returns
+    -------
+    callable
+        The decorated function.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with trace_span(name=func.__name__):
+            result = func(*args, **kwargs)
+        profile = ACTIVE_PROFILE.get()
+        if profile is not None and 'memory' in profile['modes']:
+            record_memory_snapshot(profile=profile, stage=func.__name__)
+        return result
+    return wrapper
+
+
+def format_trace_summary(spans: List[dict]) -> str:
+    """
+    Format spans as a compact Markdown timing table for the step summary.
+
+    Parameters
+    ----------
+    spans : List[dict]
+        The spans.
+
+    Returns
+    -------
+    str
+        The timing table, in a collapsed section.
+    """
+    lines = [
+        '<details><summary>Timing</summary>',
+        '',
+        '| Span | Status | Duration (ms) | Bytes | Rate limit remaining |',
+        '|------|--------|---------------|-------|----------------------|',
+    ]
+    for span in sorted(spans, key=lambda item: item['start']):
+        name = f'{span["method"]} {span["endpoint"]}' if span['name'] == 'api' else span['name']
+        lines.append(f'| {name} | {span.get("status", "")} | {span["duration"] * 1000:.1f} | '
+                     f'{span.get("bytes", "")} | {span.get("rate_limit_remaining", "")} |')
+    lines.extend(('', '</details>'))
+    return '\n'.join(lines)
+
+
+def write_trace_file(path: str, spans: List[dict]):
+    """
+    Write spans to a JSON trace file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the trace file.
+    spans : List[dict]
+        The spans.
+    """
+    with open(os.path.abspath(path), 'w') as f:
+        json.dump(dict(spans=sorted(spans, key=lambda item: item['start'])), f, indent=2)
+
+
+def get_profile_modes() -> Set[str]:
+    """
+    Get what to profile.
+
+    Returns
+    -------
+    Set[str]
+        ``cpu`` and/or ``memory``, from ``INPUT_PROFILE`` (``cpu``, ``memory`` or ``both``). Empty if profiling is off.
+    """
+    mode = get_input('profile', '').lower()
+    return dict(cpu={'cpu'}, memory={'memory'}, both={'cpu', 'memory'}).get(mode, set())
+
+
+def record_memory_snapshot(profile: dict, stage: str):
+    """
+    Keep a snapshot of the traced memory at the end of a stage, if more memory is in use than at the end of any
+    earlier stage.
+
+    Parameters
+    ----------
+    profile : dict
+        The profile, see ``profile_run``.
+    stage : str
+        Name of the stage that ended.
+    """
+    size = tracemalloc.get_traced_memory()[0]
+    with profile['lock']:
+        if size > profile['memory_size']:
+            profile['memory_size'] = size
+            profile['memory_stage'] = stage
+            profile['memory_snapshot'] = tracemalloc.take_snapshot()
+
+
+@contextlib.contextmanager
+def profile_run(modes: Set[str]) -> Iterator[dict]:
+    """
+    Profile a block with ``cProfile`` and/or ``tracemalloc``.
+
+    The CPU profile covers the threads started in the block too, e.g. the workers of the concurrent API calls and of
+    the hedged requests. Since Python 3.12, a profiler covers every thread. Before, each new thread gets a profiler of
+    its own, and their statistics are merged when the block exits.
+
+    With memory profiling, the traced stages (see ``traced``) keep a snapshot of the allocations of the stage that
+    ends with the most memory in use, so the allocation sites of a spike can be found after the memory was freed.
+
+    Parameters
+    ----------
+    modes : Set[str]
+        What to profile, see ``get_profile_modes``. Nothing is profiled if empty.
+
+    Yields
+    ------
+    dict
+        The profile, filled in when the block exits, see ``format_profile_report``.
+    """
+    profile = dict(modes=set(modes), lock=threading.Lock(), memory_size=-1, memory_stage='', memory_snapshot=None)
+    if not modes:
+        yield profile
+        return
+
+    profiler = cProfile.Profile() if 'cpu' in modes else None
+    thread_profilers = []
+
+    def profile_thread(frame, event, arg):
+        # called on the first event of a new thread, the thread profiler then replaces this function
+        thread_profiler = cProfile.Profile()
+        with profile['lock']:
+            thread_profilers.append(thread_profiler)
+        thread_profiler.enable()
+
+    profile_threads = profiler is not None and sys.version_info < (3, 12)
+    start_tracing = 'memory' in modes and not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+    if 'memory' in modes:
+        tracemalloc.reset_peak()
+    token = ACTIVE_PROFILE.set(profile)
+    if profile_threads:
+        threading.setprofile(profile_thread)
+    if profiler:
+        profiler.enable()
+    try:
+        yield profile
+    finally:
+        if profiler:
+            profiler.disable()
+            profile['cpu_stats'] = pstats.Stats(profiler)
+        if profile_threads:
+            threading.setprofile(None)
+            with profile['lock']:
+                for thread_profiler in thread_profilers:
+                    profile['cpu_stats'].add(thread_profiler)
+        ACTIVE_PROFILE.reset(token)
+        if 'memory' in modes:
+            profile['memory_peak'] = tracemalloc.get_traced_memory()[1]
+            if start_tracing:
+                tracemalloc.stop()
+
+
+def format_profile_location(filename: str, lineno: int) -> str:
+    """
+    Format a source location compactly, with the file name only.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the source file.
+    lineno : int
+        Line number.
+
+    Returns
+    -------
+    str
+        The location, e.g. ``main.py:42``.
+    """
+    return f'{os.path.basename(filename)}:{lineno}'
+
+
+def format_profile_report(profile: dict) -> str:
+    """
+    Format a profile as Markdown tables of the CPU hotspots and the largest allocations, in collapsed sections.
+
+    Parameters
+    ----------
+    profile : dict
+        The profile, see ``profile_run``.
+
+    Returns
+    -------
+    str
+        The report, or an empty string if nothing was profiled.
+    """
+    lines = []
+    if 'cpu_stats' in profile:
+        stats = profile['cpu_stats'].stats
+        lines.extend((
+            '<details><summary>CPU profile</summary>',
+            '',
+            '| Function | Calls | Own time (ms) | Total time (ms) |',
+            '|----------|-------|---------------|-----------------|',
+        ))
+        hotspots = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:PROFILE_TOP]
+        for (filename, lineno, function_name), (_, calls, own_time, total_time, _) in hotspots:
+            if filename == '~':
+                # built-in functions have no source location
+                name = function_name
+            else:
+                name = f'{format_profile_location(filename=filename, lineno=lineno)}({function_name})'
+            lines.append(f'| {name} | {calls} | {own_time * 1000:.1f} | {total_time * 1000:.1f} |')
+        lines.extend(('', '</details>'))
+
+    if 'memory_peak' in profile:
+        lines.extend((
+            '<details><summary>Memory profile</summary>',
+            '',
+            f'Peak traced memory: {profile["memory_peak"] / 1024:.1f} KiB',
+        ))
+        if profile['memory_snapshot'] is not None:
+            lines.extend((
+                '',
+                f'Largest allocations in use at the end of `{profile["memory_stage"]}`:',
+                '',
+                '| Allocation site | Size (KiB) | Blocks |',
+                '|-----------------|------------|--------|',
+            ))
+            for statistic in profile['memory_snapshot'].statistics('lineno')[:PROFILE_TOP]:
+                frame = statistic.traceback[0]
+                location = format_profile_location(filename=frame.filename, lineno=frame.lineno)
+                lines.append(f'| {location} | {statistic.size / 1024:.1f} | {statistic.count} |')
+        lines.extend(('', '</details>'))
+
+    return '\n'.join(lines)
+
+
+def update_rate_limit(response: requests.Response):
+    """
+    Update the rate limit budget from the headers of an API response.
+
+    Parameters
+    ----------
+    response : requests.Response
+        The API response.
+    """
+    rate_limit = get_rate_limit()
+    remaining = response.headers.get('X-RateLimit-Remaining')
+    reset = response.headers.get('X-RateLimit-Reset')
+    if remaining is not None:
+        rate_limit['remaining'] = int(remaining)
+    if reset is not None:
+        rate_limit['reset'] = int(reset)
+
+
+def rate_limit_exhausted() -> bool:
+    """
+    Check if the rate limit budget is nearly used up.
+
+    Returns
+    -------
+    bool
+        True if fewer than ``INPUT_RATE_LIMIT_RESERVE`` requests remain, False otherwise.
+    """
+    remaining = get_rate_limit()['remaining']
+    if remaining is None:
+        return False
+    return remaining < int(get_input('rate_limit_reserve', str(RATE_LIMIT_RESERVE)))
+
+
+def get_api_time_budget() -> float:
+    """
+    Get the time budget of the API calls of a run.
+
+    Returns
+    -------
+    float
+        Budget in seconds, from ``INPUT_API_TIME_BUDGET``. ``0`` means no budget.
+    """
+    return float(get_input('api_time_budget', str(API_TIME_BUDGET)))
+
+
+def get_api_time_left() -> Optional[float]:
+    """
+    Get the time left before the API deadline of the active ``ReleasePlanner`` run.
+
+    Returns
+    -------
+    Optional[float]
+        Time left in seconds, or ``None`` if there is no deadline.
+    """
+    run = ACTIVE_RUN.get()
+    if run is None or run['deadline'] is None:
+        return None
+    return run['deadline'] - time.monotonic()
+
+
+def get_api_timeout() -> Optional[float]:
+    """
+    Get the timeout of the next API call.
+
+    Inside a ``ReleasePlanner`` run, the time budget is a deadline shared by all the API calls of the run, and each call
+    may use the time left. Otherwise, each call may use the whole budget.
+
+    Returns
+    -------
+    Optional[float]
+        Timeout in seconds, or ``None`` if there is no time budget.
+
+    Raises
+    ------
+    APITimeBudgetExceeded
+        If the run has no time left.
+    """
+    time_left = get_api_time_left()
+    if time_left is None:
+        return get_api_time_budget() or None
+    if time_left <= 0:
+        raise APITimeBudgetExceeded(f'API time budget of {get_api_time_budget():g} seconds exceeded')
+    return time_left
+
+
+def get_hedge_delay() -> Optional[float]:
+    """
+    Get the delay before a GET request is hedged with a second request.
+
+    The delay is the ``INPUT_API_HEDGE_PERCENTILE`` percentile of the latencies of recent GET requests, or
+    ``API_HEDGE_DELAY`` until a few latencies are known.
+
+    Returns
+    -------
+    Optional[float]
+        Delay in seconds, or ``None`` if hedging is disabled.
+    """
+    percentile = float(get_input('api_hedge_percentile', '0'))
+    if not percentile:
+        return None
+    latencies = sorted(get_api_latencies())
+    if len(latencies) < API_LATENCY_MIN_SAMPLES:
+        return API_HEDGE_DELAY
+    return latencies[min(len(latencies), max(1, math.ceil(percentile / 100 * len(latencies)))) - 1]
+
+
+def close_response_future(future: concurrent.futures.Future):
+    """
+    Close the response of a finished request future, releasing its connection.
+
+    Parameters
+    ----------
+    future : concurrent.futures.Future
+        The future, finished.
+    """
+    if future.exception() is None:
+        future.result().close()
+
+
+def send_hedged_request(method: str, url: str, delay: float, **kwargs) -> Tuple[requests.Response, bool]:
+    """
+    Send an idempotent request, and the same request again if the first one has no response after a delay.
+
+    The first response wins. The other request is left to finish in the background, and its response is closed.
+
+    Parameters
+    ----------
+    method : str
+        HTTP method, ``GET`` or ``HEAD``.
+    url : str
+        Full URL of the request.
+    delay : float
+        Delay in seconds before the second request.
+    **kwargs
+        Additional keyword arguments passed to ``requests.Session.request``.
+
+    Returns
+    -------
+    Tuple[requests.Response, bool]
+        The response, and whether the second request was sent.
+
+    Raises
+    ------
+    requests.exceptions.RequestException
+        If every request failed.
+    """
+    session = get_session()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    try:
+        futures = [executor.submit(session.request, method=method, url=url, **kwargs)]
+        done, _ = concurrent.futures.wait(futures, timeout=delay)
+        if not done:
+            futures.append(executor.submit(session.request, method=method, url=url, **kwargs))
+
+        pending = set(futures)
+        while True:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            winner = next((future for future in futures if future in done and future.exception() is None), None)
+            if winner is not None:
+                for future in futures:
+                    if future is not winner:
+                        future.add_done_callback(close_response_future)
+                return winner.result(), len(futures) > 1
+            if not pending:
+                raise futures[-1].exception()
+    finally:
+        executor.shutdown(wait=False)
+
+
+def parse_retry_after(value: str) -> Optional[float]:
+    """
+    Parse a ``Retry-After`` header.
+
+    Parameters
+    ----------
+    value : str
+        Value of the header, a number of seconds or an HTTP date.
+
+    Returns
+    -------
+    Optional[float]
+        Delay in seconds, or ``None`` if the value is invalid.
+    """
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (retry_at - datetime.datetime.now(tz=datetime.timezone.utc)).total_seconds())
+
+
+def get_retry_delay(response: Optional[requests.Response], attempt: int) -> Optional[float]:
+    """
+    Get the delay before retrying a request.
+
+    ``Retry-After`` (in seconds or as an HTTP date) and ``X-RateLimit-Reset`` headers are honored, otherwise a
+    jittered exponential backoff is used.
+
+    Parameters
+    ----------
+    response : Optional[requests.Response]
+        The API response, or ``None`` if the request failed with a connection error.
+    attempt : int
+        Number of the failed attempt, starting at 0.
+
+    Returns
+    -------
+    Optional[float]
+        Delay in seconds, or ``None`` if the request should not be retried.
+    """
+    if response is not None:
+        rate_limited = response.status_code in (403, 429) and (
+            response.headers.get('X-RateLimit-Remaining') == '0' or
+            'Retry-After' in response.headers or
+            'secondary rate limit' in response.text.lower()
+        )
+        if not rate_limited and response.status_code not in API_RETRY_STATUS_CODES:
+            return None
+
+        retry_after = parse_retry_after(value=response.headers.get('Retry-After', ''))
+        if retry_after is not None:
+            return retry_after
+        if response.headers.get('X-RateLimit-Remaining') == '0' and 'X-RateLimit-Reset' in response.headers:
+            return max(0.0, int(response.headers['X-RateLimit-Reset']) - time.time())
+
+    return random.uniform(0, API_RETRY_BACKOFF * 2 ** attempt)
+
+
+def send_api_request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Send a request using the session of ``get_session``, retrying on rate limits, server errors and connection errors.
+
+    Every attempt is limited by the API time budget, see ``get_api_timeout``. If ``INPUT_API_HEDGE_PERCENTILE`` is set,
+    ``GET`` and ``HEAD`` requests are hedged, see ``send_hedged_request``.
+
+    Parameters
+    ----------
+    method : str
+        HTTP method.
+    url : str
+        Full URL of the request.
+    **kwargs
+        Additional keyword arguments passed to ``requests.Session.request``.
+
+    Returns
+    -------
+    requests.Response
+        The API response of the last attempt.
+
+    Raises
+    ------
+    requests.exceptions.ConnectionError
+        If the last attempt failed with a connection error.
+    requests.exceptions.Timeout
+        If the last attempt timed out.
+    APITimeBudgetExceeded
+        If the API time budget of the run is used up.
+    """
+    max_retries = int(get_input('api_max_retries', str(API_MAX_RETRIES)))
+    hedge_delay = get_hedge_delay() if method in ('GET', 'HEAD') else None
+    attempt = 0
+    while True:
+        request_kwargs = dict(kwargs)
+        timeout = get_api_timeout()
+        if timeout is not None:
+            request_kwargs.setdefault('timeout', timeout)
+
+        with trace_span(name='api', method=method, endpoint=urlsplit(url).path, attempt=attempt) as span:
+            try:
+                if hedge_delay is None:
+                    response = get_session().request(method=method, url=url, **request_kwargs)
+                else:
+                    response, span['hedged'] = send_hedged_request(
+                        method=method, url=url, delay=hedge_delay, **request_kwargs)
+                    get_api_latencies().append(response.elapsed.total_seconds())
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                span['status'] = type(e).__name__
+                if attempt >= max_retries:
+                    raise
+                response = None
+            else:
+                update_rate_limit(response=response)
+                content = None if kwargs.get('stream') else response.content
+                span['status'] = response.status_code
+                span['bytes'] = len(content) if isinstance(content, bytes) else response.headers.get('Content-Length')
+                span['rate_limit_remaining'] = get_rate_limit()['remaining']
+
+        delay = get_retry_delay(response=response, attempt=attempt) if attempt < max_retries else None
+        if delay is None or delay > API_RETRY_MAX_WAIT:
+            return response
+        time_left = get_api_time_left()
+        if time_left is not None and delay >= time_left:
+            if response is None:
+                raise APITimeBudgetExceeded(f'API time budget exceeded before {method} {url} could be retried')
+            return response
+
+        print(f'::debug::Retrying {method} {url} in {delay:.1f} seconds')
+        time.sleep(delay)
+        attempt += 1
+
+
+def github_api_request(
+        method: str,
+        endpoint: str,
+        cache: bool = False,
+        essential: bool = True,
+        **kwargs,
+) -> Optional[requests.Response]:
+    """
+    Make a request to the GitHub API.
+
+    Parameters
+    ----------
+    method : str
+        HTTP method, e.g. ``GET`` or ``POST``.
+    endpoint : str
+        API endpoint, relative to the API root, e.g. ``/repos/{owner}/{repo}``. ``/graphql`` is the GraphQL API, see
+        ``get_graphql_url``.
+    cache : bool
+        Whether to use the on-disk response cache for this request. Cached responses are revalidated with a
+        conditional request, which does not count against the rate limit if the response is ``304 Not Modified``.
+        Only applies to ``GET`` requests, and only if ``INPUT_API_CACHE_DIR`` is set.
+    essential : bool
+        Whether the action requires this request. Non-essential requests are deferred when the rate limit budget is
+        nearly used up.
+    **kwargs
+        Additional keyword arguments passed to ``requests.Session.request``.
+
+    Returns
+    -------
+    Optional[requests.Response]
+        The API response, or ``None`` if a non-essential request was deferred.
+    """
+    url = get_graphql_url() if endpoint == '/graphql' else f'{get_api_url()}{endpoint}'
+    if not essential and rate_limit_exhausted():
+        print(f'::warning:: Rate limit nearly exhausted, skipping {method} {url}')
+        return None
+
+    cache_dir = get_api_cache_dir() if cache and method == 'GET' else ''
+    if not cache_dir:
+        return send_api_request(method=method, url=url, **kwargs)
+
+    entry = read_api_cache(cache_dir=cache_dir, url=url)
+    if entry:
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        kwargs['headers'] = headers
+
+    response = send_api_request(method=method, url=url, **kwargs)
+
+    if response.status_code == 304 and entry:
+        response.close()
+        # mark the entry as recently used, unless a concurrent run pruned it already
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(get_api_cache_path(cache_dir=cache_dir, url=url))
+        return load_cached_response(entry=entry)
+    # a streamed body is not read here, see `get_api_fields`
+    if response.status_code == 200 and not kwargs.get('stream'):
+        write_api_cache(cache_dir=cache_dir, url=url, response=response)
+    return response
+
+
+def read_json_fields(response: requests.Response, fields: Iterable[str]) -> dict:
+    """
+    Read fields of a JSON object from a streamed response, without reading or decoding the rest of the response.
+
+    Fields are matched by key anywhere in the document, so this is only meant for keys that no nested object has
+    before the top-level key, like the ``tag_name`` of a release, which comes before its assets and body. If the
+    fields are not all found this way, the whole document is decoded.
+
+    Parameters
+    ----------
+    response : requests.Response
+        The response, requested with ``stream=True``.
+    fields : Iterable[str]
+        Keys of the fields to read.
+
+    Returns
+    -------
+    dict
+        Values by key of the fields found.
+    """
+    fields = set(fields)
+    pattern = re.compile(
+        rb'"(?P<key>' + b'|'.join(re.escape(field.encode('utf-8')) for field in sorted(fields)) + rb')"\s*:\s*'
+        rb'(?P<value>"(?:[^"\\]|\\.)*"|[-\w.+]+(?=\s*[,}\]]))'
+    )
+    values = {}
+    buffer = bytearray()
+    position = 0
+    chunks = response.iter_content(chunk_size=PROBE_CHUNK_SIZE)
+    for chunk in chunks:
+        buffer += chunk
+        for match in pattern.finditer(buffer, position):
+            values.setdefault(match.group('key').decode('utf-8'), json.loads(match.group('value')))
+            position = match.end()
+        if values.keys() >= fields:
+            break
+        position = max(position, len(buffer) - PROBE_OVERLAP)
+    else:
+        # e.g. a value longer than the overlap was split between chunks
+        document = json.loads(buffer) if buffer else {}
+        return {key: document[key] for key in fields if key in document} if isinstance(document, dict) else {}
+
+    # a response that ends shortly after the fields is read to the end, so its connection goes back to the pool
+    drained = 0
+    for chunk in chunks:
+        drained += len(chunk)
+        if drained > PROBE_DRAIN_SIZE:
+            break
+    return values
+
+
+def get_api_fields(
+        endpoint: str,
+        fields: Iterable[str],
+        cache: bool = False,
+        essential: bool = True,
+) -> Optional[dict]:
+    """
+    Read only some fields of a GitHub API object, from a streamed response.
+
+    Large objects, e.g. releases with many assets, are not downloaded or decoded past the fields. Cached responses only
+    store the fields.
+
+    Parameters
+    ----------
+    endpoint : str
+        API endpoint, relative to the API root, e.g. ``/repos/{owner}/{repo}/releases/latest``.
+    fields : Iterable[str]
+        Keys of the fields to read, see ``read_json_fields``.
+    cache : bool
+        Whether to use the on-disk response cache for this request, see ``github_api_request``.
+    essential : bool
+        Whether the action requires this request, see ``github_api_request``.
+
+    Returns
+    -------
+    Optional[dict]
+        Values by key of the fields found, or ``None`` if the request was deferred or did not succeed.
+    """
+    response = github_api_request('GET', endpoint, cache=cache, essential=essential, stream=True)
+    if response is None:
+        return None
+    try:
+        if response.status_code != 200:
+            # error responses are small, read them so the connection can be reused
+            response.content
+            return None
+        values = read_json_fields(response=response, fields=fields)
+    finally:
+        response.close()
+
+    cache_dir = get_api_cache_dir() if cache else ''
+    if cache_dir:
+        write_api_cache(
+            cache_dir=cache_dir, url=f'{get_api_url()}{endpoint}', response=response, content=json.dumps(values))
+    return values
+
+
+def use_graphql_backend() -> bool:
+    """
+    Check if the GraphQL API backend is selected.
+
+    Returns
+    -------
+    bool
+        True if ``INPUT_API_BACKEND`` is ``graphql``, False otherwise.
+    """
+    return get_input('api_backend', 'rest').lower() == 'graphql'
+
+
+def get_graphql_repo_state(tag_name: str, repository: str) -> dict:
+    """
+    Get the repository merge settings, the latest release, and whether a release tag exists, in one GraphQL query.
+
+    The result is memoized, see ``get_memo``, so the settings check, the latest release lookup and the release check
+    for the same tag share a single round-trip.
+
+    Parameters
+    ----------
+    tag_name : str
+        Tag name of the release to check.
+    repository : str
+        Repository name, e.g. ``owner/repo``.
+
+    Returns
+    -------
+    dict
+        Dictionary with the keys ``allow_squash_merge``, ``allow_merge_commit``, ``allow_rebase_merge`` (named like the
+        REST API response), ``latest_release_tag`` and ``release_exists``. Empty if the query failed.
+    """
+    memo = get_memo(name='graphql_repo_state')
+    if (tag_name, repository) in memo:
+        return memo[(tag_name, repository)]
+
+    owner, name = repository.split('/', 1)
+    data = dict(
+        query=GRAPHQL_REPO_STATE_QUERY,
+        variables=dict(owner=owner, name=name, tagName=tag_name),
+    )
+    response = github_api_request('POST', '/graphql', json=data)
+    result = response.json()
+
+    repo_info = (result.get('data') or {}).get('repository')
+    if not repo_info:
+        print(f'::error:: GraphQL query failed: {result.get("errors")}')
+        repo_state = {}
+    else:
+        repo_state = dict(
+            allow_squash_merge=repo_info['squashMergeAllowed'],
+            allow_merge_commit=repo_info['mergeCommitAllowed'],
+            allow_rebase_merge=repo_info['rebaseMergeAllowed'],
+            latest_release_tag=(repo_info['latestRelease'] or {}).get('tagName', ''),
+            release_exists=repo_info['release'] is not None,
+        )
+
+    memo[(tag_name, repository)] = repo_state
+    return repo_state
+
+
+def use_release_index() -> bool:
+    """
+    Check if release existence checks should use the release index.
+
+    Returns
+    -------
+    bool
+        True if ``INPUT_RELEASE_INDEX`` is ``true``, False otherwise.
+    """
+    return get_input('release_index', 'false').lower() == 'true'
+
+
+def get_release_index_path(cache_dir: str, repository: str) -> str:
+    """
+    Get the path of the stored release index for a repository.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the API response cache.
+    repository : str
+        Repository name, e.g. ``owner/repo``.
+
+    Returns
+    -------
+    str
+        Path of the stored release index.
+    """
+    return os.path.join(cache_dir, f'release-index-{hashlib.sha256(repository.encode("utf-8")).hexdigest()}.json')
+
+
+def read_release_index(cache_dir: str, repository: str) -> List[str]:
+    """
+    Read the stored release index for a repository.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the API response cache.
+    repository : str
+        Repository name, e.g. ``owner/repo``.
+
+    Returns
+    -------
+    List[str]
+        Release tag names, newest first. Empty if there is no usable index.
+    """
+    try:
+        with open(get_release_index_path(cache_dir=cache_dir, repository=repository), 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return []
+
+    if index.get('repository') != repository:
+        return []
+    return index['tags']
+
+
+def write_release_index(cache_dir: str, repository: str, tags: List[str]):
+    """
+    Store the release index for a repository.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the API response cache.
+    repository : str
+        Repository name, e.g. ``owner/repo``.
+    tags : List[str]
+        Release tag names, newest first.
+    """
+    write_cache_file(
+        cache_dir=cache_dir,
+        path=get_release_index_path(cache_dir=cache_dir, repository=repository),
+        data=dict(repository=repository, tags=tags),
+    )
+
+
+def get_release_index(repository: Optional[str] = None) -> Optional[Set[str]]:
+    """
+    Get the set of release tag names of a repository.
+
+    The releases are paged through once and the tag names are kept for the rest of the run, see ``get_memo``. If
+    ``INPUT_API_CACHE_DIR`` is set, the index is also stored there, and later runs only fetch the newest pages until
+    they reach a tag that is already indexed. Pages are fetched through the API response cache, so an unchanged first
+    page costs a ``304 Not Modified`` response.
+
+    Releases deleted after they were indexed stay in the stored index until it is evicted from the cache.
+
+    Parameters
+    ----------
+    repository : Optional[str]
+        Repository name, e.g. ``owner/repo``. Defaults to the ``GITHUB_REPOSITORY`` of the workflow run.
+
+    Returns
+    -------
+    Optional[Set[str]]
+        Release tag names, or ``None`` if the releases could not be listed.
+    """
+    repository = repository or get_repository()
+    memo = get_memo(name='release_index')
+    if repository in memo:
+        return memo[repository]
+
+    cache_dir = get_api_cache_dir()
+    tags = read_release_index(cache_dir=cache_dir, repository=repository) if cache_dir else []
+    known_tags = set(tags)
+
+    new_tags = []
+    page = 1
+    while True:
+        response = github_api_request(
+            'GET',
+            f'/repos/{repository}/releases?per_page={RELEASE_INDEX_PAGE_SIZE}&page={page}',
+            cache=True,
+        )
+        if response.status_code != 200:
+            print(f'::warning:: Failed to list the releases: {response.status_code}')
+            return None
+
+        page_tags = [release['tag_name'] for release in response.json()]
+        new_tags.extend(tag for tag in page_tags if tag not in known_tags)
+        if len(page_tags) < RELEASE_INDEX_PAGE_SIZE or not known_tags.isdisjoint(page_tags):
+            break
+        page += 1
+
+    if new_tags or not tags:
+        tags = new_tags + tags
+        if cache_dir:
+            write_release_index(cache_dir=cache_dir, repository=repository, tags=tags)
+
+    memo[repository] = set(tags)
+    return memo[repository]
+
+
+def check_release(version: str, repository: Optional[str] = None) -> bool:
+    """
+    Check if the release exists in the GitHub API.
+
+    This function will check if the release exists in the GitHub API.
+
+    Parameters
+    ----------
+    version : str
+        Version number of the release.
+    repository : Optional[str]
+        Repository name, e.g. ``owner/repo``. Defaults to the ``GITHUB_REPOSITORY`` of the workflow run.
+
+    Returns
+    -------
+    bool
+        True if the release exists, False otherwise.
+    """
+    # Get the release from the GitHub API
+    repository = repository or get_repository()
+    version_prefix = get_input('tag_prefix', 'v')
+    if use_release_index():
+        release_index = get_release_index(repository=repository)
+        if release_index is not None:
+            return f'{version_prefix}{version}' in release_index
+
+    if use_graphql_backend():
+        return get_graphql_repo_state(
+            tag_name=f'{version_prefix}{version}', repository=repository).get('release_exists', False)
+
+    # only the status is needed, so skip the release object
+    response = github_api_request('HEAD', f'/repos/{repository}/releases/tags/{version_prefix}{version}')
+
+    # Check if the release exists
+    if response.status_code == 200:
+        return True
+    else:
+        return False
+
+
+def use_partial_event_parse() -> bool:
+    """
+    Check if the event payload should be parsed partially.
+
+    Returns
+    -------
+    bool
+        True if ``INPUT_PARTIAL_EVENT_PARSE`` is ``true``, False otherwise.
+    """
+    return get_input('partial_event_parse', 'false').lower() == 'true'
+
+
+def keep_github_event_fields(pairs: List[tuple]) -> dict:
+    """
+    Build a JSON object of the event payload with only the fields read by the action.
+
+    Used as the ``object_pairs_hook`` of the partial event parse, so the dropped parts of the payload, like the file
+    lists of the commits, are released as soon as their parent object is parsed.
+
+    Parameters
+    ----------
+    pairs : List[tuple]
+        Key and value pairs of the JSON object.
+
+    Returns
+    -------
+    dict
+        The object, with the keys in ``GITHUB_EVENT_FIELDS``.
+    """
+    return {key: value for key, value in pairs if key in GITHUB_EVENT_FIELDS}
+
+
+@functools.lru_cache(maxsize=8)
+def load_github_event(path: str, mtime_ns: int, size: int, partial: bool) -> dict:
+    """
+    Parse an event payload file.
+
+    The result is memoized by path, modification time and size, so the file is parsed once, but changes to it are
+    still picked up. The returned dictionary is shared by all callers and must not be modified.
+
+    Parameters
+    ----------
+    path : str
+        Path of the event payload file.
+    mtime_ns : int
+        Modification time of the file, in nanoseconds.
+    size : int
+        Size of the file, in bytes.
+    partial : bool
+        Whether to keep only the fields read by the action, see ``GITHUB_EVENT_FIELDS``.
+
+    Returns
+    -------
+    dict
+        Dictionary containing the GitHub event.
+    """
+    with open(path, 'r') as f:
+        if partial:
+            return json.load(f, object_pairs_hook=keep_github_event_fields)
+        return json.load(f)
+
+
+def get_github_event() -> dict:
+    """
+    Get the GitHub event from the environment variables.
+
+    The event is parsed once per process. With ``INPUT_PARTIAL_EVENT_PARSE``, only the fields read by the action are
+    kept: ``pull_request.head.sha``, ``commits[*].timestamp`` and ``repository.default_branch``.
+
+    Returns
+    -------
+    dict
+        Dictionary containing the GitHub event.
+    """
+    github_event_path = os.environ['GITHUB_EVENT_PATH']
+    stat = os.stat(github_event_path)
+    return load_github_event(
+        path=github_event_path,
+        mtime_ns=stat.st_mtime_ns,
+        size=stat.st_size,
+        partial=use_partial_event_parse(),
+    )
+
+
+def get_repo_default_branch() -> str:
+    """
+    Get the default branch of the repository from the GitHub event context.
+
+    Returns
+    -------
+    str
+        Default branch of the repository.
+    """
+    # get default branch from event context
+    github_event = get_github_event()
+    return github_event['repository']['default_branch']
+
+
+def get_repo_squash_and_merge_required(tag_name: str = '', repository: Optional[str] = None) -> bool:
+    """
+    Check if squash and merge is required for the repository.
+
+    Parameters
+    ----------
+    tag_name : str
+        Tag name of the release. Only used by the GraphQL backend, to fetch the release state in the same query.
+    repository : Optional[str]
+        Repository name, e.g. ``owner/repo``. Defaults to the ``GITHUB_REPOSITORY`` of the workflow run.
+
+    Returns
+    -------
+    bool
+        True if squash and merge is required, False otherwise.
+
+    Raises
+    ------
+    KeyError
+        If the required keys are not found in the GitHub API response.
+        Ensure the token has the `"Metadata" repository permissions (read)` scope.
+    """
+    repository = repository or get_repository()
+    if use_graphql_backend():
+        repo_info = get_graphql_repo_state(tag_name=tag_name, repository=repository)
+    else:
+        response = github_api_request('GET', f'/repos/{repository}', cache=True)
+        repo_info = response.json()
+
+    try:
+        allow_squash_merge = repo_info['allow_squash_merge']
+        allow_merge_commit = repo_info['allow_merge_commit']
+        allow_rebase_merge = repo_info['allow_rebase_merge']
+    except KeyError:
+        msg = ('::error:: Could not find the required keys in the GitHub API response. '
+               'Ensure the token has the `"Metadata" repository permissions (read)` scope.')
+        print(msg)
+        raise KeyError(msg)
+
+    if allow_squash_merge and not allow_merge_commit and not allow_rebase_merge:
+        return True
+    else:
+        print('::error:: The repository must have ONLY squash and merge enabled.')
+        print('::warning:: DO NOT re-run this job after changing the repository settings.'
+              'Wait until a new commit is made.')
+        return False
+
+
+@traced
+def get_push_event_details(
+        github_event: Optional[dict] = None,
+        github_sha: Optional[str] = None,
+        repository: Optional[str] = None,
+) -> dict:
+    """
+    Get the details of the GitHub push event from the API.
+
+    This function will get the details of the GitHub push event from the API.
+
+    Parameters
+    ----------
+    github_event : Optional[dict]
+        The GitHub event. Defaults to the event of the workflow run.
+    github_sha : Optional[str]
+        The commit SHA of a push event. Defaults to the ``GITHUB_SHA`` of the workflow run.
+    repository : Optional[str]
+        Repository name, e.g. ``owner/repo``. Defaults to the ``GITHUB_REPOSITORY`` of the workflow run.
+
+    Returns
+    -------
+    dict
+        Dictionary containing the details of the push event.
+    """
+    # default
+    push_event_details = dict(
+        publish_release=False,
+        release_commit='',
+        release_version='',
+    )
+
+    if github_event is None:
+        github_event = get_github_event()
+
+    is_pull_request = True if github_event.get("pull_request") else False
+
+    try:
+        # set sha to the head sha of the pull request
+        github_sha = github_event["pull_request"]["head"]["sha"]
+    except KeyError:
+        # not a pull request event
+        github_sha = github_sha or os.environ["GITHUB_SHA"]
+    push_event_details['release_commit'] = github_sha
+
+    if is_pull_request:
+        return push_event_details
+
+    # this is a push event
+    # ensure there is only 1 commit in the github context
+    if len(github_event["commits"]) != 1:
+        msg = (":exclamation: ERROR: This action only supports a single commit push event. "
+               "Please ensure ONLY squash and merge is enabled. "
+               "**DO NOT** re-run this job after changing the repository settings. Wait until a new commit is made.")
+        append_github_step_summary(message=msg)
+        print(f'::error:: {msg}')
+        raise SystemExit(3)
+
+    # get the commit
+    commit_timestamp = github_event["commits"][0]['timestamp']
+
+    release_version = format_release_version(
+        timestamp=TimestampUTC(iso_timestamp=commit_timestamp),
+        dotnet=get_input('dotnet', 'false').lower() == 'true',
+    )
+
+    # check if squash and merge is required
+    if not get_repo_squash_and_merge_required(
+            tag_name=f"{get_input('tag_prefix', 'v')}{release_version}",
+            repository=repository,
+    ):
+        msg = (":exclamation: ERROR: Squash and merge is not enabled for this repository. "
+               "Please ensure ONLY squash and merge is enabled. "
+               "**DO NOT** re-run this job after changing the repository settings. Wait until a new commit is made.")
+        append_github_step_summary(message=msg)
+        print(f'::error:: {msg}')
+        raise SystemExit(2)
+
+    # not a pull request, so publish
+    push_event_details['publish_release'] = True
+
+    push_event_details['release_version'] = release_version
+    return push_event_details
+
+
+def iter_lines(text: str) -> Iterator[str]:
+    """
+    Iterate over the lines of a string, without copying the whole string.
+
+    Lines are split on ``\\n`` only and keep their line ending, like ``io.StringIO(text).readlines()``.
+
+    Parameters
+    ----------
+    text : str
+        The text to split.
+
+    Yields
+    ------
+    str
+        The next line.
+    """
+    start = 0
+    while True:
+        end = text.find('\n', start)
+        if end == -1:
+            if start < len(text):
+                yield text[start:]
+            return
+        yield text[start:end + 1]
+        start = end + 1
+
+
+def iter_processed_release_body(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Process the provided release body, line by line.
+
+    Replace contributor mentions and PR numbers with GitHub URLs. Each line is scanned once, the contributors are
+    tallied while their mentions are replaced. After the last line, the contributors section is yielded.
+
+    Parameters
+    ----------
+    lines : Iterable[str]
+       Lines of the release body, including line endings, e.g. an open file.
+
+    Yields
+    ------
+    str
+       The next chunk of the processed release body.
+    """
+    contributors = {}
+
+    def rewrite_token(match: re.Match) -> str:
+        pr_url = match.group('pr_url')
+        if pr_url:
+            # replace the pr url with a Markdown link
+            return f'[#{match.group("pr_number")}]({pr_url})'
+
+        # replace the mention with a GitHub profile URL
+        username = match.group('username')
+        username_url = f'https://github.com/{username}'
+
+        if username in contributors:
+            contributors[username]['contributions'] += 1
+        else:
+            contributors[username] = {
+                'contributions': 1,
+                'url': username_url,
+            }
+
+        return f'{match.group("prefix")}[@{username}]({username_url})'
+
+    for line in lines:
+        yield RE_RELEASE_BODY_TOKEN.sub(rewrite_token, line)
+
+    # add contributors to the release notes
+    if contributors:
+        # sort contributors by contributions count
+        contributors = dict(sorted(contributors.items(), key=lambda item: (-item[1]['contributions'], item[0])))
+
+        yield '\n\n---\n'
+        yield '## Contributors\n'
+        for contributor, details in contributors.items():
+            # add the contributor's avatar
+            # use <img> tag to ensure the image is the correct size as unchanged avatars cannot use the size query
+            yield (
+                f'<a href="{details["url"]}" '
+                'target="_blank" '
+                'rel="external noopener noreferrer" '
+                f'aria-label="GitHub profile of contributor, {contributor}" '
+                '>'
+                f'<img src="{details["url"]}.png?size={AVATAR_SIZE}" '
+                f'width="{AVATAR_SIZE}" '
+                f'height="{AVATAR_SIZE}" '
+                f'alt="{contributor}" '
+                f'title="{contributor}: {details["contributions"]} '
+                f'{"merges" if details["contributions"] > 1 else "merge"}" '
+                '></a>')
+    yield '\n'
+
+
+def write_processed_release_body(lines: Iterable[str], sink: TextIO):
+    """
+    Process the provided release body and write it to a file-like object, without building it in memory.
+
+    Parameters
+    ----------
+    lines : Iterable[str]
+       Lines of the release body, including line endings, e.g. an open file.
+    sink : TextIO
+       File-like object to write the processed release body to.
+    """
+    sink.writelines(iter_processed_release_body(lines=lines))
+
+
+@traced
+def process_release_body(
+        release_body: str,
+        pull_request_labels: Optional[Callable[[List[str]], dict]] = None,
+) -> str:
+    """
+    Process the provided release body.
+
+    Replace contributor mentions and PR numbers with GitHub URLs.
+
+    Parameters
+    ----------
+    release_body : str
+       The release body.
+    pull_request_labels : Optional[Callable[[List[str]], dict]]
+       If given, the changes are grouped by pull request label first, see ``iter_grouped_release_notes``.
+
+    Returns
+    -------
+    str
+       Processed release body.
+    """
+    lines = iter_lines(text=release_body)
+    if pull_request_labels is not None:
+        lines = iter_grouped_release_notes(lines=lines, pull_request_labels=pull_request_labels)
+    return ''.join(iter_processed_release_body(lines=lines))
+
+
+def use_label_groups() -> bool:
+    """
+    Check if the changes in the release notes should be grouped by pull request label.
+
+    Returns
+    -------
+    bool
+        True if ``INPUT_GROUP_BY_LABEL`` is ``true``, False otherwise.
+    """
+    return get_input('group_by_label', 'false').lower() == 'true'
+
+
+def get_pull_request_cache_path(cache_dir: str, repository: str) -> str:
+    """
+    Get the path of the stored merged pull requests of a repository.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the API response cache.
+    repository : str
+        Repository name, e.g. ``owner/repo``.
+
+    Returns
+    -------
+    str
+        Path of the stored pull requests.
+    """
+    return os.path.join(cache_dir, f'pull-requests-{hashlib.sha256(repository.encode("utf-8")).hexdigest()}.json')
+
+
+def read_pull_request_cache(cache_dir: str, repository: str) -> dict:
+    """
+    Read the stored merged pull requests of a repository.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the API response cache.
+    repository : str
+        Repository name, e.g. ``owner/repo``.
+
+    Returns
+    -------
+    dict
+        Pull requests by number, see ``fetch_pull_request``. Empty if there are none stored.
+    """
+    try:
+        with open(get_pull_request_cache_path(cache_dir=cache_dir, repository=repository), 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if cache.get('repository') != repository:
+        return {}
+    return {int(number): pull_request for number, pull_request in cache['pull_requests'].items()}
+
+
+def write_pull_request_cache(cache_dir: str, repository: str, pull_requests: dict):
+    """
+    Store the merged pull requests of a repository.
+
+    Merged pull requests do not change, so they are kept until the cache is pruned.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the API response cache.
+    repository : str
+        Repository name, e.g. ``owner/repo``.
+    pull_requests : dict
+        Merged pull requests by number.
+    """
+    write_cache_file(
+        cache_dir=cache_dir,
+        path=get_pull_request_cache_path(cache_dir=cache_dir, repository=repository),
+        data=dict(
+            repository=repository,
+            pull_requests={str(number): pull_request for number, pull_request in pull_requests.items()},
+        ),
+    )
+
+
+def fetch_pull_request(number: int, repository: str) -> Optional[dict]:
+    """
+    Fetch the labels of a pull request from the REST API.
+
+    Parameters
+    ----------
+    number : int
+        Number of the pull request.
+    repository : str
+        Repository name, e.g. ``owner/repo``.
+
+    Returns
+    -------
+    Optional[dict]
+        Dictionary with the keys ``labels`` (lowercase names) and ``merged``, or ``None`` if the pull request could not
+        be fetched. A pull request that does not exist has no labels and is not merged.
+    """
+    response = github_api_request('GET', f'/repos/{repository}/pulls/{number}', essential=False)
+    if response is not None and response.status_code == 404:
+        return dict(labels=[], merged=False)
+    if response is None or response.status_code != 200:
+        return None
+
+    pull_request = response.json()
+    return dict(
+        labels=sorted(label['name'].lower() for label in pull_request['labels']),
+        merged=pull_request['merged_at'] is not None,
+    )
+
+
+def fetch_pull_requests_graphql(numbers: List[int], repository: str) -> dict:
+    """
+    Fetch the labels of pull requests in one GraphQL query, with one alias per pull request.
+
+    Parameters
+    ----------
+    numbers : List[int]
+        Numbers of the pull requests.
+    repository : str
+        Repository name, e.g. ``owner/repo``.
+
+    Returns
+    -------
+    dict
+        Pull requests by number, see ``fetch_pull_request``. Empty if the query failed.
+    """
+    fields = ' '.join(
+        f'pr{number}: pullRequest(number: {number}) {{ merged labels(first: {PULL_REQUEST_MAX_LABELS}) '
+        '{ nodes { name } } }'
+        for number in numbers
+    )
+    owner, name = repository.split('/', 1)
+    data = dict(
+        query=f'query($owner: String!, $name: String!) {{ repository(owner: $owner, name: $name) {{ {fields} }} }}',
+        variables=dict(owner=owner, name=name),
+    )
+    response = github_api_request('POST', '/graphql', essential=False, json=data)
+    if response is None or response.status_code != 200:
+        return {}
+
+    # pull requests that do not exist are null, with an error each, so the errors are not checked
+    repo_info = (response.json().get('data') or {}).get('repository')
+    if repo_info is None:
+        return {}
+    return {
+        number: dict(
+            labels=sorted(label['name'].lower() for label in repo_info[f'pr{number}']['labels']['nodes']),
+            merged=repo_info[f'pr{number}']['merged'],
+        ) if repo_info.get(f'pr{number}') else dict(labels=[], merged=False)
+        for number in numbers
+    }
+
+
+@traced
+def get_pull_requests(numbers: Iterable[int], repository: str) -> dict:
+    """
+    Get the labels of pull requests, concurrently.
+
+    Merged pull requests are read from the on-disk cache if ``INPUT_API_CACHE_DIR`` is set. The others are fetched on
+    a pool of ``HTTP_POOL_SIZE`` workers, one REST request per pull request, or one GraphQL query per
+    ``PULL_REQUEST_BATCH_SIZE`` pull requests with the GraphQL backend.
+
+    Parameters
+    ----------
+    numbers : Iterable[int]
+        Numbers of the pull requests.
+    repository : str
+        Repository name, e.g. ``owner/repo``.
+
+    Returns
+    -------
+    dict
+        Pull requests by number, see ``fetch_pull_request``. Pull requests that could not be fetched are left out.
+    """
+    cache_dir = get_api_cache_dir()
+    cached = read_pull_request_cache(cache_dir=cache_dir, repository=repository) if cache_dir else {}
+    missing = sorted(set(numbers) - set(cached))
+
+    pull_requests = {number: cached[number] for number in numbers if number in cached}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE) as executor:
+        # the number of the pull request of a REST request, None for a GraphQL batch
+        futures = {}
+        if use_graphql_backend():
+            for i in range(0, len(missing), PULL_REQUEST_BATCH_SIZE):
+                futures[submit_in_context(executor, fetch_pull_requests_graphql,
+                                          numbers=missing[i:i + PULL_REQUEST_BATCH_SIZE], repository=repository)] = None
+        else:
+            for number in missing:
+                futures[submit_in_context(executor, fetch_pull_request, number=number, repository=repository)] = number
+
+        for future, number in futures.items():
+            try:
+                fetched = future.result()
+            except requests.RequestException as e:
+                print(f'::warning:: Could not fetch pull requests of {repository}: {e}')
+                continue
+            if number is not None:
+                fetched = {number: fetched} if fetched else {}
+            pull_requests.update(fetched)
+
+    merged = {number: pull_request for number, pull_request in pull_requests.items() if pull_request['merged']}
+    if cache_dir and set(merged) - set(cached):
+        write_pull_request_cache(cache_dir=cache_dir, repository=repository, pull_requests={**cached, **merged})
+        prune_api_cache(cache_dir=cache_dir)
+    return pull_requests
+
+
+class PullRequestLabels:
+    """
+    Look up the labels of the pull requests of release notes entries, see ``get_pull_requests``.
+
+    The lookup is called with the entries of each "What's Changed" section, so the pull requests of a section are
+    fetched together, once the section is read.
+
+    Attributes
+    ----------
+    complete : bool
+        False if the labels of any pull request could not be fetched, so the release notes are only partly grouped.
+    """
+    def __init__(self):
+        self.complete = True
+
+    def __call__(self, entries: List[str]) -> dict:
+        """
+        Get the pull requests of release notes entries.
+
+        Parameters
+        ----------
+        entries : List[str]
+            Entries of a "What's Changed" section.
+
+        Returns
+        -------
+        dict
+            Pull requests by repository and number, see ``fetch_pull_request``.
+        """
+        numbers_by_repository = {}
+        for entry in entries:
+            pr_match = RE_PR_URL.search(entry)
+            if pr_match:
+                numbers_by_repository.setdefault(pr_match.group('repository'), set()).add(
+                    int(pr_match.group('pr_number')))
+
+        pull_requests = {}
+        for repository, numbers in numbers_by_repository.items():
+            fetched = get_pull_requests(numbers=numbers, repository=repository)
+            if len(fetched) < len(numbers):
+                self.complete = False
+            pull_requests.update(((repository, number), pull_request) for number, pull_request in fetched.items())
+        return pull_requests
+
+
+def iter_grouped_release_notes(
+        lines: Iterable[str],
+        pull_request_labels: Callable[[List[str]], dict],
+) -> Iterator[str]:
+    """
+    Group the entries of the "What's Changed" sections of release notes by pull request label.
+
+    Each group is a subsection, in the order of ``RELEASE_NOTES_GROUPS``. Entries keep their order within a group.
+    Breaking changes, by label or by a conventional commit subject like ``feat!:``, are flagged. Only the entries of a
+    section are held in memory, the other lines are passed through as they are read.
+
+    Parameters
+    ----------
+    lines : Iterable[str]
+        Lines of the release notes, including line endings.
+    pull_request_labels : Callable[[List[str]], dict]
+        Called with the entries of each section, returns their pull requests by repository and number, e.g. a
+        ``PullRequestLabels``.
+
+    Yields
+    ------
+    str
+        The next line of the grouped release notes.
+    """
+    def iter_groups(entries: List[str]) -> Iterator[str]:
+        pull_requests = pull_request_labels(entries)
+        groups = {name: [] for name, _ in RELEASE_NOTES_GROUPS}
+        groups[RELEASE_NOTES_OTHER_GROUP] = []
+        for entry in entries:
+            pr_match = RE_PR_URL.search(entry)
+            pull_request = pull_requests.get(
+                (pr_match.group('repository'), int(pr_match.group('pr_number')))) if pr_match else None
+            labels = set(pull_request['labels']) if pull_request else set()
+
+            group = next((name for name, group_labels in RELEASE_NOTES_GROUPS if labels & group_labels),
+                         RELEASE_NOTES_OTHER_GROUP)
+            if labels & BREAKING_CHANGE_LABELS or RE_BREAKING_CHANGE_ENTRY.match(entry):
+                entry = f'* :warning: **Breaking:** {entry[2:]}'
+            groups[group].append(entry if entry.endswith('\n') else f'{entry}\n')
+
+        first = True
+        for name, group_entries in groups.items():
+            if group_entries:
+                if not first:
+                    yield '\n'
+                yield f'### {name}\n'
+                yield from group_entries
+                first = False
+
+    entries = None
+    for line in lines:
+        if entries is not None:
+            if line.startswith('* '):
+                entries.append(line)
+                continue
+            yield from iter_groups(entries=entries)
+            entries = None
+        yield line
+        if line.rstrip() == "## What's Changed":
+            entries = []
+    if entries is not None:
+        yield from iter_groups(entries=entries)
+
+
+def get_latest_release_tag(tag_name: str = '', repository: Optional[str] = None) -> str:
+    """
+    Get the tag name of the latest release from the GitHub API.
+
+    Parameters
+    ----------
+    tag_name : str
+        Tag name of the new release. Only used by the GraphQL backend, to fetch the release state in the same query.
+    repository : Optional[str]
+        Repository name, e.g. ``owner/repo``. Defaults to the ``GITHUB_REPOSITORY`` of the workflow run.
+
+    Returns
+    -------
+    str
+        Tag name of the latest release, or an empty string if there is no latest release.
+    """
+    repository = repository or get_repository()
+    if use_graphql_backend():
+        return get_graphql_repo_state(tag_name=tag_name, repository=repository).get('latest_release_tag', '')
+
+    release = get_api_fields(
+        f'/repos/{repository}/releases/latest', fields=('tag_name',), cache=True, essential=False)
+
+    # Check if the release exists
+    if not release:
+        return ''
+
+    return release['tag_name']
+
+
+def get_release_notes_source() -> str:
+    """
+    Get the source of the release notes.
+
+    Returns
+    -------
+    str
+        ``api`` for the ``generate-notes`` endpoint, ``compare`` for the compare endpoint, or ``git`` for the local git
+        checkout, from ``INPUT_RELEASE_NOTES_SOURCE``.
+    """
+    return get_input('release_notes_source', 'api').lower()
+
+
+def use_git_release_notes() -> bool:
+    """
+    Check if the release notes should be generated from the local git checkout.
+
+    Returns
+    -------
+    bool
+        True if ``INPUT_RELEASE_NOTES_SOURCE`` is ``git``, False otherwise.
+    """
+    return get_release_notes_source() == 'git'
+
+
+def git_command(*args: str) -> list:
+    """
+    Build a git command that runs against the checked out repository in ``GITHUB_WORKSPACE``.
+
+    Parameters
+    ----------
+    *args : str
+        Arguments of the git command.
+
+    Returns
+    -------
+    list
+        The command.
+    """
+    workspace = os.environ['GITHUB_WORKSPACE']
+    # the workspace is owned by a different user inside the container
+    return ['git', '-c', f'safe.directory={workspace}', '-C', workspace, *args]
+
+
+def get_git_previous_tag(target_commitish: str) -> str:
+    """
+    Get the most recent tag, with the configured tag prefix, reachable from the parent of the target commit.
+
+    Parameters
+    ----------
+    target_commitish : str
+        The commitish value that determines where the Git tag is created from.
+
+    Returns
+    -------
+    str
+        Tag name, or an empty string if there is no such tag.
+    """
+    version_prefix = get_input('tag_prefix', 'v')
+    result = subprocess.run(
+        git_command('describe', '--tags', '--abbrev=0', f'--match={version_prefix}*', f'{target_commitish}^'),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return ''
+    return result.stdout.strip()
+
+
+def iter_git_release_notes(
+        tag_name: str,
+        target_commitish: str,
+        previous_tag_name: str,
+        repository: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Generate the "What's Changed" release notes from the local git history, line by line.
+
+    The squash and merge commits between the previous tag and the target commit are read from ``git log`` as a
+    stream. The output follows the format of the GitHub ``generate-notes`` endpoint. The author is mentioned if their
+    GitHub username can be derived from a noreply commit email.
+
+    Parameters
+    ----------
+    tag_name : str
+        Tag name of the release.
+    target_commitish : str
+        The commitish value that determines where the Git tag is created from.
+    previous_tag_name : str
+        Tag name of the previous release.
+    repository : Optional[str]
+        Repository name, e.g. ``owner/repo``. Defaults to the ``GITHUB_REPOSITORY`` of the workflow run.
+
+    Yields
+    ------
+    str
+        The next line of the release notes.
+
+    Raises
+    ------
+    subprocess.CalledProcessError
+        If ``git log`` fails, e.g. the previous tag is not in a shallow checkout.
+    """
+    repository = repository or get_repository()
+    yield "## What's Changed\n"
+
+    command = git_command('log', '--reverse', '--format=%ae%x00%an%x00%s', f'{previous_tag_name}..{target_commitish}')
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as process:
+        for line in process.stdout:
+            author_email, author_name, subject = line.rstrip('\n').split('\x00', 2)
+
+            subject_match = RE_SQUASH_SUBJECT.match(subject)
+            if not subject_match:
+                continue
+
+            email_match = RE_NOREPLY_EMAIL.match(author_email)
+            author = f'@{email_match.group("username")}' if email_match else author_name
+
+            pr_url = f'https://github.com/{repository}/pull/{subject_match.group("pr_number")}'
+            yield f'* {subject_match.group("title")} by {author} in {pr_url}\n'
+
+        # git only writes a short message to stderr, so it cannot fill the pipe while stdout is read
+        stderr = process.stderr.read()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(returncode=process.returncode, cmd=command, stderr=stderr)
+
+    yield '\n\n'
+    yield f'**Full Changelog**: https://github.com/{repository}/compare/{previous_tag_name}...{tag_name}'
+
+
+def generate_git_release_body(tag_name: str, target_commitish: str, repository: Optional[str] = None) -> str:
+    """
+    Generate the release body from the local git checkout, without any API calls.
+
+    The repository must be checked out with its history and tags, e.g. ``fetch-depth: 0`` in ``actions/checkout``.
+
+    Parameters
+    ----------
+    tag_name : str
+        Tag name of the release.
+    target_commitish : str
+        The commitish value that determines where the Git tag is created from.
+    repository : Optional[str]
+        Repository name, e.g. ``owner/repo``. Defaults to the ``GITHUB_REPOSITORY`` of the workflow run.
+
+    Returns
+    -------
+    str
+        Release body, or an empty string if there is no previous tag, or git is missing or fails.
+    """
+    try:
+        previous_tag_name = get_git_previous_tag(target_commitish=target_commitish)
+    except OSError as e:
+        print(f'::warning:: Could not run git ({e}), falling back to GitHub generated release notes.')
+        return ''
+    if not previous_tag_name:
+        print('::warning:: Could not find a previous tag in the git history, '
+              'falling back to GitHub generated release notes.')
+        return ''
+
+    try:
+        return ''.join(iter_processed_release_body(lines=iter_git_release_notes(
+            tag_name=tag_name,
+            target_commitish=target_commitish,
+            previous_tag_name=previous_tag_name,
+            repository=repository,
+        )))
+    except subprocess.CalledProcessError as e:
+        error = e.stderr.strip().splitlines()[0] if e.stderr.strip() else f'exit code {e.returncode}'
+        print(f'::warning:: Could not read the git history ({error}), '
+              'falling back to GitHub generated release notes.')
+        return ''
+    except OSError as e:
+        print(f'::warning:: Could not run git ({e}), falling back to GitHub generated release notes.')
+        return ''
+
+
+def iter_compare_commits(base: str, head: str, repository: str) -> Iterator[dict]:
+    """
+    Get the commits between two refs from the compare endpoint, oldest first.
+
+    The first page tells the total number of commits. The remaining pages are fetched concurrently, at most
+    ``HTTP_POOL_SIZE`` at a time, and yielded in order, so only the pages in flight are held in memory, however long
+    the range is.
+
+    Parameters
+    ----------
+    base : str
+        Base of the range, e.g. the previous tag.
+    head : str
+        Head of the range, e.g. the commit SHA of the release.
+    repository : str
+        Repository name, e.g. ``owner/repo``.
+
+    Yields
+    ------
+    dict
+        The next commit object.
+
+    Raises
+    ------
+    requests.HTTPError
+        If a page could not be fetched.
+    """
+    endpoint = f'/repos/{repository}/compare/{base}...{head}?per_page={COMPARE_PAGE_SIZE}'
+
+    def get_page(page: int) -> List[dict]:
+        response = github_api_request('GET', f'{endpoint}&page={page}')
+        response.raise_for_status()
+        return response.json()
+
+    first_page = get_page(page=1)
+    page_count = -(-first_page['total_commits'] // COMPARE_PAGE_SIZE)
+    commits = first_page.pop('commits')
+    del first_page
+    yield from commits
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE) as executor:
+        pages = iter(range(2, page_count + 1))
+        futures = collections.deque()
+        for page in pages:
+            futures.append(submit_in_context(executor, get_page, page=page))
+            if len(futures) == HTTP_POOL_SIZE:
+                break
+
+        while futures:
+            commits = futures.popleft().result()['commits']
+            page = next(pages, None)
+            if page is not None:
+                futures.append(submit_in_context(executor, get_page, page=page))
+            yield from commits
+
+
+def iter_compare_release_notes(
+        tag_name: str,
+        target_commitish: str,
+        previous_tag_name: str,
+        repository: str,
+) -> Iterator[str]:
+    """
+    Generate the "What's Changed" release notes from the compare endpoint, line by line.
+
+    The output follows the format of the GitHub ``generate-notes`` endpoint, with one line per squash and merge
+    commit. The author is mentioned if the commit is linked to a GitHub user.
+
+    Parameters
+    ----------
+    tag_name : str
+        Tag name of the release.
+    target_commitish : str
+        The commitish value that determines where the Git tag is created from.
+    previous_tag_name : str
+        Tag name of the previous release.
+    repository : str
+        Repository name, e.g. ``owner/repo``.
+
+    Yields
+    ------
+    str
+        The next line of the release notes.
+    """
+    yield "## What's Changed\n"
+
+    for commit in iter_compare_commits(base=previous_tag_name, head=target_commitish, repository=repository):
+        subject_match = RE_SQUASH_SUBJECT.match(commit['commit']['message'].split('\n', 1)[0])
+        if not subject_match:
+            continue
+
+        author = f'@{commit["author"]["login"]}' if commit['author'] else commit['commit']['author']['name']
+        pr_url = f'https://github.com/{repository}/pull/{subject_match.group("pr_number")}'
+        yield f'* {subject_match.group("title")} by {author} in {pr_url}\n'
+
+    yield '\n\n'
+    yield f'**Full Changelog**: https://github.com/{repository}/compare/{previous_tag_name}...{tag_name}'
+
+
+def generate_compare_release_body(
+        tag_name: str,
+        target_commitish: str,
+        previous_tag_name: str,
+        repository: str,
+        pull_request_labels: Optional[Callable[[List[str]], dict]] = None,
+) -> str:
+    """
+    Generate the release body from the compare endpoint.
+
+    This is slower than the ``generate-notes`` endpoint for short ranges, but works for ranges of any length.
+
+    Parameters
+    ----------
+    tag_name : str
+        Tag name of the release.
+    target_commitish : str
+        The commitish value that determines where the Git tag is created from.
+    previous_tag_name : str
+        Tag name of the previous release.
+    repository : str
+        Repository name, e.g. ``owner/repo``.
+    pull_request_labels : Optional[Callable[[List[str]], dict]]
+        If given, the changes are grouped by pull request label, see ``iter_grouped_release_notes``.
+
+    Returns
+    -------
+    str
+        Release body, or an empty string if the commits could not be fetched.
+    """
+    try:
+        lines = iter_compare_release_notes(
+            tag_name=tag_name,
+            target_commitish=target_commitish,
+            previous_tag_name=previous_tag_name,
+            repository=repository,
+        )
+        if pull_request_labels is not None:
+            lines = iter_grouped_release_notes(lines=lines, pull_request_labels=pull_request_labels)
+        return ''.join(iter_processed_release_body(lines=lines))
+    except requests.RequestException as e:
+        print(f'::warning:: Could not compare {previous_tag_name}...{target_commitish}: {e}')
+        return ''
+
+
+def get_release_body_cache_key(
+        tag_name: str,
+        target_commitish: str,
+        previous_tag_name: Optional[str],
+        repository: str,
+) -> str:
+    """
+    Get the cache key of a processed release body.
+
+    Parameters
+    ----------
+    tag_name : str
+        Tag name of the release.
+    target_commitish : str
+        The commitish value that determines where the Git tag is created from.
+    previous_tag_name : Optional[str]
+        Tag name of the previous latest release, or ``None`` if it is looked up from the API.
+    repository : str
+        Repository name, e.g. ``owner/repo``.
+
+    Returns
+    -------
+    str
+        Hash of the release, the commit range and the options that change the processed release body.
+    """
+    key = dict(
+        repository=repository,
+        tag_name=tag_name,
+        target_commitish=target_commitish,
+        previous_tag_name=previous_tag_name,
+        release_notes_source=get_release_notes_source(),
+        group_by_label=use_label_groups(),
+        avatar_size=AVATAR_SIZE,
+    )
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def get_release_body_cache_path(cache_dir: str, key: str) -> str:
+    """
+    Get the path of the cache entry for a processed release body.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the API response cache.
+    key : str
+        Cache key from ``get_release_body_cache_key``.
+
+    Returns
+    -------
+    str
+        Path of the cache entry.
+    """
+    return os.path.join(cache_dir, f'release-body-{key}.json')
+
+
+def read_release_body_cache(cache_dir: str, key: str) -> Optional[str]:
+    """
+    Read a processed release body from the cache, and mark the entry as recently used.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the API response cache.
+    key : str
+        Cache key from ``get_release_body_cache_key``.
+
+    Returns
+    -------
+    Optional[str]
+        The processed release body, or ``None`` if there is no usable entry.
+    """
+    path = get_release_body_cache_path(cache_dir=cache_dir, key=key)
+    try:
+        with open(path, 'r') as f:
+            entry = json.load(f)
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+
+    if entry.get('key') != key:
+        return None
+    return entry['release_body']
+
+
+@traced
+def generate_release_body(
+        tag_name: str,
+        target_commitish: str,
+        previous_tag_name: Optional[str] = None,
+        repository: Optional[str] = None,
+) -> str:
+    """
+    Generate the release body, by comparing this SHA to the previous latest release.
+
+    If ``INPUT_API_CACHE_DIR`` is set, processed release bodies are stored there, next to the API responses, and share
+    their size limit and eviction. Re-running a job for the same release and commit then reuses the release body,
+    without fetching the latest release or generating the release notes again.
+
+    Parameters
+    ----------
+    tag_name : str
+        Tag name of the release.
+    target_commitish : str
+        The commitish value that determines where the Git tag is created from.
+    previous_tag_name : Optional[str]
+        Tag name of the previous latest release, if already known. If ``None``, the latest release is fetched from
+        the GitHub API.
+    repository : Optional[str]
+        Repository name, e.g. ``owner/repo``. Defaults to the ``GITHUB_REPOSITORY`` of the workflow run.
+
+    Returns
+    -------
+    str
+        Release body.
+    """
+    repository = repository or get_repository()
+    cache_dir = get_api_cache_dir()
+    if not cache_dir:
+        return build_release_body(
+            tag_name=tag_name,
+            target_commitish=target_commitish,
+            previous_tag_name=previous_tag_name,
+            repository=repository,
+        )
+
+    key = get_release_body_cache_key(
+        tag_name=tag_name,
+        target_commitish=target_commitish,
+        previous_tag_name=previous_tag_name,
+        repository=repository,
+    )
+    release_body = read_release_body_cache(cache_dir=cache_dir, key=key)
+    if release_body is not None:
+        return release_body
+
+    pull_request_labels = PullRequestLabels() if use_label_groups() else None
+    release_body = build_release_body(
+        tag_name=tag_name,
+        target_commitish=target_commitish,
+        previous_tag_name=previous_tag_name,
+        repository=repository,
+        pull_request_labels=pull_request_labels,
+    )
+    # an empty body means there is no previous release or the notes could not be generated, and a body with missing
+    # pull request labels is only partly grouped, so try again next time
+    if release_body and (pull_request_labels is None or pull_request_labels.complete):
+        write_cache_file(
+            cache_dir=cache_dir,
+            path=get_release_body_cache_path(cache_dir=cache_dir, key=key),
+            data=dict(key=key, release_body=release_body),
+        )
+        prune_api_cache(cache_dir=cache_dir)
+    return release_body
+
+
+def build_release_body(
+        tag_name: str,
+        target_commitish: str,
+        previous_tag_name: Optional[str] = None,
+        repository: Optional[str] = None,
+        pull_request_labels: Optional[PullRequestLabels] = None,
+) -> str:
+    """
+    Generate the release body from the git history or the GitHub API, without the release body cache.
+
+    If ``INPUT_GROUP_BY_LABEL`` is ``true``, the labels of the pull requests are looked up, and the changes of the API
+    release notes are grouped by label. The git release notes are not grouped, to keep them free of API calls.
+
+    Parameters
+    ----------
+    tag_name : str
+        Tag name of the release.
+    target_commitish : str
+        The commitish value that determines where the Git tag is created from.
+    previous_tag_name : Optional[str]
+        Tag name of the previous latest release, if already known. If ``None``, the latest release is fetched from
+        the GitHub API.
+    repository : Optional[str]
+        Repository name, e.g. ``owner/repo``. Defaults to the ``GITHUB_REPOSITORY`` of the workflow run.
+    pull_request_labels : Optional[PullRequestLabels]
+        Lookup of the pull request labels, to tell if it was complete afterward. Defaults to a new one if
+        ``INPUT_GROUP_BY_LABEL`` is ``true``.
+
+    Returns
+    -------
+    str
+        Release body.
+    """
+    repository = repository or get_repository()
+    if pull_request_labels is None and use_label_groups():
+        pull_request_labels = PullRequestLabels()
+
+    if use_git_release_notes():
+        return generate_git_release_body(tag_name=tag_name, target_commitish=target_commitish, repository=repository)
+
+    if previous_tag_name is None:
+        previous_tag_name = get_latest_release_tag(tag_name=tag_name, repository=repository)
+
+    # Check if the release exists
+    if not previous_tag_name:
+        return ''
+
+    if get_release_notes_source() == 'compare':
+        return generate_compare_release_body(
+            tag_name=tag_name,
+            target_commitish=target_commitish,
+            previous_tag_name=previous_tag_name,
+            repository=repository,
+            pull_request_labels=pull_request_labels,
+        )
+
+    # generate release notes
+    data = {
+        'tag_name': tag_name,
         'target_commitish': target_commitish,
-        'previous_tag_name': latest_release['tag_name'],
+        'previous_tag_name': previous_tag_name,
     }
-    response = requests.post(github_api_url, headers=GITHUB_HEADERS, json=data)
+    response = github_api_request(
+        'POST', f'/repos/{repository}/releases/generate-notes', essential=False, json=data)
+
+    if response is None:
+        print('::warning:: Could not generate release notes, falling back to GitHub generated release notes.')
+        return ''
+    if response.status_code == 422 or response.status_code >= 500:
+        # e.g. the range is too large for the generate-notes endpoint
+        print(f'::warning:: Could not generate release notes ({response.status_code}), using the compare endpoint.')
+        return generate_compare_release_body(
+            tag_name=tag_name,
+            target_commitish=target_commitish,
+            previous_tag_name=previous_tag_name,
+            repository=repository,
+            pull_request_labels=pull_request_labels,
+        )
+    if response.status_code != 200:
+        # e.g. an authentication or rate limit error, which the many requests of the compare endpoint would not pass
+        print(f'::warning:: Could not generate release notes ({response.status_code}), '
+              'falling back to GitHub generated release notes.')
+        return ''
 
     release_notes = response.json()
-    return process_release_body(release_body=release_notes['body'])
+    return process_release_body(release_body=release_notes['body'], pull_request_labels=pull_request_labels)
 
 
-def main() -> dict:
+@traced
+def compute_job_outputs(
+        github_event: Optional[dict] = None,
+        github_sha: Optional[str] = None,
+        repository: Optional[str] = None,
+) -> dict:
     """
-    Main function for the action.
+    Compute the job outputs for a GitHub event.
+
+    Parameters
+    ----------
+    github_event : Optional[dict]
+        The GitHub event. Defaults to the event of the workflow run.
+    github_sha : Optional[str]
+        The commit SHA of a push event. Defaults to the ``GITHUB_SHA`` of the workflow run.
+    repository : Optional[str]
+        Repository name, e.g. ``owner/repo``. Defaults to the ``GITHUB_REPOSITORY`` of the workflow run.
 
     Returns
     -------
@@ -414,25 +3421,51 @@ def main() -> dict:
     """
     job_outputs = dict()
 
-    # Get the push event details
-    push_event_details = get_push_event_details()
+    if github_event is None:
+        github_event = get_github_event()
 
-    release_version = push_event_details["release_version"]
-    release_tag = f"{release_version}"
+    concurrent_api_calls = get_input('concurrent_api_calls', 'true').lower() == 'true'
+    is_pull_request = True if github_event.get("pull_request") else False
 
-    # generate release notes
-    if push_event_details['publish_release']:
-        release_body = generate_release_body(
-            tag_name=f"{os.getenv('INPUT_TAG_PREFIX', 'v')}{release_tag}",
-            target_commitish=push_event_details["release_commit"],
+    with concurrent.futures.ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE) as executor:
+        latest_release_future = None
+        # with the API cache, a re-run may reuse the cached release body, which needs no latest release
+        prefetch_latest_release = not (
+            is_pull_request or use_graphql_backend() or use_git_release_notes() or get_api_cache_dir())
+        if concurrent_api_calls and prefetch_latest_release:
+            # the latest release does not depend on the push event details,
+            # so fetch it while the repository settings are being checked
+            latest_release_future = submit_in_context(executor, get_latest_release_tag, repository=repository)
+
+        # Get the push event details
+        push_event_details = get_push_event_details(
+            github_event=github_event,
+            github_sha=github_sha,
+            repository=repository,
         )
-    else:
+
+        release_version = push_event_details["release_version"]
+        release_tag = f"{release_version}"
+
+        # generate release notes
         release_body = ''
+        if push_event_details['publish_release']:
+            try:
+                release_body = generate_release_body(
+                    tag_name=f"{get_input('tag_prefix', 'v')}{release_tag}",
+                    target_commitish=push_event_details["release_commit"],
+                    previous_tag_name=latest_release_future.result() if latest_release_future else None,
+                    repository=repository,
+                )
+            except requests.exceptions.Timeout as e:
+                # leave the release notes to GitHub rather than fail the release
+                print(f'::warning:: Could not generate release notes in time ({e}), '
+                      'falling back to GitHub generated release notes.')
     release_generate_release_notes = True if not release_body else False
 
     version_prefix = ''
-    if os.getenv('INPUT_INCLUDE_TAG_PREFIX_IN_OUTPUT', 'true').lower() == 'true':
-        version_prefix = os.getenv('INPUT_TAG_PREFIX', 'v')
+    if get_input('include_tag_prefix_in_output', 'true').lower() == 'true':
+        version_prefix = get_input('tag_prefix', 'v')
 
     job_outputs['publish_release'] = str(push_event_details['publish_release']).lower()
     job_outputs['release_body'] = release_body
@@ -441,14 +3474,580 @@ def main() -> dict:
     job_outputs['release_version'] = release_version
     job_outputs['release_tag'] = f'{version_prefix if release_tag else ""}{release_tag}'
 
-    # Set the outputs
-    for output_name, output_value in job_outputs.items():
-        # debug print
-        print(f'::debug::Setting output {output_name} to {output_value}')
-        set_github_action_output(output_name=output_name, output_value=output_value)
+    return job_outputs
+
+
+def get_commit_push_event(sha: str, repository: str) -> dict:
+    """
+    Build a single commit push event for a commit, from the GitHub API.
+
+    Parameters
+    ----------
+    sha : str
+        The commit SHA.
+    repository : str
+        Repository name, e.g. ``owner/repo``.
+
+    Returns
+    -------
+    dict
+        Dictionary containing the push event.
+
+    Raises
+    ------
+    ValueError
+        If the commit could not be found.
+    """
+    response = github_api_request('GET', f'/repos/{repository}/commits/{sha}')
+    if not response.status_code == 200:
+        raise ValueError(f'Could not find commit {sha} in {repository}')
+
+    commit = response.json()
+    return dict(commits=[dict(timestamp=commit['commit']['committer']['date'])])
+
+
+def compute_batch_entry(
+        entry: dict,
+        session: Optional[requests.Session] = None,
+        rate_limit: Optional[dict] = None,
+) -> dict:
+    """
+    Compute the job outputs for one entry of a batch, in a run of a ``ReleasePlanner`` for its repository.
+
+    The commit of a push event is the ``sha`` of the entry, or the ``after`` SHA of its event. The ``GITHUB_SHA`` of
+    the workflow run is never used, since it belongs to another repository.
+
+    Parameters
+    ----------
+    entry : dict
+        Batch entry with a ``repository``, and either an ``event`` payload, an ``event_path``, or a push ``sha``.
+    session : Optional[requests.Session]
+        HTTP session of the planner. Defaults to the shared ``SESSION``.
+    rate_limit : Optional[dict]
+        Rate limit budget of the planner, like ``RATE_LIMIT``. Defaults to the shared ``RATE_LIMIT``.
+
+    Returns
+    -------
+    dict
+        Dictionary with the ``repository`` and either its ``outputs`` or an ``error``.
+    """
+    repository = entry['repository']
+    planner = ReleasePlanner(
+        repository=repository,
+        tag_prefix=os.getenv('INPUT_TAG_PREFIX', 'v'),
+        dotnet=os.getenv('INPUT_DOTNET', 'false').lower() == 'true',
+        session=session or SESSION,
+    )
+    planner.rate_limit = RATE_LIMIT if rate_limit is None else rate_limit
+    try:
+        with planner.activate():
+            if 'event' in entry:
+                github_event = entry['event']
+            elif 'event_path' in entry:
+                with open(entry['event_path'], 'r') as f:
+                    github_event = json.load(f)
+            else:
+                github_event = get_commit_push_event(sha=entry['sha'], repository=repository)
+
+            github_sha = entry.get('sha') or github_event.get('after')
+            if not github_sha and not github_event.get('pull_request'):
+                raise ValueError('the entry has no sha, and its event has no after SHA')
+
+            outputs = compute_job_outputs(github_event=github_event, github_sha=github_sha, repository=repository)
+    except SystemExit as e:
+        return dict(repository=repository, error=f'exit code {e.code}')
+    except Exception as e:
+        # e.g. a missing event file, an invalid event or an API error, which must not abort the other entries
+        return dict(repository=repository, error=f'{type(e).__name__}: {e}')
+
+    return dict(repository=repository, outputs=outputs)
+
+
+def batch_main(batch_path: str, output_dir: str, max_workers: int = BATCH_MAX_WORKERS) -> List[dict]:
+    """
+    Compute the job outputs for many repositories in one process.
+
+    The repositories are processed by a bounded thread pool. They share a session of their own, with its connection
+    pool, and a rate limit budget. One JSON result is written per repository, as soon as it is computed.
+
+    Parameters
+    ----------
+    batch_path : str
+        Path of a JSON file with a list of batch entries, see ``compute_batch_entry``.
+    output_dir : str
+        Directory to write the results to, as ``{owner}__{repo}.json``.
+    max_workers : int
+        Maximum number of repositories processed at the same time.
+
+    Returns
+    -------
+    List[dict]
+        Results, in the order of the batch entries.
+    """
+    with open(batch_path, 'r') as f:
+        entries = json.load(f)
+
+    # each worker can have a concurrent request of its own in flight
+    session = create_session()
+    set_session_pool_size(session=session, pool_size=max_workers * 2)
+    rate_limit = dict(remaining=None, reset=None)
+
+    os.makedirs(output_dir, exist_ok=True)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                submit_in_context(executor, compute_batch_entry, entry, session=session, rate_limit=rate_limit)
+                for entry in entries
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                with open(os.path.join(output_dir, f'{result["repository"].replace("/", "__")}.json'), 'w') as f:
+                    json.dump(result, f, indent=2)
+                print(f'{result["repository"]}: {result.get("error", "ok")}')
+    finally:
+        session.close()
+
+    return [future.result() for future in futures]
+
+
+class ReleasePlanner:
+    """
+    Compute the job outputs of releases for a repository, for many events in one process.
+
+    The planner keeps its HTTP session, with pooled connections, and its rate limit budget across runs. Inputs that
+    are not given to the planner are read from the ``INPUT_*`` environment variables. A planner can run several events
+    at the same time, from different threads.
+
+    Parameters
+    ----------
+    repository : str
+        Repository name, e.g. ``owner/repo``.
+    token : str
+        GitHub API token.
+    tag_prefix : str
+        The tag prefix.
+    dotnet : bool
+        Whether to create a dotnet version (4 components, e.g. yyyy.mmdd.hhmm.ss).
+    api_url : Optional[str]
+        Root URL of the GitHub API. Defaults to ``GITHUB_API_URL``, or ``https://api.github.com``.
+    graphql_url : Optional[str]
+        URL of the GitHub GraphQL API. Defaults to the URL that goes with ``api_url`` if it is given, otherwise to
+        ``GITHUB_GRAPHQL_URL``, see ``get_default_graphql_url``.
+    inputs : Optional[dict]
+        Other action inputs by name, e.g. ``dict(api_cache_dir='.cache')``.
+    session : Optional[requests.Session]
+        HTTP session. Defaults to a new session authenticated with the token.
+
+    Attributes
+    ----------
+    rate_limit : dict
+        Rate limit budget of the token, like ``RATE_LIMIT``.
+    api_latencies : collections.deque
+        Latencies of recent GET requests, like ``API_LATENCIES``.
+    """
+    def __init__(
+            self,
+            repository: str,
+            token: str = '',
+            tag_prefix: str = 'v',
+            dotnet: bool = False,
+            api_url: Optional[str] = None,
+            inputs: Optional[dict] = None,
+            session: Optional[requests.Session] = None,
+            graphql_url: Optional[str] = None,
+    ):
+        self.repository = repository
+        self.api_url = (api_url or os.getenv('GITHUB_API_URL', DEFAULT_GITHUB_API_URL)).rstrip('/')
+        self.graphql_url = graphql_url or (None if api_url else os.getenv('GITHUB_GRAPHQL_URL')) or \
+            get_default_graphql_url(api_url=self.api_url)
+        self.inputs = dict(inputs or {}, tag_prefix=tag_prefix, dotnet=str(dotnet).lower())
+        self.session = session or create_session(token=token)
+        self.rate_limit = dict(remaining=None, reset=None)
+        self.api_latencies = collections.deque(maxlen=API_LATENCY_SAMPLES)
+
+    @classmethod
+    def from_env(cls) -> 'ReleasePlanner':
+        """
+        Create a planner for the workflow run, from the environment variables.
+
+        The planner uses the shared ``SESSION``, ``RATE_LIMIT`` and ``API_LATENCIES``.
+
+        Returns
+        -------
+        ReleasePlanner
+            The planner.
+        """
+        planner = cls(
+            repository=os.environ['GITHUB_REPOSITORY'],
+            tag_prefix=os.getenv('INPUT_TAG_PREFIX', 'v'),
+            dotnet=os.getenv('INPUT_DOTNET', 'false').lower() == 'true',
+            session=SESSION,
+        )
+        planner.rate_limit = RATE_LIMIT
+        planner.api_latencies = API_LATENCIES
+        return planner
+
+    @contextlib.contextmanager
+    def activate(self, trace: Optional[list] = None) -> Iterator[list]:
+        """
+        Make this planner the active planner of the current context, for one run.
+
+        Module functions called inside the block use the session, inputs and repository of the planner. Results
+        memoized during the run are discarded afterward. The API time budget of the run starts when the block is
+        entered.
+
+        Parameters
+        ----------
+        trace : Optional[list]
+            List to record the spans of the run to. Defaults to a new list.
+
+        Yields
+        ------
+        list
+            The spans of the run.
+        """
+        planner_token = ACTIVE_PLANNER.set(self)
+        try:
+            budget = get_api_time_budget()
+            run = dict(
+                trace=[] if trace is None else trace,
+                release_index={},
+                graphql_repo_state={},
+                deadline=time.monotonic() + budget if budget > 0 else None,
+            )
+            run_token = ACTIVE_RUN.set(run)
+            try:
+                yield run['trace']
+            finally:
+                ACTIVE_RUN.reset(run_token)
+        finally:
+            ACTIVE_PLANNER.reset(planner_token)
+
+    def plan(self, github_event: dict, github_sha: Optional[str] = None, trace: Optional[list] = None) -> dict:
+        """
+        Compute the job outputs for a GitHub event.
+
+        Parameters
+        ----------
+        github_event : dict
+            The event payload, e.g. of a ``push`` or ``pull_request`` webhook.
+        github_sha : Optional[str]
+            The commit SHA of a push event. Defaults to the ``after`` SHA of the event.
+        trace : Optional[list]
+            List to record the spans of the run to.
+
+        Returns
+        -------
+        dict
+            Job outputs.
+        """
+        with self.activate(trace=trace):
+            return compute_job_outputs(
+                github_event=github_event,
+                github_sha=github_sha or github_event.get('after'),
+                repository=self.repository,
+            )
+
+    def close(self):
+        """
+        Close the connections of the planner's session.
+        """
+        self.session.close()
+
+    def __enter__(self) -> 'ReleasePlanner':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def verify_webhook_signature(body: bytes, signature: str, secret: str) -> bool:
+    """
+    Verify the ``X-Hub-Signature-256`` header of a webhook delivery.
+
+    Parameters
+    ----------
+    body : bytes
+        Body of the delivery.
+    signature : str
+        Value of the header, e.g. ``sha256=...``.
+    secret : str
+        Secret of the webhook.
+
+    Returns
+    -------
+    bool
+        True if the signature matches the body, False otherwise.
+    """
+    expected = 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+class WebhookRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Handle webhook deliveries of ``push`` and ``pull_request`` events.
+
+    The body is the event payload, like the file at ``GITHUB_EVENT_PATH``. The response is a JSON object with the
+    job ``outputs``, or an ``error``. The connection is closed after each response, so idle clients do not hold on to
+    a worker of the bounded pool.
+    """
+    protocol_version = 'HTTP/1.1'
+    timeout = WEBHOOK_TIMEOUT
+    server: 'WebhookServer'
+
+    def log_message(self, format, *args):
+        print(f'::debug::{self.address_string()} {format % args}')
+
+    def send_json(self, status: int, payload: dict):
+        """
+        Send a JSON response.
+
+        Parameters
+        ----------
+        status : int
+            HTTP status code.
+        payload : dict
+            Body of the response.
+        """
+        content = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        self.wfile.write(content)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if self.server.secret and not verify_webhook_signature(
+                body=body, signature=self.headers.get('X-Hub-Signature-256', ''), secret=self.server.secret):
+            self.send_json(status=401, payload=dict(error='invalid signature'))
+            return
+
+        event_name = self.headers.get('X-GitHub-Event', 'push')
+        if event_name == 'ping':
+            self.send_json(status=200, payload=dict(outputs=None))
+            return
+        if event_name not in ('push', 'pull_request'):
+            self.send_json(status=400, payload=dict(error=f'unsupported event: {event_name}'))
+            return
+
+        try:
+            github_event = json.loads(body)
+            planner = self.server.get_planner(repository=github_event['repository']['full_name'])
+        except (KeyError, TypeError, ValueError) as e:
+            self.send_json(status=400, payload=dict(error=f'invalid payload: {type(e).__name__}: {e}'))
+            return
+
+        try:
+            outputs = planner.plan(github_event=github_event)
+        except SystemExit as e:
+            self.send_json(status=422, payload=dict(error=f'exit code {e.code}'))
+        except (KeyError, ValueError) as e:
+            self.send_json(status=422, payload=dict(error=f'{type(e).__name__}: {e}'))
+        except requests.exceptions.RequestException as e:
+            self.send_json(status=502, payload=dict(error=f'{type(e).__name__}: {e}'))
+        else:
+            self.send_json(status=200, payload=dict(outputs=outputs))
+
+
+class WebhookServer(http.server.HTTPServer):
+    """
+    HTTP server that computes the job outputs of webhook deliveries.
+
+    Requests are handled on a bounded pool of worker threads. All requests share one HTTP session to the GitHub API,
+    with a connection pool sized for the workers, and one ``ReleasePlanner`` per repository.
+
+    Parameters
+    ----------
+    server_address : tuple
+        Host and port to listen on. Port ``0`` picks a free port.
+    token : str
+        GitHub API token.
+    max_workers : int
+        Maximum number of requests handled at the same time.
+    secret : str
+        Secret of the webhook. If set, deliveries without a matching ``X-Hub-Signature-256`` header are rejected.
+    """
+    def __init__(
+            self,
+            server_address: tuple,
+            token: str = '',
+            max_workers: int = WEBHOOK_MAX_WORKERS,
+            secret: str = '',
+    ):
+        super().__init__(server_address, WebhookRequestHandler)
+        self.secret = secret
+        self.session = create_session(token=token)
+        # each worker can have a concurrent request of its own in flight
+        set_session_pool_size(session=self.session, pool_size=max_workers * 2)
+        self.rate_limit = dict(remaining=None, reset=None)
+        self.api_latencies = collections.deque(maxlen=API_LATENCY_SAMPLES)
+        self.planners = {}
+        self.planners_lock = threading.Lock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    def get_planner(self, repository: str) -> ReleasePlanner:
+        """
+        Get the planner of a repository, creating it on first use.
+
+        Parameters
+        ----------
+        repository : str
+            Repository name, e.g. ``owner/repo``.
+
+        Returns
+        -------
+        ReleasePlanner
+            The planner, sharing the session, rate limit budget and API latencies of the server.
+        """
+        with self.planners_lock:
+            if repository not in self.planners:
+                planner = ReleasePlanner(
+                    repository=repository,
+                    tag_prefix=os.getenv('INPUT_TAG_PREFIX', 'v'),
+                    dotnet=os.getenv('INPUT_DOTNET', 'false').lower() == 'true',
+                    session=self.session,
+                )
+                planner.rate_limit = self.rate_limit
+                planner.api_latencies = self.api_latencies
+                self.planners[repository] = planner
+            return self.planners[repository]
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+
+def serve_main(host: str, port: int, max_workers: int = WEBHOOK_MAX_WORKERS):
+    """
+    Serve webhook deliveries until interrupted.
+
+    The ``INPUT_*`` environment variables configure the runs. If ``WEBHOOK_SECRET`` is set, deliveries must be signed
+    with it.
+
+    Parameters
+    ----------
+    host : str
+        Host to listen on.
+    port : int
+        Port to listen on.
+    max_workers : int
+        Maximum number of requests handled at the same time.
+    """
+    server = WebhookServer(
+        server_address=(host, port),
+        token=os.getenv('INPUT_GITHUB_TOKEN', ''),
+        max_workers=max_workers,
+        secret=os.getenv('WEBHOOK_SECRET', ''),
+    )
+    print(f'Listening on http://{server.server_address[0]}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main() -> dict:
+    """
+    Main function for the action.
+
+    Returns
+    -------
+    dict
+        Job outputs.
+    """
+    trace = []
+    with profile_run(modes=get_profile_modes()) as profile:
+        planner = ReleasePlanner.from_env()
+        with use_cassette(
+                session=planner.session,
+                path=os.getenv('INPUT_API_CASSETTE', ''),
+                mode=os.getenv('INPUT_API_CASSETTE_MODE', 'replay'),
+        ):
+            job_outputs = planner.plan(
+                github_event=get_github_event(), github_sha=os.getenv('GITHUB_SHA'), trace=trace)
+
+        # Set the outputs
+        writer = GitHubFileWriter()
+        for output_name, output_value in job_outputs.items():
+            # debug print
+            print(f'::debug::Setting output {output_name} to {output_value}')
+            writer.set_output(output_name=output_name, output_value=output_value)
+
+        # Report the timing of the run
+        if os.getenv('INPUT_TRACE_SUMMARY', 'true').lower() == 'true':
+            writer.append_summary(message=format_trace_summary(spans=trace))
+        if os.getenv('INPUT_TRACE_FILE'):
+            write_trace_file(path=os.environ['INPUT_TRACE_FILE'], spans=trace)
+
+        writer.flush()
+
+    # Report the profile, once profiling stopped
+    if profile['modes']:
+        report = format_profile_report(profile=profile)
+        append_github_step_summary(message=report)
+        if os.getenv('INPUT_PROFILE_FILE'):
+            with open(os.path.abspath(os.environ['INPUT_PROFILE_FILE']), 'w') as f:
+                f.write(report)
 
     return job_outputs
 
 
+def cli(argv: Optional[List[str]] = None):
+    """
+    Command line entry point.
+
+    Without a command, the action runs for the current workflow run.
+
+    Parameters
+    ----------
+    argv : Optional[List[str]]
+        Command line arguments. Defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description='Set up the release parameters.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    batch_parser = subparsers.add_parser('batch', help='Compute the outputs for many repositories.')
+    batch_parser.add_argument('batch_path', help='JSON file with a list of batch entries.')
+    batch_parser.add_argument('--output-dir', default='results', help='Directory to write the results to.')
+    batch_parser.add_argument('--max-workers', type=int, default=BATCH_MAX_WORKERS,
+                              help='Maximum number of repositories processed at the same time.')
+
+    serve_parser = subparsers.add_parser('serve', help='Compute the outputs of webhook deliveries over HTTP.')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='Host to listen on.')
+    serve_parser.add_argument('--port', type=int, default=8080, help='Port to listen on.')
+    serve_parser.add_argument('--max-workers', type=int, default=WEBHOOK_MAX_WORKERS,
+                              help='Maximum number of requests handled at the same time.')
+
+    args = parser.parse_args(argv)
+
+    # Load the environment variables from the Environment File
+    load_dotenv()
+
+    if args.command == 'batch':
+        batch_main(batch_path=args.batch_path, output_dir=args.output_dir, max_workers=args.max_workers)
+    elif args.command == 'serve':
+        serve_main(host=args.host, port=args.port, max_workers=args.max_workers)
+    else:
+        main()
+
+
 if __name__ == "__main__":
-    main()  # pragma: no cover
+    cli()  # pragma: no cover
@@ -0,0 +1,161 @@
+"""
+Benchmark event loading, ``TimestampUTC`` construction and version formatting, one at a time and in batches.
+"""
+# standard imports
+import datetime
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import List
+from unittest.mock import patch
+
+# local imports
+from action import main
+
+TIMESTAMP_COUNTS = (1_000, 100_000)
+EVENT_COMMITS = (1, 1_000, 10_000)
+QUICK_EVENT_COMMITS = (1, 1_000)
+FILES_PER_COMMIT = 20
+
+
+def synthetic_timestamps(count: int) -> List[str]:
+    """
+    Build ISO timestamps one second apart, alternating between UTC and offset notation.
+
+    Parameters
+    ----------
+    count : int
+        Number of timestamps.
+
+    Returns
+    -------
+    List[str]
+        The timestamps.
+    """
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    timestamps = []
+    for i in range(count):
+        timestamp = start + datetime.timedelta(seconds=i)
+        if i % 2:
+            timestamps.append(timestamp.strftime('%Y-%m-%dT%H:%M:%SZ'))
+        else:
+            timestamps.append(timestamp.astimezone(datetime.timezone(datetime.timedelta(hours=-4))).isoformat())
+    return timestamps
+
+
+def synthetic_push_event(commits: int) -> dict:
+    """
+    Build a push event payload with file lists, like the ones GitHub sends.
+
+    Parameters
+    ----------
+    commits : int
+        Number of commits.
+
+    Returns
+    -------
+    dict
+        The event payload.
+    """
+    return dict(
+        repository=dict(default_branch='master'),
+        commits=[
+            dict(
+                id=f'{i:040x}',
+                message=f'fix: change number {i} (#{i})',
+                timestamp=timestamp,
+                added=[f'src/added_{i}_{j}.py' for j in range(FILES_PER_COMMIT)],
+                modified=[f'src/modified_{i}_{j}.py' for j in range(FILES_PER_COMMIT)],
+                removed=[],
+            ) for i, timestamp in enumerate(synthetic_timestamps(count=commits))
+        ],
+    )
+
+
+def bench_timestamps(count: int, dotnet: bool) -> dict:
+    timestamps = synthetic_timestamps(count=count)
+    event = dict(repository=dict(default_branch='master'), commits=[None])
+
+    with patch.dict(os.environ, GITHUB_SHA='0' * 40, INPUT_DOTNET=str(dotnet).lower()), \
+            patch('action.main.get_github_event', return_value=event), \
+            patch('action.main.get_repo_squash_and_merge_required', return_value=True):
+        start = time.perf_counter()
+        for timestamp in timestamps:
+            event['commits'][0] = dict(timestamp=timestamp)
+            main.get_push_event_details()
+        seconds = time.perf_counter() - start
+
+    return dict(
+        name='push_event_version',
+        timestamps=count,
+        dotnet=dotnet,
+        seconds=seconds,
+        us_per_item=seconds / count * 1e6,
+    )
+
+
+def bench_versions(count: int, batch: bool) -> dict:
+    timestamps = synthetic_timestamps(count=count)
+
+    start = time.perf_counter()
+    if batch:
+        main.compute_release_versions(timestamps=timestamps)
+    else:
+        for iso_timestamp in timestamps:
+            timestamp = main.TimestampUTC(iso_timestamp=iso_timestamp)
+            main.format_release_version(timestamp=timestamp)
+            main.format_release_version(timestamp=timestamp, dotnet=True)
+    seconds = time.perf_counter() - start
+
+    return dict(
+        name='release_versions',
+        timestamps=count,
+        batch=batch,
+        seconds=seconds,
+        us_per_item=seconds / count * 1e6,
+    )
+
+
+def bench_get_github_event(commits: int, partial: bool) -> dict:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        event_path = os.path.join(temp_dir, 'event.json')
+        with open(event_path, 'w') as f:
+            json.dump(synthetic_push_event(commits=commits), f)
+
+        env = dict(GITHUB_EVENT_PATH=event_path, INPUT_PARTIAL_EVENT_PARSE=str(partial).lower())
+        with patch.dict(os.environ, env):
+            start = time.perf_counter()
+            main.get_github_event()
+            seconds = time.perf_counter() - start
+            main.load_github_event.cache_clear()
+
+            # measured separately, tracing the allocations slows down the parse
+            tracemalloc.start()
+            main.get_github_event()
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            main.load_github_event.cache_clear()
+
+        return dict(
+            name='get_github_event',
+            commits=commits,
+            partial=partial,
+            bytes=os.path.getsize(event_path),
+            peak_bytes=peak_bytes,
+            seconds=seconds,
+        )
+
+
+def run(quick: bool = False) -> List[dict]:
+    results = []
+    for count in TIMESTAMP_COUNTS[:1] if quick else TIMESTAMP_COUNTS:
+        for dotnet in (False, True):
+            results.append(bench_timestamps(count=count, dotnet=dotnet))
+        for batch in (False, True):
+            results.append(bench_versions(count=count, batch=batch))
+    for commits in QUICK_EVENT_COMMITS if quick else EVENT_COMMITS:
+        for partial in (False, True):
+            results.append(bench_get_github_event(commits=commits, partial=partial))
+    return results
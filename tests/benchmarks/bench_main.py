@@ -0,0 +1,187 @@
+"""
+Benchmark ``main()`` end to end against an in-process fake of the GitHub API, and against the local HTTP stand-in.
+
+Also benchmark a long-lived ``ReleasePlanner``: its first run, and later runs that reuse its connections, and API calls
+that open a new session each versus calls that share the pooled ``SESSION``.
+"""
+# standard imports
+import io
+import json
+import os
+import tempfile
+import time
+from typing import List
+from unittest.mock import patch
+
+# lib imports
+import requests
+
+# local imports
+from action import main
+from bench_process_release_body import synthetic_release_body
+from fake_github_api import FakeGitHubAPI
+
+RELEASE_NOTES_LINES = (10, 1_000, 100_000)
+QUICK_RELEASE_NOTES_LINES = (10, 1_000)
+LATENCIES = (0.0, 0.05)
+PLANNER_RUNS = 20
+SESSION_REQUESTS = 50
+
+
+def fake_api(release_notes_lines: int):
+    """
+    Build a fake ``requests.Session.request`` that answers the endpoints used by the action.
+
+    Parameters
+    ----------
+    release_notes_lines : int
+        Number of PR lines in the generated release notes.
+
+    Returns
+    -------
+    callable
+        The fake request function.
+    """
+    repo = os.environ['GITHUB_REPOSITORY']
+    payloads = {
+        ('GET', f'/repos/{repo}'): dict(allow_squash_merge=True, allow_merge_commit=False, allow_rebase_merge=False),
+        ('GET', f'/repos/{repo}/releases/latest'): dict(tag_name='v2024.101.1'),
+        ('POST', f'/repos/{repo}/releases/generate-notes'): dict(
+            body=synthetic_release_body(lines=release_notes_lines)),
+    }
+
+    def request(method, url, **kwargs):
+        response = requests.Response()
+        payload = payloads.get((method, url[len(main.get_api_url()):]))
+        response.status_code = 200 if payload is not None else 404
+        # a raw body, so streamed requests work too
+        response.raw = io.BytesIO(json.dumps(payload or {}).encode('utf-8'))
+        return response
+
+    return request
+
+
+def run_main() -> float:
+    """
+    Run ``main()`` on a single commit push event, with temporary output files.
+
+    Returns
+    -------
+    float
+        Duration in seconds.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        event_path = os.path.join(temp_dir, 'event.json')
+        with open(event_path, 'w') as f:
+            json.dump(dict(repository=dict(default_branch='master'), commits=[dict(timestamp='2024-01-02T03:04:05Z')]),
+                      f)
+
+        environ = dict(
+            GITHUB_EVENT_PATH=event_path,
+            GITHUB_OUTPUT=os.path.join(temp_dir, 'output'),
+            GITHUB_SHA='0' * 40,
+            GITHUB_STEP_SUMMARY=os.path.join(temp_dir, 'summary'),
+        )
+        with patch.dict(os.environ, environ), patch('builtins.print'):
+            start = time.perf_counter()
+            main.main()
+            return time.perf_counter() - start
+
+
+def bench(release_notes_lines: int) -> dict:
+    with patch.object(main.SESSION, 'request', fake_api(release_notes_lines=release_notes_lines)):
+        seconds = run_main()
+
+    return dict(
+        name='main',
+        release_notes_lines=release_notes_lines,
+        seconds=seconds,
+    )
+
+
+def bench_http(latency: float, concurrent_api_calls: bool) -> dict:
+    api = FakeGitHubAPI(repository=os.environ['GITHUB_REPOSITORY'])
+    api.add_release(tag_name='v2024.101.1')
+    api.release_notes_body = synthetic_release_body(lines=100)
+    api.latency = latency
+    api.start()
+    try:
+        env = dict(GITHUB_API_URL=api.url, INPUT_CONCURRENT_API_CALLS=str(concurrent_api_calls).lower())
+        with patch.dict(os.environ, env):
+            seconds = run_main()
+    finally:
+        api.stop()
+
+    return dict(
+        name='main_http',
+        latency=latency,
+        concurrent_api_calls=concurrent_api_calls,
+        seconds=seconds,
+    )
+
+
+def bench_planner(latency: float) -> List[dict]:
+    api = FakeGitHubAPI(repository=os.environ['GITHUB_REPOSITORY'])
+    api.add_release(tag_name='v2024.101.1')
+    api.release_notes_body = synthetic_release_body(lines=100)
+    api.latency = latency
+    api.start()
+    try:
+        with main.ReleasePlanner(repository=os.environ['GITHUB_REPOSITORY'], api_url=api.url) as planner, \
+                patch('builtins.print'):
+            durations = []
+            for run_index in range(PLANNER_RUNS):
+                event = dict(commits=[dict(timestamp=f'2024-01-02T03:04:{run_index:02d}Z')])
+                start = time.perf_counter()
+                planner.plan(github_event=event, github_sha='0' * 40)
+                durations.append(time.perf_counter() - start)
+    finally:
+        api.stop()
+
+    return [
+        dict(name='planner_first_run', latency=latency, seconds=durations[0]),
+        dict(name='planner_warm_run', latency=latency, seconds=sum(durations[1:]) / len(durations[1:])),
+    ]
+
+
+def bench_session(latency: float, pooled: bool) -> dict:
+    api = FakeGitHubAPI(repository=os.environ['GITHUB_REPOSITORY'])
+    api.latency = latency
+    api.start()
+    sessions = []
+
+    def new_session() -> requests.Session:
+        sessions.append(main.create_session())
+        return sessions[-1]
+
+    try:
+        with patch.dict(os.environ, dict(GITHUB_API_URL=api.url)), \
+                patch.object(main, 'get_session', main.get_session if pooled else new_session):
+            start = time.perf_counter()
+            for _ in range(SESSION_REQUESTS):
+                main.github_api_request('GET', f'/repos/{os.environ["GITHUB_REPOSITORY"]}')
+            seconds = time.perf_counter() - start
+    finally:
+        for session in sessions:
+            session.close()
+        api.stop()
+
+    return dict(
+        name='session',
+        latency=latency,
+        pooled=pooled,
+        requests=SESSION_REQUESTS,
+        seconds=seconds,
+    )
+
+
+def run(quick: bool = False) -> List[dict]:
+    sizes = QUICK_RELEASE_NOTES_LINES if quick else RELEASE_NOTES_LINES
+    results = [bench(release_notes_lines=lines) for lines in sizes]
+    for latency in LATENCIES:
+        for concurrent_api_calls in (False, True):
+            results.append(bench_http(latency=latency, concurrent_api_calls=concurrent_api_calls))
+        results.extend(bench_planner(latency=latency))
+        for pooled in (False, True):
+            results.append(bench_session(latency=latency, pooled=pooled))
+    return results
@@ -0,0 +1,75 @@
+"""
+Benchmark ``process_release_body`` on synthetic release notes.
+"""
+# standard imports
+import time
+from typing import List
+
+# local imports
+from action import main
+
+SIZES = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+QUICK_SIZES = (10, 100, 1_000, 10_000)
+CONTRIBUTORS = (1, 100, 10_000)
+
+
+def synthetic_release_body(lines: int, contributors: int = 100) -> str:
+    """
+    Build a synthetic "What's Changed" release body.
+
+    Parameters
+    ----------
+    lines : int
+        Number of PR lines.
+    contributors : int
+        Number of distinct contributors.
+
+    Returns
+    -------
+    str
+        The release body.
+    """
+    body = ["## What's Changed\n"]
+    for i in range(lines):
+        body.append(f'* fix: change number {i} by @user-{i % contributors} in '
+                    f'https://github.com/LizardByte/Sunshine/pull/{i}\n')
+    body.append('\n## New Contributors\n* @user-0 made their first contribution\n')
+    return ''.join(body)
+
+
+def bench(lines: int, contributors: int = 100) -> dict:
+    """
+    Time ``process_release_body`` on a synthetic release body.
+
+    Parameters
+    ----------
+    lines : int
+        Number of PR lines.
+    contributors : int
+        Number of distinct contributors.
+
+    Returns
+    -------
+    dict
+        Benchmark result.
+    """
+    release_body = synthetic_release_body(lines=lines, contributors=contributors)
+    start = time.perf_counter()
+    main.process_release_body(release_body=release_body)
+    seconds = time.perf_counter() - start
+    return dict(
+        name='process_release_body',
+        lines=lines,
+        contributors=contributors,
+        seconds=seconds,
+        us_per_line=seconds / lines * 1e6,
+    )
+
+
+def run(quick: bool = False) -> List[dict]:
+    results = []
+    for lines in QUICK_SIZES if quick else SIZES:
+        for contributors in CONTRIBUTORS:
+            if contributors <= lines:
+                results.append(bench(lines=lines, contributors=contributors))
+    return results
@@ -0,0 +1,143 @@
+"""
+Run the benchmark suite and store the results as JSON.
+
+Run from the repository root:
+
+    python tests/benchmarks/run.py --output benchmark.json
+    python tests/benchmarks/run.py --output new.json --compare benchmark.json
+
+Each ``bench_*.py`` module in this directory provides a ``run(quick: bool) -> List[dict]`` function. Every result has
+a ``name``, the benchmark parameters, and ``seconds``. Results of two runs are matched by name and parameters.
+"""
+# standard imports
+import argparse
+import datetime
+import glob
+import importlib
+import json
+import os
+import platform
+import sys
+from typing import List
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(os.path.dirname(BENCHMARK_DIR))
+
+# repository that the benchmarks send their API calls for, unless one is set
+os.environ.setdefault('GITHUB_REPOSITORY', 'LizardByte/setup-release-action')
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+
+def result_key(result: dict) -> str:
+    """
+    Get the key used to match results of two runs.
+
+    Parameters
+    ----------
+    result : dict
+        Benchmark result.
+
+    Returns
+    -------
+    str
+        The name and parameters of the result.
+    """
+    params = {k: v for k, v in result.items() if k not in ('seconds', 'us_per_line', 'us_per_item', 'peak_bytes')}
+    return json.dumps(params, sort_keys=True)
+
+
+def run_benchmarks(quick: bool = False, only: str = '') -> List[dict]:
+    """
+    Run all benchmark modules.
+
+    Parameters
+    ----------
+    quick : bool
+        Skip the largest sizes.
+    only : str
+        Only run modules whose name contains this string.
+
+    Returns
+    -------
+    List[dict]
+        Benchmark results.
+    """
+    results = []
+    for path in sorted(glob.glob(os.path.join(BENCHMARK_DIR, 'bench_*.py'))):
+        module_name = os.path.splitext(os.path.basename(path))[0]
+        if only not in module_name:
+            continue
+        module = importlib.import_module(module_name)
+        for result in module.run(quick=quick):
+            print(f'{result["name"]}: {result_key(result)} {result["seconds"]:.6f}s', file=sys.stderr)
+            results.append(result)
+    return results
+
+
+def compare(results: List[dict], baseline: List[dict], threshold: float) -> List[str]:
+    """
+    Compare results against a baseline run.
+
+    Parameters
+    ----------
+    results : List[dict]
+        Results of this run.
+    baseline : List[dict]
+        Results of the baseline run.
+    threshold : float
+        Allowed slowdown, e.g. ``0.2`` for 20%.
+
+    Returns
+    -------
+    List[str]
+        Description of each regression.
+    """
+    baseline_seconds = {result_key(result): result['seconds'] for result in baseline}
+    regressions = []
+    for result in results:
+        key = result_key(result)
+        if key not in baseline_seconds or not baseline_seconds[key]:
+            continue
+        ratio = result['seconds'] / baseline_seconds[key]
+        if ratio > 1 + threshold:
+            regressions.append(f'{key}: {baseline_seconds[key]:.6f}s -> {result["seconds"]:.6f}s ({ratio:.2f}x)')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the setup-release-action benchmark suite.')
+    parser.add_argument('--output', help='File to write the results to.')
+    parser.add_argument('--compare', help='Results of a previous run to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed slowdown before failing.')
+    parser.add_argument('--quick', action='store_true', help='Skip the largest sizes.')
+    parser.add_argument('--only', default='', help='Only run benchmark modules whose name contains this string.')
+    args = parser.parse_args()
+
+    results = run_benchmarks(quick=args.quick, only=args.only)
+    report = dict(
+        created_at=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        results=results,
+    )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results=results, baseline=baseline, threshold=args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
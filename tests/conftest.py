@@ -1,14 +1,17 @@
 # standard imports
 import os
+import re
+import subprocess
+import threading
 from unittest.mock import patch, Mock
 
 # lib imports
 from dotenv import load_dotenv
 import pytest
-import requests
 
 # local imports
 from action import main
+from fake_github_api import FakeGitHubAPI
 
 # set environment variables
 load_dotenv()
@@ -23,20 +26,44 @@ except KeyError:
     os.environ['INPUT_GITHUB_TOKEN'] = ''
     GITHUB_TOKEN = os.environ['INPUT_GITHUB_TOKEN']
 
-GITHUB_HEADERS = {'Authorization': f'token {GITHUB_TOKEN}'}
-
 # globals
-COMMIT = None
 DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), 'data')
+CASSETTE_DIRECTORY = os.path.join(DATA_DIRECTORY, 'cassettes')
+
+
+def get_cassette_path(test_name: str) -> str:
+    file_name = re.sub(r'[^\w.-]+', '_', test_name).strip('_')
+    return os.path.join(CASSETTE_DIRECTORY, f'{file_name}.jsonl')
+
+
+def pytest_addoption(parser):
+    parser.addoption('--record-cassettes', action='store_true',
+                     help='Record the API calls of the tests that have no cassette yet, to tests/data/cassettes.')
 
 
 def pytest_runtest_setup(item):
-    if 'github_token' in item.fixturenames and not GITHUB_TOKEN:
-        pytest.skip('INPUT_GITHUB_TOKEN environment variable not set')
+    if 'github_token' in item.fixturenames and not GITHUB_TOKEN and not os.path.exists(get_cassette_path(item.name)):
+        pytest.skip('INPUT_GITHUB_TOKEN environment variable not set, and no cassette recorded')
+
+
+@pytest.fixture(scope='function')
+def api_cassette(request):
+    # replay the API calls of the test from its cassette, or record it with --record-cassettes if there is none yet
+    path = get_cassette_path(request.node.name)
+    if os.path.exists(path):
+        mode = 'replay'
+    elif request.config.getoption('--record-cassettes'):
+        mode = 'record'
+    else:
+        yield None
+        return
 
+    with main.use_cassette(session=main.SESSION, path=path, mode=mode) as adapter:
+        yield adapter
 
-@pytest.fixture(scope='session')
-def github_token():
+
+@pytest.fixture(scope='function')
+def github_token(api_cassette):
     yield
 
 
@@ -72,26 +99,72 @@ def github_step_summary_file():
 
 @pytest.fixture(scope='function')
 def latest_commit(github_token):
-    global COMMIT
     original_sha = os.environ.get('GITHUB_SHA', '')
 
-    if not COMMIT:
-        # get commits on the default branch
-        github_api_url = f"https://api.github.com/repos/{os.environ['GITHUB_REPOSITORY']}/commits"
-        response = requests.get(
-            url=github_api_url,
-            headers=GITHUB_HEADERS,
-            params={'sha': 'master'},
-        )
-        data = response.json()
-        COMMIT = data[0]['sha']
+    # get commits on the default branch, through the session, so the cassette of the test has them
+    response = main.github_api_request(
+        'GET', f"/repos/{os.environ['GITHUB_REPOSITORY']}/commits", params={'sha': 'master', 'per_page': 1})
+    commit = response.json()[0]['sha']
 
-    os.environ['GITHUB_SHA'] = COMMIT
-    yield COMMIT
+    os.environ['GITHUB_SHA'] = commit
+    yield commit
 
     os.environ['GITHUB_SHA'] = original_sha
 
 
+@pytest.fixture(scope='function')
+def fake_github_api():
+    api = FakeGitHubAPI(repository=os.environ['GITHUB_REPOSITORY'])
+    api.start()
+
+    with patch.dict(os.environ, GITHUB_API_URL=api.url):
+        yield api
+
+    api.stop()
+
+
+@pytest.fixture(scope='function')
+def webhook_server(fake_github_api):
+    server = main.WebhookServer(server_address=('127.0.0.1', 0), max_workers=2)
+    thread = threading.Thread(target=server.serve_forever, kwargs=dict(poll_interval=0.05), daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.fixture(scope='function')
+def git_workspace(tmp_path):
+    original_value = os.environ['GITHUB_WORKSPACE']
+    os.environ['GITHUB_WORKSPACE'] = str(tmp_path)
+
+    def git(*args, email='12345+octocat@users.noreply.github.com', name='The Octocat'):
+        env = dict(
+            os.environ,
+            GIT_AUTHOR_NAME=name,
+            GIT_AUTHOR_EMAIL=email,
+            GIT_COMMITTER_NAME=name,
+            GIT_COMMITTER_EMAIL=email,
+        )
+        subprocess.run(['git', '-C', str(tmp_path), *args], check=True, capture_output=True, env=env)
+
+    git('init', '--initial-branch=master')
+    git('commit', '--allow-empty', '-m', 'Initial commit')
+    git('tag', 'v2024.101.1')
+    git('commit', '--allow-empty', '-m', 'feat: add a feature (#1)')
+    git('commit', '--allow-empty', '-m', 'chore: direct push without a PR')
+    git('commit', '--allow-empty', '-m', 'fix: fix a bug (#2)', email='jane@example.com', name='Jane Doe')
+    git('commit', '--allow-empty', '-m', 'build(deps): bump foo (#3)',
+        email='49699333+dependabot[bot]@users.noreply.github.com', name='dependabot[bot]')
+
+    yield tmp_path
+
+    os.environ['GITHUB_WORKSPACE'] = original_value
+
+
 @pytest.fixture(scope='function')
 def dummy_github_push_event_path():
     original_value = os.getenv('GITHUB_EVENT_PATH', os.path.join(DATA_DIRECTORY, 'dummy_github_event.json'))
@@ -124,17 +197,29 @@ def input_dotnet(request):
     del os.environ['INPUT_DOTNET']
 
 
+@pytest.fixture(scope='function')
+def input_api_backend_graphql():
+    os.environ['INPUT_API_BACKEND'] = 'graphql'
+    main.GRAPHQL_REPO_STATE.clear()
+    yield
+
+    del os.environ['INPUT_API_BACKEND']
+    main.GRAPHQL_REPO_STATE.clear()
+
+
 @pytest.fixture(scope='function')
 def requests_get_error():
-    original_get = requests.get
+    original_request = main.SESSION.request
 
     mock_response = Mock()
     mock_response.status_code = 500
-    requests.get = Mock(return_value=mock_response)
+    mock_response.headers = {}
+    main.SESSION.request = Mock(return_value=mock_response)
 
-    yield
+    with patch('action.main.time.sleep'):
+        yield
 
-    requests.get = original_get
+    main.SESSION.request = original_request
 
 
 @pytest.fixture(scope='function', params=[True, False])
@@ -155,36 +240,38 @@ def mock_get_push_event_details(request):
 
 @pytest.fixture(scope='function', params=[True, False])
 def mock_get_repo_squash_and_merge_required(request):
-    original_get = requests.get
+    original_request = main.SESSION.request
 
     mock_response = Mock()
     mock_response.status_code = 200
+    mock_response.headers = {}
     mock_response.json.return_value = {
         'allow_squash_merge': True,
         'allow_merge_commit': not request.param,
         'allow_rebase_merge': not request.param,
     }
 
-    requests.get = Mock(return_value=mock_response)
+    main.SESSION.request = Mock(return_value=mock_response)
 
     yield request.param
 
-    requests.get = original_get
+    main.SESSION.request = original_request
 
 
 @pytest.fixture(scope='function')
 def mock_get_repo_squash_and_merge_required_key_error():
-    original_get = requests.get
+    original_request = main.SESSION.request
 
     mock_response = Mock()
     mock_response.status_code = 200
+    mock_response.headers = {}
     mock_response.json.return_value = {}
 
-    requests.get = Mock(return_value=mock_response)
+    main.SESSION.request = Mock(return_value=mock_response)
 
     yield
 
-    requests.get = original_get
+    main.SESSION.request = original_request
 
 
 @pytest.fixture(scope='function')
@@ -0,0 +1,247 @@
+# standard imports
+import hashlib
+import http.server
+import json
+import re
+import sys
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+class FakeGitHubAPI:
+    """
+    Local stand-in for the GitHub REST API endpoints used by the action.
+
+    Serves ``/repos/{repo}``, ``/releases``, ``/releases/latest``, ``/releases/tags/{tag}``,
+    ``/releases/generate-notes``, ``/commits/{sha}``, ``/compare/{base}...{head}`` and ``/pulls/{number}`` over HTTP
+    on localhost, with configurable latency, rate limit headers, 5xx bursts and large payloads.
+
+    Attributes
+    ----------
+    repositories : set
+        Names of the repositories served. They all share the same settings and releases.
+    repo_settings : dict
+        Response of ``/repos/{repo}``.
+    releases : dict
+        Releases by tag name. The last added release is the latest release.
+    release_notes_body : str
+        Body returned by ``/releases/generate-notes``.
+    release_notes_status : int
+        Status code of ``/releases/generate-notes``.
+    commits : dict
+        Commit timestamps by SHA.
+    compare_commits : list
+        Commit objects returned by ``/compare/{base}...{head}``, oldest first, for any range.
+    pull_requests : dict
+        Pull request objects by number.
+    latency : float
+        Delay in seconds before every response.
+    rate_limit_remaining : Optional[int]
+        Remaining rate limit, decremented by every request that is not a ``304 Not Modified``. ``None`` disables the
+        rate limit headers. Requests are rejected with ``403`` once it reaches zero.
+    server_errors : int
+        Number of upcoming requests to fail with ``502``.
+    stalled_requests : int
+        Number of upcoming requests to delay by ``stall`` seconds, on top of ``latency``.
+    stall : float
+        Extra delay in seconds of stalled requests.
+    release_assets : int
+        Number of assets added to every release object, to produce large payloads.
+    requests : list
+        Log of the received requests as ``(method, path, headers)`` tuples.
+    """
+    def __init__(self, repository: str):
+        self.repository = repository
+        self.repositories = {repository}
+        self.repo_settings = dict(
+            full_name=repository,
+            allow_squash_merge=True,
+            allow_merge_commit=False,
+            allow_rebase_merge=False,
+        )
+        self.releases = {}
+        self.release_notes_body = ''
+        self.release_notes_status = 200
+        self.commits = {}
+        self.compare_commits = []
+        self.pull_requests = {}
+        self.latency = 0.0
+        self.rate_limit_remaining = None
+        self.rate_limit_reset = int(time.time()) + 3600
+        self.server_errors = 0
+        self.stalled_requests = 0
+        self.stall = 1.0
+        self.release_assets = 0
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def add_release(self, tag_name: str, **kwargs):
+        self.releases[tag_name] = dict(tag_name=tag_name, body='', **kwargs)
+
+    def add_compare_commit(self, message: str, login: Optional[str] = None, name: str = 'The Octocat'):
+        sha = hashlib.sha1(f'{len(self.compare_commits)}{message}'.encode('utf-8')).hexdigest()
+        self.compare_commits.append(dict(
+            sha=sha,
+            commit=dict(message=message, author=dict(name=name, email=f'{name}@example.com')),
+            author=dict(login=login) if login else None,
+        ))
+
+    def add_pull_request(self, number: int, labels: tuple = (), merged: bool = True):
+        self.pull_requests[number] = dict(
+            number=number,
+            labels=[dict(name=label) for label in labels],
+            merged_at='2024-01-01T00:00:00Z' if merged else None,
+        )
+
+    def start(self):
+        api = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                api._handle(self)
+
+            def do_HEAD(self):
+                api._handle(self)
+
+            def do_POST(self):
+                api._handle(self)
+
+        class Server(http.server.ThreadingHTTPServer):
+            def handle_error(self, request, client_address):
+                # clients may close the connection without reading a whole response
+                if not isinstance(sys.exc_info()[1], ConnectionError):
+                    super().handle_error(request, client_address)
+
+        self._server = Server(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs=dict(poll_interval=0.05), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def _release_object(self, release: dict) -> dict:
+        assets = [
+            dict(
+                id=i,
+                name=f'asset-{i}.zip',
+                browser_download_url=f'https://github.com/{self.repository}/releases/download/{release["tag_name"]}/'
+                                     f'asset-{i}.zip',
+                size=1024 * i,
+            ) for i in range(self.release_assets)
+        ]
+        return dict(release, assets=assets)
+
+    def _route(self, method: str, path: str, query: dict, body: Optional[dict]) -> tuple:
+        match = re.fullmatch(r'/repos/(?P<repository>[^/]+/[^/]+)(?P<endpoint>/.*)?', path)
+        if not match or match.group('repository') not in self.repositories:
+            return 404, dict(message='Not Found')
+        endpoint = match.group('endpoint') or ''
+        read = method in ('GET', 'HEAD')
+
+        if read and endpoint == '':
+            return 200, dict(self.repo_settings, full_name=match.group('repository'))
+        if read and endpoint == '/releases':
+            # newest first, like the API
+            per_page = int(query.get('per_page', ['30'])[0])
+            page = int(query.get('page', ['1'])[0])
+            releases = list(reversed(self.releases.values()))[(page - 1) * per_page:page * per_page]
+            return 200, [self._release_object(release=release) for release in releases]
+        if read and endpoint == '/releases/latest':
+            if not self.releases:
+                return 404, dict(message='Not Found')
+            return 200, self._release_object(release=list(self.releases.values())[-1])
+        if read and endpoint.startswith('/releases/tags/'):
+            release = self.releases.get(unquote(endpoint[len('/releases/tags/'):]))
+            if not release:
+                return 404, dict(message='Not Found')
+            return 200, self._release_object(release=release)
+        if read and endpoint.startswith('/commits/'):
+            sha = endpoint[len('/commits/'):]
+            if sha not in self.commits:
+                return 404, dict(message='Not Found')
+            return 200, dict(sha=sha, commit=dict(committer=dict(date=self.commits[sha])))
+        if read and endpoint.startswith('/compare/'):
+            per_page = int(query.get('per_page', ['250'])[0])
+            page = int(query.get('page', ['1'])[0])
+            return 200, dict(
+                total_commits=len(self.compare_commits),
+                commits=self.compare_commits[(page - 1) * per_page:page * per_page],
+            )
+        if read and endpoint.startswith('/pulls/'):
+            pull_request = self.pull_requests.get(int(endpoint[len('/pulls/'):]))
+            if not pull_request:
+                return 404, dict(message='Not Found')
+            return 200, pull_request
+        if method == 'POST' and endpoint == '/releases/generate-notes':
+            if self.release_notes_status != 200:
+                return self.release_notes_status, dict(message='Validation Failed')
+            return 200, dict(name=body.get('tag_name', ''), body=self.release_notes_body)
+        return 404, dict(message='Not Found')
+
+    def _handle(self, handler: http.server.BaseHTTPRequestHandler):
+        length = int(handler.headers.get('Content-Length', 0))
+        body = json.loads(handler.rfile.read(length)) if length else None
+        url = urlsplit(handler.path)
+        path = url.path
+
+        with self._lock:
+            self.requests.append((handler.command, path, dict(handler.headers)))
+            server_error = self.server_errors > 0
+            if server_error:
+                self.server_errors -= 1
+            rate_limited = self.rate_limit_remaining == 0
+            stalled = self.stalled_requests > 0
+            if stalled:
+                self.stalled_requests -= 1
+
+        if self.latency:
+            time.sleep(self.latency)
+        if stalled:
+            time.sleep(self.stall)
+
+        if server_error:
+            status, payload = 502, dict(message='Server Error')
+        elif rate_limited:
+            status, payload = 403, dict(message='API rate limit exceeded')
+        else:
+            status, payload = self._route(method=handler.command, path=path, query=parse_qs(url.query), body=body)
+
+        content = json.dumps(payload).encode('utf-8')
+        etag = f'"{hashlib.sha256(content).hexdigest()}"'
+        if status == 200 and handler.headers.get('If-None-Match') == etag:
+            status, content = 304, b''
+
+        headers = {'Content-Type': 'application/json', 'Content-Length': str(len(content))}
+        if status == 200:
+            headers['ETag'] = etag
+        with self._lock:
+            if self.rate_limit_remaining is not None:
+                if status not in (304, 403):
+                    self.rate_limit_remaining = max(0, self.rate_limit_remaining - 1)
+                headers['X-RateLimit-Remaining'] = str(self.rate_limit_remaining)
+                headers['X-RateLimit-Reset'] = str(self.rate_limit_reset)
+
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        if handler.command != 'HEAD':
+            handler.wfile.write(content)
@@ -1,9 +1,22 @@
 # standard imports
+import collections
+import concurrent.futures
+import hashlib
+import hmac
+import io
+import json
 import os
+import re
+import subprocess
+import sys
+import time
 from typing import Dict, Tuple, Union
+from unittest.mock import Mock, patch
+from urllib.parse import urlsplit
 
 # lib imports
 import pytest
+import requests
 
 # local imports
 from action import main
@@ -93,6 +106,43 @@ def test_timestamp_class(iso_timestamp: Tuple[str, Dict[str, Union[int, str]]]):
                               f"self.second='{iso_timestamp[1]['second']}'")
 
 
+@pytest.mark.parametrize('iso_timestamp, expected_version, expected_dotnet_version', [
+    ('1970-01-01T00:00:00Z', '1970.101.0', '1970.101.0.0'),
+    ('2023-11-27T23:58:28Z', '2023.1127.235828', '2023.1127.2358.28'),
+    ('2023-01-25T10:43:35Z', '2023.125.104335', '2023.125.1043.35'),
+    ('2024-07-14T13:17:25-04:00', '2024.714.171725', '2024.714.1717.25'),
+    ('2024-07-22T22:17:25-04:00', '2024.723.21725', '2024.723.217.25'),
+])
+def test_format_release_version(iso_timestamp, expected_version, expected_dotnet_version):
+    timestamp = main.TimestampUTC(iso_timestamp=iso_timestamp)
+
+    assert main.format_release_version(timestamp=timestamp) == expected_version
+    assert main.format_release_version(timestamp=timestamp, dotnet=True) == expected_dotnet_version
+
+    result = main.compute_release_versions(timestamps=[iso_timestamp])
+    assert result['versions'] == [expected_version]
+    assert result['dotnet_versions'] == [expected_dotnet_version]
+
+
+def test_compute_release_versions_collisions():
+    result = main.compute_release_versions(timestamps=iter([
+        '2024-07-14T17:17:25Z',
+        '2024-07-14T17:17:26Z',
+        '2024-07-14T13:17:25-04:00',  # the same second as the first timestamp
+        '2024-07-14T17:17:27Z',
+        '2024-07-14T17:17:25Z',
+    ]))
+
+    assert result['versions'] == [
+        '2024.714.171725', '2024.714.171726', '2024.714.171725', '2024.714.171727', '2024.714.171725']
+    assert result['collisions'] == {'2024.714.171725': [0, 2, 4]}
+
+
+def test_timestamp_class_slots():
+    with pytest.raises(AttributeError):
+        main.TimestampUTC(iso_timestamp='2024-07-14T17:17:25Z').build = '1'
+
+
 @pytest.mark.parametrize('message', [
     'foo',
     'bar',
@@ -106,9 +156,27 @@ def test_append_github_step_summary(github_step_summary_file, message):
     assert output.endswith(f"{message}\n")
 
 
+def parse_github_output(output: str) -> dict:
+    outputs = {}
+    lines = iter(output.split('\n'))
+    for line in lines:
+        if not line:
+            continue
+        output_name, delimiter = line.split('<<', 1)
+        assert delimiter.startswith('ghadelimiter_')
+        value_lines = []
+        for value_line in lines:
+            if value_line == delimiter:
+                break
+            value_lines.append(value_line)
+        outputs[output_name] = '\n'.join(value_lines)
+    return outputs
+
+
 @pytest.mark.parametrize('outputs', [
     ('test_1', 'foo'),
     ('test_2', 'bar'),
+    ('test_3', 'foo\nEOF\nbar'),
 ])
 def test_set_github_action_output(github_output_file, outputs):
     main.set_github_action_output(output_name=outputs[0], output_value=outputs[1])
@@ -116,21 +184,435 @@ def test_set_github_action_output(github_output_file, outputs):
     with open(github_output_file, 'r') as f:
         output = f.read()
 
-    assert output.endswith(f"{outputs[0]}<<EOF\n{outputs[1]}\nEOF\n")
+    assert parse_github_output(output=output) == {outputs[0]: outputs[1]}
+
+
+def test_get_heredoc_delimiter():
+    with patch('action.main.uuid.uuid4', side_effect=['a', 'b']):
+        assert main.get_heredoc_delimiter(value='foo\nghadelimiter_a\nbar') == 'ghadelimiter_b'
+
+
+def test_github_file_writer(github_output_file, github_step_summary_file):
+    writer = main.GitHubFileWriter()
+    writer.set_output(output_name='foo', output_value='bar')
+    writer.set_output(output_name='body', output_value='line\nEOF\nline')
+    writer.append_summary(message='# Summary')
+    writer.append_summary(message='done')
+
+    with open(github_output_file, 'r') as f:
+        assert f.read() == ''
+
+    with patch('builtins.open', wraps=open) as mock_open:
+        writer.flush()
+    assert mock_open.call_count == 2
+
+    with open(github_output_file, 'r') as f:
+        assert parse_github_output(output=f.read()) == {'foo': 'bar', 'body': 'line\nEOF\nline'}
+    with open(github_step_summary_file, 'r') as f:
+        assert f.read() == '# Summary\ndone\n'
+
+    # flushing again does not write anything
+    writer.flush()
+    with open(github_step_summary_file, 'r') as f:
+        assert f.read() == '# Summary\ndone\n'
+
+
+def test_github_file_writer_outside_workflow():
+    writer = main.GitHubFileWriter()
+    writer.set_output(output_name='foo', output_value='bar')
+    writer.append_summary(message='# Summary')
+
+    env = {key: value for key, value in os.environ.items() if key not in ('GITHUB_OUTPUT', 'GITHUB_STEP_SUMMARY')}
+    with patch.dict(os.environ, env, clear=True), patch('builtins.open') as mock_open:
+        writer.flush()
+    mock_open.assert_not_called()
+    assert writer.outputs == writer.summary == []
+
+
+def test_create_session():
+    session = main.create_session(token='abc')
+    request = session.prepare_request(requests.Request('GET', f'{main.get_api_url()}/repos/foo/bar'))
+
+    assert request.headers['Authorization'] == 'token abc'
+    assert session.get_adapter(main.get_api_url())._pool_maxsize == main.HTTP_POOL_SIZE
+
+
+@pytest.mark.parametrize('token, expected_header', [
+    ('abc', 'token abc'),
+    ('', None),
+])
+def test_create_session_env_token(token, expected_header):
+    session = main.create_session()
+    with patch.dict(os.environ, INPUT_GITHUB_TOKEN=token):
+        request = session.prepare_request(requests.Request('GET', f'{main.get_api_url()}/repos/foo/bar'))
+
+    assert request.headers.get('Authorization') == expected_header
+
+
+def test_github_api_request():
+    with patch.object(main.SESSION, 'request', return_value=Mock(status_code=200, headers={})) as mock_request:
+        main.github_api_request('GET', '/repos/foo/bar', params={'a': 1})
+
+    mock_request.assert_called_once_with(
+        method='GET',
+        url=f'{main.get_api_url()}/repos/foo/bar',
+        params={'a': 1},
+        timeout=main.API_TIME_BUDGET,
+    )
+
+
+@pytest.mark.parametrize('api_url, graphql_url, expected_url', [
+    ('https://api.github.com', None, 'https://api.github.com/graphql'),
+    ('https://ghes.example.com/api/v3', None, 'https://ghes.example.com/api/graphql'),
+    ('https://ghes.example.com/api/v3', 'https://graphql.example.com', 'https://graphql.example.com'),
+])
+def test_github_api_request_graphql(api_url, graphql_url, expected_url):
+    env = {key: value for key, value in os.environ.items() if key != 'GITHUB_GRAPHQL_URL'}
+    env.update(GITHUB_API_URL=api_url, **({'GITHUB_GRAPHQL_URL': graphql_url} if graphql_url else {}))
+    with patch.dict(os.environ, env, clear=True), \
+            patch.object(main.SESSION, 'request', return_value=Mock(status_code=200, headers={})) as mock_request:
+        main.github_api_request('POST', '/graphql', json={})
+        assert mock_request.call_args.kwargs['url'] == expected_url
+
+        # a planner with an API URL of its own uses the GraphQL URL that goes with it
+        planner = main.ReleasePlanner(repository='o/r', api_url=api_url, session=main.SESSION)
+        assert planner.graphql_url == main.get_default_graphql_url(api_url=api_url)
+        with planner.activate():
+            main.github_api_request('POST', '/graphql', json={})
+        assert mock_request.call_args.kwargs['url'] == main.get_default_graphql_url(api_url=api_url)
+
+        planner = main.ReleasePlanner(repository='o/r', graphql_url='https://other.example.com/graphql')
+        assert planner.graphql_url == 'https://other.example.com/graphql'
+
+
+def test_github_api_request_cache(tmp_path):
+    os.environ['INPUT_API_CACHE_DIR'] = str(tmp_path)
+
+    fresh_response = Mock()
+    fresh_response.status_code = 200
+    fresh_response.headers = {'ETag': '"abc"'}
+    fresh_response.text = '{"tag_name": "v1"}'
+
+    not_modified_response = Mock()
+    not_modified_response.status_code = 304
+    not_modified_response.headers = {}
+
+    try:
+        with patch.object(main.SESSION, 'request', side_effect=[fresh_response, not_modified_response]) as mock_request:
+            assert main.github_api_request('GET', '/foo', cache=True) is fresh_response
+            response = main.github_api_request('GET', '/foo', cache=True)
+    finally:
+        del os.environ['INPUT_API_CACHE_DIR']
+
+    assert response.status_code == 200
+    assert response.json() == {'tag_name': 'v1'}
+    assert 'headers' not in mock_request.call_args_list[0].kwargs
+    assert mock_request.call_args_list[1].kwargs['headers'] == {'If-None-Match': '"abc"'}
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_prune_api_cache(tmp_path):
+    for index in range(4):
+        path = tmp_path / f'{index}.json'
+        path.write_text('x' * 10)
+        os.utime(path, (1000 + index, 1000 + index))
+    os.utime(tmp_path / '0.json', (0, 0))
+
+    os.environ['INPUT_API_CACHE_MAX_AGE'] = str(int(main.time.time()) - 500)
+    os.environ['INPUT_API_CACHE_MAX_SIZE'] = '20'
+    try:
+        main.prune_api_cache(cache_dir=str(tmp_path))
+    finally:
+        del os.environ['INPUT_API_CACHE_MAX_AGE']
+        del os.environ['INPUT_API_CACHE_MAX_SIZE']
+
+    # 0 is too old, 1 is the least recently used entry exceeding the size limit
+    assert sorted(os.listdir(tmp_path)) == ['2.json', '3.json']
+
+
+def test_prune_api_cache_concurrent(tmp_path):
+    for index in range(4):
+        path = tmp_path / f'{index}.json'
+        path.write_text('x' * 10)
+        os.utime(path, (1000 + index, 1000 + index))
+    os.utime(tmp_path / '0.json', (0, 0))
+    entries = list(os.scandir(tmp_path))
+
+    # another run removed an entry after it was listed, and removes the others before this run does
+    os.remove(tmp_path / '3.json')
+    env = dict(INPUT_API_CACHE_MAX_AGE=str(int(main.time.time()) - 500), INPUT_API_CACHE_MAX_SIZE='0')
+    with patch.dict(os.environ, env), patch('action.main.os.scandir', return_value=entries), \
+            patch('action.main.os.remove', side_effect=FileNotFoundError) as mock_remove:
+        main.prune_api_cache(cache_dir=str(tmp_path))
+    assert mock_remove.call_count == 3
+
+
+def test_update_rate_limit():
+    with patch.dict(main.RATE_LIMIT):
+        main.update_rate_limit(response=Mock(headers={'X-RateLimit-Remaining': '5', 'X-RateLimit-Reset': '100'}))
+        assert main.RATE_LIMIT == {'remaining': 5, 'reset': 100}
+        assert main.rate_limit_exhausted()
+
+        main.RATE_LIMIT['remaining'] = main.RATE_LIMIT_RESERVE
+        assert not main.rate_limit_exhausted()
+
+
+def test_github_api_request_non_essential_deferred():
+    with patch.dict(main.RATE_LIMIT, remaining=0), patch.object(main.SESSION, 'request') as mock_request:
+        assert main.github_api_request('GET', '/foo', essential=False) is None
+    mock_request.assert_not_called()
+
+
+@pytest.mark.parametrize('response, expected_delay', [
+    (Mock(status_code=404, headers={}), None),
+    (Mock(status_code=429, headers={'Retry-After': '7'}), 7.0),
+    (Mock(status_code=403, headers={'X-RateLimit-Remaining': '1'}, text='Forbidden'), None),
+    (Mock(status_code=403, headers={'Retry-After': '3'}, text=''), 3.0),
+])
+def test_get_retry_delay(response, expected_delay):
+    assert main.get_retry_delay(response=response, attempt=0) == expected_delay
+
+
+@pytest.mark.parametrize('response', [
+    None,
+    Mock(status_code=503, headers={}),
+    Mock(status_code=403, headers={}, text='You have exceeded a secondary rate limit.'),
+])
+def test_get_retry_delay_backoff(response):
+    for attempt in range(4):
+        assert 0 <= main.get_retry_delay(response=response, attempt=attempt) <= main.API_RETRY_BACKOFF * 2 ** attempt
+
+
+def test_get_retry_delay_rate_limit_reset():
+    response = Mock(status_code=403, headers={
+        'X-RateLimit-Remaining': '0',
+        'X-RateLimit-Reset': str(int(main.time.time()) + 30),
+    })
+    assert 25 < main.get_retry_delay(response=response, attempt=0) <= 30
+
+
+def test_get_retry_delay_retry_after_date():
+    retry_at = main.datetime.datetime.now(tz=main.datetime.timezone.utc) + main.datetime.timedelta(seconds=30)
+    response = Mock(status_code=429, headers={'Retry-After': main.email.utils.format_datetime(retry_at, usegmt=True)})
+    assert 25 < main.get_retry_delay(response=response, attempt=0) <= 30
+
+
+def test_get_retry_delay_retry_after_invalid():
+    response = Mock(status_code=429, headers={'Retry-After': 'soon'})
+    assert 0 <= main.get_retry_delay(response=response, attempt=0) <= main.API_RETRY_BACKOFF
+
+
+def test_send_api_request_retry():
+    responses = [
+        requests.exceptions.ConnectionError(),
+        Mock(status_code=502, headers={}),
+        Mock(status_code=200, headers={'X-RateLimit-Remaining': '42'}),
+    ]
+    with patch.object(main.SESSION, 'request', side_effect=responses) as mock_request, \
+            patch('action.main.time.sleep') as mock_sleep, \
+            patch.dict(main.RATE_LIMIT):
+        response = main.send_api_request('GET', 'https://example.com')
+        assert main.RATE_LIMIT['remaining'] == 42
+
+    assert response is responses[2]
+    assert mock_request.call_count == 3
+    assert mock_sleep.call_count == 2
+
+
+def test_send_api_request_max_retries(requests_get_error):
+    response = main.send_api_request('GET', 'https://example.com')
+
+    assert response.status_code == 500
+    assert main.SESSION.request.call_count == main.API_MAX_RETRIES + 1
+
+
+def test_send_api_request_connection_error():
+    with patch.object(main.SESSION, 'request', side_effect=requests.exceptions.ConnectionError()), \
+            patch('action.main.time.sleep'):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            main.send_api_request('GET', 'https://example.com')
+
+
+def test_send_api_request_wait_too_long():
+    response = Mock(status_code=429, headers={'Retry-After': str(main.API_RETRY_MAX_WAIT + 1)})
+    with patch.object(main.SESSION, 'request', return_value=response) as mock_request:
+        assert main.send_api_request('GET', 'https://example.com') is response
+    mock_request.assert_called_once()
+
+
+def test_send_api_request_time_budget_exceeded(fake_github_api):
+    planner = main.ReleasePlanner(repository=fake_github_api.repository, api_url=fake_github_api.url)
+    with planner.activate():
+        main.ACTIVE_RUN.get()['deadline'] = main.time.monotonic() - 1
+        with pytest.raises(main.APITimeBudgetExceeded):
+            main.github_api_request('GET', f'/repos/{fake_github_api.repository}')
+
+    assert fake_github_api.requests == []
+
+
+def test_send_api_request_time_budget_timeout(fake_github_api):
+    fake_github_api.stalled_requests = 1
+    planner = main.ReleasePlanner(
+        repository=fake_github_api.repository, api_url=fake_github_api.url, inputs=dict(api_time_budget='0.2'))
+
+    start = time.perf_counter()
+    with planner.activate(), pytest.raises(requests.exceptions.Timeout):
+        main.github_api_request('GET', f'/repos/{fake_github_api.repository}')
+    assert time.perf_counter() - start < fake_github_api.stall
+
+
+@pytest.mark.parametrize('percentile, latencies, expected_delay', [
+    ('0', [0.1] * 10, None),
+    ('50', [0.1] * (main.API_LATENCY_MIN_SAMPLES - 1), main.API_HEDGE_DELAY),
+    ('50', [i / 10 for i in range(10, 0, -1)], 0.5),
+    ('95', [i / 10 for i in range(1, 11)], 1.0),
+    ('100', [i / 10 for i in range(1, 11)], 1.0),
+])
+def test_get_hedge_delay(percentile, latencies, expected_delay):
+    planner = main.ReleasePlanner(repository='octo/one', inputs=dict(api_hedge_percentile=percentile))
+    planner.api_latencies.extend(latencies)
+    with planner.activate():
+        assert main.get_hedge_delay() == expected_delay
+
+
+def test_send_api_request_hedged(fake_github_api):
+    fake_github_api.stalled_requests = 1
+    planner = main.ReleasePlanner(
+        repository=fake_github_api.repository, api_url=fake_github_api.url, inputs=dict(api_hedge_percentile='90'))
+    planner.api_latencies.extend([0.01] * main.API_LATENCY_MIN_SAMPLES)
+
+    start = time.perf_counter()
+    with planner.activate() as trace:
+        response = main.github_api_request('GET', f'/repos/{fake_github_api.repository}')
+    assert time.perf_counter() - start < fake_github_api.stall
+
+    assert response.status_code == 200
+    assert trace[0]['hedged'] is True
+    assert len(fake_github_api.requests) == 2
+    assert len(planner.api_latencies) == main.API_LATENCY_MIN_SAMPLES + 1
+
+
+def test_send_api_request_hedged_errors():
+    def request(**kwargs):
+        time.sleep(0.05)
+        raise requests.exceptions.ConnectionError()
+
+    with patch.object(main.SESSION, 'request', side_effect=request) as mock_request:
+        with pytest.raises(requests.exceptions.ConnectionError):
+            main.send_hedged_request('GET', 'https://example.com', delay=0.01)
+    assert mock_request.call_count == 2
 
 
 @pytest.mark.parametrize('version', [
     ('1970.1.1', False),
     ('2023.1127.235828', True),
 ])
-def test_check_release(version):
+def test_check_release(github_token, version):
     assert main.check_release(version=version[0]) == version[1]
 
 
+def graphql_stub(repository: dict, existing_tags: tuple = ()):
+    def request(method, endpoint, **kwargs):
+        assert (method, endpoint) == ('POST', '/graphql')
+        variables = kwargs['json']['variables']
+        assert 'repository(owner: $owner, name: $name)' in kwargs['json']['query']
+        assert [variables['owner'], variables['name']] == os.environ['GITHUB_REPOSITORY'].split('/')
+
+        data = dict(repository)
+        if data:
+            data['release'] = {'id': 'R_1'} if variables['tagName'] in existing_tags else None
+
+        response = Mock()
+        response.json.return_value = {'data': {'repository': data or None}, 'errors': None if data else ['error']}
+        return response
+
+    return Mock(side_effect=request)
+
+
+def test_graphql_repo_state_single_round_trip(input_api_backend_graphql):
+    stub = graphql_stub(
+        repository=dict(
+            squashMergeAllowed=True,
+            mergeCommitAllowed=False,
+            rebaseMergeAllowed=False,
+            latestRelease={'tagName': 'v2023.1127.235828'},
+        ),
+        existing_tags=('v2024.101.1',),
+    )
+
+    with patch('action.main.github_api_request', stub):
+        assert main.get_repo_squash_and_merge_required(tag_name='v2024.101.1') is True
+        assert main.get_latest_release_tag(tag_name='v2024.101.1') == 'v2023.1127.235828'
+        assert main.check_release(version='2024.101.1') is True
+
+    stub.assert_called_once()
+
+
+def test_graphql_repo_state_no_latest_release(input_api_backend_graphql):
+    stub = graphql_stub(repository=dict(
+        squashMergeAllowed=True,
+        mergeCommitAllowed=True,
+        rebaseMergeAllowed=False,
+        latestRelease=None,
+    ))
+
+    with patch('action.main.github_api_request', stub):
+        assert main.get_repo_squash_and_merge_required(tag_name='v1') is False
+        assert main.get_latest_release_tag(tag_name='v1') == ''
+        assert main.check_release(version='1') is False
+
+
+def test_graphql_repo_state_error(input_api_backend_graphql):
+    with patch('action.main.github_api_request', graphql_stub(repository={})):
+        with pytest.raises(KeyError):
+            main.get_repo_squash_and_merge_required()
+
+
 def test_get_repo_default_branch(github_token, github_event_path):
     assert main.get_repo_default_branch() == 'master'
 
 
+def test_get_github_event_memoized(tmp_path):
+    event_path = tmp_path / 'event.json'
+    event_path.write_text(json.dumps(dict(repository=dict(default_branch='master'))))
+
+    with patch.dict(os.environ, GITHUB_EVENT_PATH=str(event_path)), \
+            patch('action.main.json.load', wraps=json.load) as mock_load:
+        assert main.get_github_event() is main.get_github_event()
+        assert main.get_repo_default_branch() == 'master'
+        assert mock_load.call_count == 1
+
+        # a changed file is parsed again
+        event_path.write_text(json.dumps(dict(repository=dict(default_branch='main'))))
+        assert main.get_repo_default_branch() == 'main'
+        assert mock_load.call_count == 2
+
+
+def test_get_github_event_partial(tmp_path):
+    event_path = tmp_path / 'event.json'
+    event_path.write_text(json.dumps(dict(
+        after='abc',
+        commits=[dict(id='abc', timestamp='2024-07-14T17:17:25Z', added=['a.py'], author=dict(name='octocat'))],
+        pull_request=dict(number=1, head=dict(sha='def', ref='feature', repo=dict(name='repo'))),
+        repository=dict(default_branch='master', full_name='octo/repo', owner=dict(login='octo')),
+    )))
+
+    with patch.dict(os.environ, GITHUB_EVENT_PATH=str(event_path), INPUT_PARTIAL_EVENT_PARSE='true'):
+        assert main.get_github_event() == dict(
+            commits=[dict(timestamp='2024-07-14T17:17:25Z')],
+            pull_request=dict(head=dict(sha='def')),
+            repository=dict(default_branch='master'),
+        )
+
+
+def test_get_push_event_details_partial_event_parse(github_event_path, latest_commit):
+    with patch.dict(os.environ, INPUT_PARTIAL_EVENT_PARSE='true'), \
+            patch('action.main.get_repo_squash_and_merge_required', return_value=True):
+        partial_details = main.get_push_event_details()
+    with patch('action.main.get_repo_squash_and_merge_required', return_value=True):
+        assert main.get_push_event_details() == partial_details
+
+
 def test_get_repo_squash_and_merge_required(mock_get_repo_squash_and_merge_required):
     assert main.get_repo_squash_and_merge_required() is mock_get_repo_squash_and_merge_required
 
@@ -163,14 +645,403 @@ def test_process_release_body(release_notes_sample):
     assert result == release_notes_sample[1]
 
 
+@pytest.mark.parametrize('line, expected_line, expected_contributors', [
+    ('* foo by @bar in https://github.com/o/r/pull/1\n',
+     '* foo by [@bar](https://github.com/bar) in [#1](https://github.com/o/r/pull/1)\n',
+     1),
+    ('* @bar made their first contribution\n', '* [@bar](https://github.com/bar) made their first contribution\n', 1),
+    ('* bump @types/node by someone\n', '* bump @types/node by someone\n', 0),
+    ('* revert https://github.com/o/r/pull/2\n', '* revert [#2](https://github.com/o/r/pull/2)\n', 0),
+])
+def test_iter_processed_release_body(line, expected_line, expected_contributors):
+    processed = list(main.iter_processed_release_body(lines=[line]))
+
+    assert processed[0] == expected_line
+    assert processed[-1] == '\n'
+    assert sum('<img ' in chunk for chunk in processed) == expected_contributors
+
+
+@pytest.mark.parametrize('text', [
+    '',
+    '\n',
+    'foo',
+    'foo\nbar',
+    'foo\nbar\n',
+    'foo\r\nbar\rbaz\n\n',
+])
+def test_iter_lines(text):
+    assert list(main.iter_lines(text=text)) == io.StringIO(text).readlines()
+
+
+def test_write_processed_release_body(release_notes_sample):
+    sink = io.StringIO()
+    main.write_processed_release_body(lines=io.StringIO(release_notes_sample[0]), sink=sink)
+    assert sink.getvalue() == release_notes_sample[1]
+
+
+def test_get_git_previous_tag(git_workspace):
+    assert main.get_git_previous_tag(target_commitish='HEAD') == 'v2024.101.1'
+    assert main.get_git_previous_tag(target_commitish='v2024.101.1') == ''
+
+
+def test_iter_git_release_notes(git_workspace):
+    release_notes = ''.join(main.iter_git_release_notes(
+        tag_name='v2024.101.2',
+        target_commitish='HEAD',
+        previous_tag_name='v2024.101.1',
+    ))
+
+    repo = os.environ['GITHUB_REPOSITORY']
+    assert release_notes == (
+        "## What's Changed\n"
+        f"* feat: add a feature by @octocat in https://github.com/{repo}/pull/1\n"
+        f"* fix: fix a bug by Jane Doe in https://github.com/{repo}/pull/2\n"
+        f"* build(deps): bump foo by @dependabot in https://github.com/{repo}/pull/3\n"
+        "\n\n"
+        f"**Full Changelog**: https://github.com/{repo}/compare/v2024.101.1...v2024.101.2"
+    )
+
+
+def test_generate_release_body_git(git_workspace):
+    os.environ['INPUT_RELEASE_NOTES_SOURCE'] = 'git'
+    try:
+        with patch('action.main.github_api_request') as mock_request:
+            release_body = main.generate_release_body(tag_name='v2024.101.2', target_commitish='HEAD')
+    finally:
+        del os.environ['INPUT_RELEASE_NOTES_SOURCE']
+
+    mock_request.assert_not_called()
+    assert '* feat: add a feature by [@octocat](https://github.com/octocat) in [#1](' in release_body
+    assert 'title="octocat: 1 merge"' in release_body
+
+
+def test_generate_git_release_body_no_previous_tag(git_workspace):
+    assert main.generate_git_release_body(tag_name='v2024.101.2', target_commitish='v2024.101.1') == ''
+
+
+def test_generate_git_release_body_no_git(git_workspace):
+    # e.g. git is not installed, or not on the PATH
+    with patch.dict(os.environ, PATH=os.devnull):
+        assert main.generate_git_release_body(tag_name='v2024.101.2', target_commitish='HEAD') == ''
+
+        with patch('action.main.get_git_previous_tag', return_value='v2024.101.1'):
+            assert main.generate_git_release_body(tag_name='v2024.101.2', target_commitish='HEAD') == ''
+
+
+def test_generate_git_release_body_unreachable_previous_tag(git_workspace, tmp_path):
+    with pytest.raises(subprocess.CalledProcessError):
+        ''.join(main.iter_git_release_notes(
+            tag_name='v2024.101.2', target_commitish='HEAD', previous_tag_name='v2023.101.1'))
+
+    # e.g. the previous tag was not fetched by a shallow checkout, so the body is empty and not cached
+    cache_dir = tmp_path / 'cache'
+    env = dict(INPUT_API_CACHE_DIR=str(cache_dir), INPUT_RELEASE_NOTES_SOURCE='git')
+    with patch.dict(os.environ, env), patch('action.main.get_git_previous_tag', return_value='v2023.101.1'):
+        assert main.generate_release_body(tag_name='v2024.101.2', target_commitish='HEAD') == ''
+    assert not list(cache_dir.glob('release-body-*.json'))
+
+
 def test_generate_release_body(github_token):
     assert main.generate_release_body(tag_name='test', target_commitish=os.environ['GITHUB_SHA'])
 
 
+def test_get_latest_release_tag_non_200_status_code(requests_get_error):
+    assert main.get_latest_release_tag() == ''
+
+
+def test_generate_release_body_previous_tag_name(release_notes_sample):
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {'body': release_notes_sample[0]}
+
+    with patch('action.main.get_latest_release_tag') as mock_latest, \
+            patch('action.main.github_api_request', return_value=mock_response) as mock_request:
+        release_body = main.generate_release_body(tag_name='test', target_commitish='abc', previous_tag_name='v1')
+
+    assert release_body == release_notes_sample[1]
+    mock_latest.assert_not_called()
+    assert mock_request.call_args.kwargs['json']['previous_tag_name'] == 'v1'
+
+
+def test_generate_release_body_generate_notes_error():
+    response = Mock(status_code=403)
+    response.raise_for_status.side_effect = requests.HTTPError('403 Client Error')
+    with patch('action.main.github_api_request', return_value=response):
+        assert main.generate_release_body(tag_name='test', target_commitish='abc', previous_tag_name='v1') == ''
+
+
+def test_generate_release_body_compare_fallback(fake_github_api):
+    fake_github_api.release_notes_status = 422
+    for i in range(1, 8):
+        fake_github_api.add_compare_commit(message=f'feat: change {i} (#{i})\n\nbody', login='octocat')
+    fake_github_api.add_compare_commit(message='Merge branch main')
+    fake_github_api.add_compare_commit(message='chore: bump (#8)', name='Jane Doe')
+
+    with patch('action.main.COMPARE_PAGE_SIZE', 2):
+        release_body = main.generate_release_body(
+            tag_name='v2024.101.2', target_commitish='abc', previous_tag_name='v2024.101.1')
+
+    lines = release_body.splitlines()
+    assert lines[0] == "## What's Changed"
+    pull_url = f'https://github.com/{main.get_repository()}/pull'
+    assert lines[1] == f'* feat: change 1 by [@octocat](https://github.com/octocat) in [#1]({pull_url}/1)'
+    assert lines[7] == f'* feat: change 7 by [@octocat](https://github.com/octocat) in [#7]({pull_url}/7)'
+    assert lines[8] == f'* chore: bump by Jane Doe in [#8]({pull_url}/8)'
+    assert '## Contributors' in release_body
+    assert 'Merge branch' not in release_body
+
+    compare_requests = [path for _, path, _ in fake_github_api.requests if '/compare/' in path]
+    assert len(compare_requests) == 5
+
+
+@pytest.mark.parametrize('status, compare', [
+    (401, False),
+    (403, False),
+    (429, False),
+    (422, True),
+    (502, True),
+])
+def test_generate_release_body_generate_notes_error_status(fake_github_api, status, compare):
+    fake_github_api.release_notes_status = status
+    fake_github_api.add_compare_commit(message='fix: a bug (#2)', login='octocat')
+
+    with patch('action.main.time.sleep'):
+        release_body = main.generate_release_body(
+            tag_name='v2024.101.2', target_commitish='abc', previous_tag_name='v2024.101.1')
+
+    # only errors of the endpoint itself fall back to the compare endpoint, not authentication or rate limit errors
+    compare_requests = [path for _, path, _ in fake_github_api.requests if '/compare/' in path]
+    assert bool(compare_requests) is compare
+    assert ('* fix: a bug' in release_body) is compare
+    assert bool(release_body) is compare
+
+
+def test_generate_release_body_compare_source(fake_github_api):
+    fake_github_api.add_compare_commit(message='fix: a bug (#2)', login='octocat')
+
+    with patch.dict(os.environ, INPUT_RELEASE_NOTES_SOURCE='compare'):
+        release_body = main.generate_release_body(
+            tag_name='v2024.101.2', target_commitish='abc', previous_tag_name='v2024.101.1')
+
+    assert '* fix: a bug by [@octocat](https://github.com/octocat)' in release_body
+    assert all(method == 'GET' for method, _, _ in fake_github_api.requests)
+
+
+def test_iter_compare_commits_error(fake_github_api):
+    fake_github_api.server_errors = main.API_MAX_RETRIES + 1
+
+    with patch('action.main.time.sleep'), pytest.raises(requests.HTTPError):
+        list(main.iter_compare_commits(base='v1', head='abc', repository=main.get_repository()))
+
+
 def test_generate_release_body_non_200_status_code(github_token, requests_get_error):
     assert main.generate_release_body(tag_name='test', target_commitish='abc') == ''
 
 
+def test_generate_release_body_cache(fake_github_api, release_notes_sample, tmp_path):
+    fake_github_api.add_release(tag_name='v2024.101.1')
+    fake_github_api.release_notes_body = release_notes_sample[0]
+
+    with patch.dict(os.environ, INPUT_API_CACHE_DIR=str(tmp_path)):
+        release_body = main.generate_release_body(tag_name='v2024.101.2', target_commitish='abc')
+        assert release_body == release_notes_sample[1]
+        assert len(fake_github_api.requests) == 2
+
+        # a re-run for the same release and commit needs no API calls
+        with patch('action.main.process_release_body') as mock_process:
+            assert main.generate_release_body(tag_name='v2024.101.2', target_commitish='abc') == release_body
+        mock_process.assert_not_called()
+        assert len(fake_github_api.requests) == 2
+
+        # a different commit is a different release body
+        main.generate_release_body(tag_name='v2024.101.2', target_commitish='def')
+        assert len(fake_github_api.requests) == 4
+
+
+def test_generate_release_body_cache_empty(fake_github_api, tmp_path):
+    with patch.dict(os.environ, INPUT_API_CACHE_DIR=str(tmp_path)):
+        assert main.generate_release_body(tag_name='v2024.101.2', target_commitish='abc') == ''
+        assert main.generate_release_body(tag_name='v2024.101.2', target_commitish='abc') == ''
+
+    # without a previous release, nothing is cached
+    assert len(fake_github_api.requests) == 2
+    assert not list(tmp_path.glob('release-body-*.json'))
+
+
+def test_generate_release_body_group_by_label(fake_github_api, tmp_path):
+    messages = ['feat: add a feature (#1)', 'fix: a bug (#2)', 'chore: bump a dependency (#3)',
+                'feat!: drop an input (#4)', 'docs: a typo (#5)', 'feat: remove an output (#6)']
+    for message in messages:
+        fake_github_api.add_compare_commit(message=message, login='octocat')
+    fake_github_api.add_pull_request(number=1, labels=('enhancement',))
+    fake_github_api.add_pull_request(number=2, labels=('Bug',))
+    fake_github_api.add_pull_request(number=3, labels=('dependencies',))
+    fake_github_api.add_pull_request(number=4, labels=('feature',))
+    fake_github_api.add_pull_request(number=6, labels=('enhancement', 'breaking'), merged=False)
+
+    env = dict(INPUT_API_CACHE_DIR=str(tmp_path), INPUT_GROUP_BY_LABEL='true', INPUT_RELEASE_NOTES_SOURCE='compare')
+    with patch.dict(os.environ, env):
+        release_body = main.generate_release_body(
+            tag_name='v2024.101.2', target_commitish='abc', previous_tag_name='v2024.101.1')
+
+    entries = [line.split(' by ')[0] for line in release_body.splitlines()[:14]]
+    assert entries == [
+        "## What's Changed",
+        '### Features',
+        '* feat: add a feature',
+        '* :warning: **Breaking:** feat!: drop an input',
+        '* :warning: **Breaking:** feat: remove an output',
+        '',
+        '### Fixes',
+        '* fix: a bug',
+        '',
+        '### Dependencies',
+        '* chore: bump a dependency',
+        '',
+        '### Other Changes',
+        '* docs: a typo',
+    ]
+    assert '## Contributors' in release_body
+    pull_requests = sorted(path for _, path, _ in fake_github_api.requests if '/pulls/' in path)
+    assert pull_requests == [f'/repos/{main.get_repository()}/pulls/{number}' for number in range(1, 7)]
+
+    assert list(tmp_path.glob('release-body-*.json'))
+
+    # merged pull requests are cached, the others are fetched again
+    pull_request_labels = main.PullRequestLabels()
+    with patch.dict(os.environ, INPUT_API_CACHE_DIR=str(tmp_path)):
+        pull_requests = pull_request_labels([
+            f'* change in https://github.com/{main.get_repository()}/pull/{number}\n' for number in range(1, 7)])
+    assert len(pull_requests) == 6
+    assert pull_request_labels.complete
+    assert len([path for _, path, _ in fake_github_api.requests if '/pulls/' in path]) == 8
+
+
+def test_generate_release_body_group_by_label_incomplete(fake_github_api, tmp_path):
+    pull_url = f'https://github.com/{main.get_repository()}/pull'
+    fake_github_api.add_release(tag_name='v2024.101.1')
+    fake_github_api.release_notes_body = (
+        "## What's Changed\n"
+        f"* feat: add a feature by @octocat in {pull_url}/1\n"
+        f"* fix: a bug by @octocat in {pull_url}/2\n"
+        "\n"
+        "## New Contributors\n"
+        f"* @octocat made their first contribution in {pull_url}/3\n"
+    )
+    fake_github_api.add_pull_request(number=1, labels=('enhancement',))
+    fake_github_api.add_pull_request(number=2, labels=('bug',))
+
+    fetch_pull_request = main.fetch_pull_request
+    env = dict(INPUT_API_CACHE_DIR=str(tmp_path), INPUT_GROUP_BY_LABEL='true')
+    with patch.dict(os.environ, env):
+        # the labels of a pull request could not be fetched, so the body is only partly grouped, and not cached
+        with patch('action.main.fetch_pull_request',
+                   side_effect=lambda number, repository: None if number == 2 else fetch_pull_request(
+                       number=number, repository=repository)):
+            release_body = main.generate_release_body(tag_name='v2024.101.2', target_commitish='abc')
+        assert release_body.index('### Features') < release_body.index('### Other Changes') < release_body.index(
+            '* fix: a bug')
+        assert not list(tmp_path.glob('release-body-*.json'))
+
+        release_body = main.generate_release_body(tag_name='v2024.101.2', target_commitish='abc')
+        assert release_body.index('### Fixes') < release_body.index('* fix: a bug')
+        assert '### Other Changes' not in release_body
+        assert list(tmp_path.glob('release-body-*.json'))
+
+    # the pull requests of the other sections are not looked up
+    pull_requests = {path for _, path, _ in fake_github_api.requests if '/pulls/' in path}
+    assert pull_requests == {f'/repos/{main.get_repository()}/pulls/{number}' for number in (1, 2)}
+
+
+def test_iter_grouped_release_notes():
+    pull_url = 'https://github.com/o/r/pull'
+    lines = [
+        "## What's Changed\n",
+        f'* fix: a bug in {pull_url}/1\n',
+        f'* unknown pull request in {pull_url}/2\n',
+        '* no pull request',
+        '\n',
+        "## What's Changed\n",
+        '## New Contributors\n',
+        f'* @octocat made their first contribution in {pull_url}/1\n',
+    ]
+    pull_request_labels = Mock(return_value={('o/r', 1): dict(labels=['bug'], merged=True)})
+
+    assert list(main.iter_grouped_release_notes(lines=lines, pull_request_labels=pull_request_labels)) == [
+        "## What's Changed\n",
+        '### Fixes\n',
+        f'* fix: a bug in {pull_url}/1\n',
+        '\n',
+        '### Other Changes\n',
+        f'* unknown pull request in {pull_url}/2\n',
+        '* no pull request\n',
+        '\n',
+        "## What's Changed\n",
+        '## New Contributors\n',
+        f'* @octocat made their first contribution in {pull_url}/1\n',
+    ]
+    # once per "What's Changed" section, with its entries only
+    assert [call.args[0] for call in pull_request_labels.call_args_list] == [lines[1:4], []]
+
+
+def test_get_pull_requests_graphql(input_api_backend_graphql):
+    def request(method, endpoint, essential=True, **kwargs):
+        assert (method, endpoint, essential) == ('POST', '/graphql', False)
+        assert kwargs['json']['variables'] == dict(owner='o', name='r')
+        numbers = [int(number) for number in re.findall(r'pullRequest\(number: (\d+)\)', kwargs['json']['query'])]
+        response = Mock(status_code=200)
+        response.json.return_value = {'data': {'repository': {
+            f'pr{number}': dict(merged=number != 2, labels=dict(nodes=[dict(name=f'Label-{number}')]))
+            if number != 3 else None
+            for number in numbers
+        }}}
+        return response
+
+    stub = Mock(side_effect=request)
+    with patch('action.main.github_api_request', stub), patch('action.main.PULL_REQUEST_BATCH_SIZE', 2):
+        pull_requests = main.get_pull_requests(numbers=[1, 2, 3, 4, 5], repository='o/r')
+
+    assert stub.call_count == 3
+    assert pull_requests == {
+        1: dict(labels=['label-1'], merged=True),
+        2: dict(labels=['label-2'], merged=False),
+        3: dict(labels=[], merged=False),
+        4: dict(labels=['label-4'], merged=True),
+        5: dict(labels=['label-5'], merged=True),
+    }
+
+
+@pytest.mark.parametrize('concurrent_api_calls', ['true', 'false'])
+def test_main_function_prefetch_latest_release(
+        concurrent_api_calls,
+        dummy_github_push_event_path,
+        github_output_file,
+        github_step_summary_file,
+):
+    os.environ['INPUT_CONCURRENT_API_CALLS'] = concurrent_api_calls
+    push_event_details = {
+        'publish_release': True,
+        'release_commit': 'master',
+        'release_version': 'test',
+    }
+
+    try:
+        with patch('action.main.get_push_event_details', return_value=push_event_details), \
+                patch('action.main.get_latest_release_tag', return_value='v1') as mock_latest, \
+                patch('action.main.generate_release_body', return_value='body') as mock_generate:
+            job_outputs = main.main()
+    finally:
+        del os.environ['INPUT_CONCURRENT_API_CALLS']
+
+    if concurrent_api_calls == 'true':
+        mock_latest.assert_called_once()
+        assert mock_generate.call_args.kwargs['previous_tag_name'] == 'v1'
+    else:
+        mock_latest.assert_not_called()
+        assert mock_generate.call_args.kwargs['previous_tag_name'] is None
+    assert job_outputs['release_body'] == 'body'
+
+
 def test_main_function(
         github_event_path,
         github_output_file,
@@ -184,5 +1055,600 @@ def test_main_function(
     with open(github_output_file, 'r') as f:
         output = f.read()
 
-    for output_name, output_value in job_outputs.items():
-        assert f'{output_name}<<EOF\n{output_value}\nEOF\n' in output
+    assert parse_github_output(output=output) == job_outputs
+
+
+@pytest.mark.parametrize('concurrent_api_calls', ['true', 'false'])
+def test_main_function_fake_api(
+        concurrent_api_calls,
+        dummy_github_push_event_path,
+        fake_github_api,
+        github_output_file,
+        github_step_summary_file,
+        release_notes_sample,
+):
+    fake_github_api.add_release(tag_name='v2024.101.1')
+    fake_github_api.release_notes_body = release_notes_sample[0]
+
+    with patch.dict(os.environ, INPUT_CONCURRENT_API_CALLS=concurrent_api_calls):
+        job_outputs = main.main()
+
+    assert job_outputs['publish_release'] == 'true'
+    assert job_outputs['release_version'] == '2024.613.205503'
+    assert job_outputs['release_body'] == release_notes_sample[1]
+    assert job_outputs['release_generate_release_notes'] == 'false'
+    assert len(fake_github_api.requests) == 3
+
+    with open(github_output_file, 'r') as f:
+        assert parse_github_output(output=f.read()) == job_outputs
+
+
+def test_main_function_fake_api_latency(
+        dummy_github_push_event_path,
+        fake_github_api,
+        github_output_file,
+        github_step_summary_file,
+):
+    fake_github_api.add_release(tag_name='v2024.101.1')
+    fake_github_api.latency = 0.3
+
+    start = time.perf_counter()
+    main.main()
+    elapsed = time.perf_counter() - start
+
+    # the repository settings and the latest release are fetched concurrently, before generating the release notes
+    assert elapsed < 0.85
+
+
+def test_check_release_fake_api(fake_github_api):
+    fake_github_api.add_release(tag_name='v2024.101.1')
+    fake_github_api.release_assets = 500
+
+    assert main.check_release(version='2024.101.1') is True
+    assert main.check_release(version='2024.101.2') is False
+    assert [method for method, _, _ in fake_github_api.requests] == ['HEAD', 'HEAD']
+
+
+def test_check_release_release_index(fake_github_api, tmp_path):
+    for tag_name in ('v2024.101.1', 'v2024.101.2', 'v2024.101.3'):
+        fake_github_api.add_release(tag_name=tag_name)
+
+    env = dict(INPUT_API_CACHE_DIR=str(tmp_path), INPUT_RELEASE_INDEX='true')
+    with patch.dict(os.environ, env), patch('action.main.RELEASE_INDEX_PAGE_SIZE', 2):
+        with patch.dict(main.RELEASE_INDEX, clear=True):
+            assert main.check_release(version='2024.101.1') is True
+            assert main.check_release(version='2024.101.4') is False
+        # two pages on the first run, answered from memory afterward
+        assert [path for _, path, _ in fake_github_api.requests] == [f'/repos/{main.get_repository()}/releases'] * 2
+
+        fake_github_api.requests.clear()
+        fake_github_api.add_release(tag_name='v2024.101.4')
+        with patch.dict(main.RELEASE_INDEX, clear=True):
+            assert main.check_release(version='2024.101.4') is True
+            assert main.check_release(version='2024.101.1') is True
+        # the newest page reaches an indexed tag, so the older pages are not fetched again
+        assert len(fake_github_api.requests) == 1
+
+    assert main.read_release_index(cache_dir=str(tmp_path), repository=main.get_repository()) == [
+        'v2024.101.4', 'v2024.101.3', 'v2024.101.2', 'v2024.101.1']
+
+
+def test_get_release_index_error(fake_github_api):
+    with patch.dict(main.RELEASE_INDEX, clear=True):
+        assert main.get_release_index(repository='octo/missing') is None
+        assert 'octo/missing' not in main.RELEASE_INDEX
+
+
+def test_get_latest_release_tag_fake_api_server_errors(fake_github_api):
+    fake_github_api.add_release(tag_name='v2024.101.1')
+    fake_github_api.server_errors = 2
+
+    with patch('action.main.time.sleep'):
+        assert main.get_latest_release_tag() == 'v2024.101.1'
+    assert len(fake_github_api.requests) == 3
+
+
+def test_get_latest_release_tag_fake_api_large_release(fake_github_api, tmp_path):
+    fake_github_api.add_release(tag_name='v2024.101.1', author=dict(login='octocat'))
+    fake_github_api.release_assets = 5000
+
+    with patch.dict(os.environ, INPUT_API_CACHE_DIR=str(tmp_path)):
+        assert main.get_latest_release_tag() == 'v2024.101.1'
+        assert main.get_latest_release_tag() == 'v2024.101.1'
+
+    assert 'If-None-Match' in fake_github_api.requests[1][2]
+    # only the tag name is cached
+    cache_files = list(tmp_path.iterdir())
+    assert len(cache_files) == 1
+    assert cache_files[0].stat().st_size < 1024
+
+
+def test_get_latest_release_tag_fake_api_rate_limit(fake_github_api):
+    fake_github_api.add_release(tag_name='v2024.101.1')
+    fake_github_api.rate_limit_remaining = main.RATE_LIMIT_RESERVE
+
+    with patch.dict(main.RATE_LIMIT):
+        assert main.get_repo_squash_and_merge_required() is True
+        assert main.RATE_LIMIT['remaining'] == main.RATE_LIMIT_RESERVE - 1
+
+        # the budget is nearly used up, so the latest release is not requested
+        assert main.get_latest_release_tag() == ''
+    assert len(fake_github_api.requests) == 1
+
+
+def test_github_api_request_cache_fake_api(fake_github_api, tmp_path):
+    fake_github_api.rate_limit_remaining = 100
+
+    with patch.dict(os.environ, INPUT_API_CACHE_DIR=str(tmp_path)), patch.dict(main.RATE_LIMIT):
+        assert main.get_repo_squash_and_merge_required() is True
+        assert main.get_repo_squash_and_merge_required() is True
+
+    assert 'If-None-Match' in fake_github_api.requests[1][2]
+    assert fake_github_api.rate_limit_remaining == 99
+
+
+def streamed_response(content: bytes) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = io.BytesIO(content)
+    return response
+
+
+@pytest.mark.parametrize('document, fields, expected_values', [
+    (dict(url='u', author=dict(login='octocat'), tag_name='v1 "x"', body='"tag_name": "nope"'),
+     ('tag_name',), dict(tag_name='v1 "x"')),
+    (dict(id=1234567890, tag_name='v1', draft=False), ('id', 'draft'), dict(id=1234567890, draft=False)),
+    (dict(tag_name='v' * 100), ('tag_name',), dict(tag_name='v' * 100)),
+    (dict(tag_name='v1'), ('name',), dict()),
+    ([], ('tag_name',), dict()),
+])
+def test_read_json_fields(document, fields, expected_values):
+    response = streamed_response(content=json.dumps(document).encode('utf-8'))
+    with patch('action.main.PROBE_CHUNK_SIZE', 7), patch('action.main.PROBE_OVERLAP', 16):
+        assert main.read_json_fields(response=response, fields=fields) == expected_values
+    # small responses are read to the end
+    assert response.raw.read() == b''
+
+
+def test_read_json_fields_large_response():
+    content = json.dumps(dict(tag_name='v1', assets=['a' * 100] * 10_000)).encode('utf-8')
+    response = streamed_response(content=content)
+
+    assert main.read_json_fields(response=response, fields=('tag_name',)) == dict(tag_name='v1')
+    assert response.raw.tell() < main.PROBE_CHUNK_SIZE + main.PROBE_DRAIN_SIZE * 2
+
+
+def test_batch_main(fake_github_api, tmp_path):
+    fake_github_api.repositories.update({'octo/one', 'octo/two', 'octo/three'})
+    fake_github_api.add_release(tag_name='v2024.101.1')
+    fake_github_api.release_notes_body = '## What\'s Changed\n* foo by @octocat in https://github.com/o/r/pull/1\n'
+    fake_github_api.commits['abc123'] = '2024-06-13T20:55:03Z'
+
+    batch = [
+        dict(repository='octo/one', sha='def456', event=dict(commits=[dict(timestamp='2024-07-14T13:17:25-04:00')])),
+        dict(repository='octo/two', sha='abc123'),
+        dict(repository='octo/unknown', sha='abc123'),
+        dict(repository='octo/three', sha='abc123', event_path=os.path.join(
+            os.path.dirname(__file__), '..', 'data', 'dummy_github_push_event_invalid_commits.json')),
+        dict(repository='octo/four', sha='abc123', event_path=str(tmp_path / 'missing.json')),
+    ]
+    batch_path = tmp_path / 'batch.json'
+    batch_path.write_text(json.dumps(batch))
+    output_dir = tmp_path / 'results'
+
+    main.cli(['batch', str(batch_path), '--output-dir', str(output_dir), '--max-workers', '2'])
+
+    with open(output_dir / 'octo__one.json', 'r') as f:
+        result = json.load(f)
+    assert result['outputs']['release_version'] == '2024.714.171725'
+    assert result['outputs']['release_commit'] == 'def456'
+
+    with open(output_dir / 'octo__three.json', 'r') as f:
+        assert json.load(f) == {'repository': 'octo/three', 'error': 'exit code 3'}
+
+    with open(output_dir / 'octo__two.json', 'r') as f:
+        result = json.load(f)
+    assert result['outputs']['release_version'] == '2024.613.205503'
+    assert result['outputs']['release_commit'] == 'abc123'
+    assert '[@octocat](https://github.com/octocat)' in result['outputs']['release_body']
+
+    with open(output_dir / 'octo__unknown.json', 'r') as f:
+        assert 'ValueError' in json.load(f)['error']
+
+    # a missing event file is the error of its entry only
+    with open(output_dir / 'octo__four.json', 'r') as f:
+        assert json.load(f)['error'].startswith('FileNotFoundError: ')
+
+
+def test_compute_batch_entry(fake_github_api):
+    fake_github_api.repositories.add('octo/one')
+
+    with patch('action.main.TRACE', []) as global_trace:
+        result = main.compute_batch_entry(entry=dict(
+            repository='octo/one',
+            sha='def456',
+            event=dict(commits=[dict(timestamp='2024-07-14T13:17:25-04:00')]),
+        ))
+    # the spans are recorded to the run of the entry
+    assert global_trace == []
+
+    assert result['repository'] == 'octo/one'
+    assert result['outputs']['release_version'] == '2024.714.171725'
+    assert result['outputs']['release_commit'] == 'def456'
+    assert result['outputs']['release_generate_release_notes'] == 'true'
+
+
+def test_compute_batch_entry_commit(fake_github_api):
+    fake_github_api.repositories.add('octo/one')
+    event = dict(commits=[dict(timestamp='2024-07-14T13:17:25-04:00')])
+    env = {key: value for key, value in os.environ.items() if key != 'GITHUB_SHA'}
+
+    with patch.dict(os.environ, env, clear=True):
+        result = main.compute_batch_entry(entry=dict(repository='octo/one', event=dict(event, after='push-sha')))
+        assert result['outputs']['release_commit'] == 'push-sha'
+
+        result = main.compute_batch_entry(entry=dict(repository='octo/one', event=event))
+        assert result == dict(
+            repository='octo/one', error='ValueError: the entry has no sha, and its event has no after SHA')
+
+    # the requests were sent by the planner of the repository
+    assert all(path.startswith('/repos/octo/one') for _, path, _ in fake_github_api.requests)
+
+
+def test_import_without_environment():
+    env = {key: value for key, value in os.environ.items() if not key.startswith(('GITHUB_', 'INPUT_'))}
+    result = subprocess.run(
+        [sys.executable, '-c', 'from action import main'],
+        cwd=main.ROOT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_release_planner(fake_github_api):
+    fake_github_api.repositories.add('octo/one')
+    fake_github_api.add_release(tag_name='release-2024.101.1')
+    fake_github_api.release_notes_body = '## What\'s Changed\n* foo by @octocat in https://github.com/o/r/pull/1\n'
+    fake_github_api.rate_limit_remaining = 100
+    event = dict(after='def456', commits=[dict(timestamp='2024-07-14T13:17:25-04:00')])
+
+    trace = []
+    with patch.dict(main.RATE_LIMIT), patch('action.main.TRACE', []) as global_trace, \
+            main.ReleasePlanner(repository='octo/one', token='abc', tag_prefix='release-', dotnet=True,
+                                api_url=fake_github_api.url) as planner:
+        job_outputs = planner.plan(github_event=event, trace=trace)
+        assert planner.plan(github_event=event) == job_outputs
+
+        assert planner.rate_limit['remaining'] < 100
+        assert main.RATE_LIMIT['remaining'] is None
+    assert global_trace == []
+
+    assert job_outputs['publish_release'] == 'true'
+    assert job_outputs['release_commit'] == 'def456'
+    assert job_outputs['release_tag'] == 'release-2024.714.1717.25'
+    assert '[#1](https://github.com/o/r/pull/1)' in job_outputs['release_body']
+    assert any(span['name'] == 'api' for span in trace)
+    assert all(path.startswith('/repos/octo/one') for _, path, _ in fake_github_api.requests)
+    assert all(headers['Authorization'] == 'token abc' for _, _, headers in fake_github_api.requests)
+
+
+def test_release_planner_time_budget(fake_github_api):
+    fake_github_api.add_release(tag_name='v2024.101.1')
+    event = dict(after='def456', commits=[dict(timestamp='2024-07-14T13:17:25-04:00')])
+
+    with patch('action.main.generate_release_body', side_effect=main.APITimeBudgetExceeded()), \
+            main.ReleasePlanner(repository=fake_github_api.repository, api_url=fake_github_api.url) as planner:
+        job_outputs = planner.plan(github_event=event)
+
+    assert job_outputs['publish_release'] == 'true'
+    assert job_outputs['release_body'] == ''
+    assert job_outputs['release_generate_release_notes'] == 'true'
+
+
+def test_release_planner_concurrent(fake_github_api):
+    fake_github_api.repositories.update({'octo/one', 'octo/two'})
+    fake_github_api.add_release(tag_name='v2024.101.1')
+    fake_github_api.latency = 0.05
+    event = dict(after='def456', commits=[dict(timestamp='2024-07-14T13:17:25-04:00')])
+
+    planners = [
+        main.ReleasePlanner(repository='octo/one', tag_prefix='one-', api_url=fake_github_api.url),
+        main.ReleasePlanner(repository='octo/two', tag_prefix='two-', api_url=fake_github_api.url),
+    ]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(planner.plan, github_event=event) for planner in planners * 2]
+        results = [future.result() for future in futures]
+
+    assert [job_outputs['release_tag'] for job_outputs in results] == [
+        'one-2024.714.171725', 'two-2024.714.171725', 'one-2024.714.171725', 'two-2024.714.171725']
+
+
+@pytest.mark.parametrize('file_name', ['run.jsonl', 'run.jsonl.gz'])
+def test_main_function_cassette(
+        file_name,
+        dummy_github_push_event_path,
+        fake_github_api,
+        github_output_file,
+        github_step_summary_file,
+        release_notes_sample,
+        tmp_path,
+):
+    fake_github_api.add_release(tag_name='v2024.101.1')
+    fake_github_api.release_notes_body = release_notes_sample[0]
+    cassette = str(tmp_path / file_name)
+
+    env = dict(INPUT_API_CASSETTE=cassette, INPUT_API_CASSETTE_MODE='record', INPUT_GITHUB_TOKEN='abc')
+    with patch.dict(os.environ, env):
+        recorded_outputs = main.main()
+    exchanges = main.read_cassette(path=cassette)
+    # concurrent requests are recorded in the order they complete
+    assert sorted((exchange['method'], urlsplit(exchange['url']).path) for exchange in exchanges) == sorted(
+        (method, path) for method, path, _ in fake_github_api.requests)
+    assert not any('Authorization' in exchange['request_headers'] for exchange in exchanges)
+    assert main.SESSION.get_adapter(fake_github_api.url).__class__ is requests.adapters.HTTPAdapter
+
+    # the API is down, so the outputs can only come from the cassette
+    fake_github_api.server_errors = 100
+    request_count = len(fake_github_api.requests)
+    with patch.dict(os.environ, INPUT_API_CASSETTE=cassette, INPUT_API_CASSETTE_MODE='replay'):
+        assert main.main() == recorded_outputs
+    assert len(fake_github_api.requests) == request_count
+
+
+def test_use_cassette_replay_timed(tmp_path):
+    cassette = str(tmp_path / 'run.jsonl')
+    main.write_cassette(path=cassette, exchanges=[
+        dict(method='GET', url='https://example.com/a', request_headers={}, request_body=None, status=200,
+             headers={'Content-Type': 'application/json'}, body='{"a": 1}', elapsed=0.2),
+        dict(method='GET', url='https://example.com/a', request_headers={}, request_body=None, status=200,
+             headers={'Content-Type': 'application/json'}, body='{"a": 2}', elapsed=0.2),
+    ])
+    session = main.create_session(token='abc')
+
+    with main.use_cassette(session=session, path=cassette, mode='replay'):
+        start = time.perf_counter()
+        assert session.get('https://example.com/a').json() == {'a': 1}
+        assert time.perf_counter() - start < 0.2
+        assert session.get('https://example.com/a').json() == {'a': 2}
+        # the last exchange is repeated
+        assert session.get('https://example.com/a').json() == {'a': 2}
+        with pytest.raises(requests.exceptions.ConnectionError):
+            session.get('https://example.com/b')
+
+    with main.use_cassette(session=session, path=cassette, mode='replay_timed'):
+        start = time.perf_counter()
+        assert session.get('https://example.com/a').json() == {'a': 1}
+        assert time.perf_counter() - start >= 0.2
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            session.get('https://example.com/a', timeout=0.05)
+
+
+def test_use_cassette_errors(tmp_path):
+    session = main.create_session()
+    with main.use_cassette(session=session, path='') as adapter:
+        assert adapter is None
+
+    with pytest.raises(ValueError):
+        with main.use_cassette(session=session, path=str(tmp_path / 'run.jsonl'), mode='rewind'):
+            pass
+
+    # a failed recording leaves no cassette
+    with pytest.raises(RuntimeError):
+        with main.use_cassette(session=session, path=str(tmp_path / 'run.jsonl'), mode='record'):
+            raise RuntimeError()
+    assert not (tmp_path / 'run.jsonl').exists()
+
+
+def post_webhook(server, payload, event_name='push', secret='') -> requests.Response:
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+    headers = {'X-GitHub-Event': event_name}
+    if secret:
+        headers['X-Hub-Signature-256'] = 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    host, port = server.server_address[:2]
+    return requests.post(f'http://{host}:{port}/', data=body, headers=headers)
+
+
+def test_webhook_server_push(webhook_server, fake_github_api):
+    fake_github_api.add_release(tag_name='v2024.101.1')
+    fake_github_api.release_notes_body = '## What\'s Changed\n* foo by @octocat in https://github.com/o/r/pull/1\n'
+    payload = dict(
+        after='def456',
+        commits=[dict(timestamp='2024-07-14T13:17:25-04:00')],
+        repository=dict(full_name=fake_github_api.repository, default_branch='master'),
+    )
+
+    responses = [post_webhook(server=webhook_server, payload=payload) for _ in range(2)]
+
+    assert [response.status_code for response in responses] == [200, 200]
+    outputs = responses[0].json()['outputs']
+    assert outputs['publish_release'] == 'true'
+    assert outputs['release_commit'] == 'def456'
+    assert outputs['release_tag'] == 'v2024.714.171725'
+    assert '[#1](https://github.com/o/r/pull/1)' in outputs['release_body']
+    assert responses[1].json()['outputs'] == outputs
+    assert list(webhook_server.planners) == [fake_github_api.repository]
+
+
+def test_webhook_server_pull_request(webhook_server, fake_github_api):
+    payload = dict(
+        pull_request=dict(head=dict(sha='abc123')),
+        repository=dict(full_name=fake_github_api.repository),
+    )
+
+    response = post_webhook(server=webhook_server, payload=payload, event_name='pull_request')
+
+    assert response.status_code == 200
+    assert response.json()['outputs']['publish_release'] == 'false'
+    assert response.json()['outputs']['release_commit'] == 'abc123'
+
+
+@pytest.mark.parametrize('payload, event_name, expected_status', [
+    (b'not json', 'push', 400),
+    (dict(commits=[]), 'push', 400),
+    (dict(repository=dict(full_name='octo/repo')), 'issues', 400),
+    (dict(zen='Keep it logically awesome.'), 'ping', 200),
+    (dict(after='abc', commits=[], repository=dict(full_name='octo/repo')), 'push', 422),
+])
+def test_webhook_server_errors(webhook_server, payload, event_name, expected_status):
+    response = post_webhook(server=webhook_server, payload=payload, event_name=event_name)
+
+    assert response.status_code == expected_status
+    if expected_status != 200:
+        assert response.json()['error']
+
+
+def test_webhook_server_signature(webhook_server, fake_github_api):
+    webhook_server.secret = 's3cret'
+    payload = dict(pull_request=dict(head=dict(sha='abc123')), repository=dict(full_name=fake_github_api.repository))
+
+    assert post_webhook(server=webhook_server, payload=payload, event_name='pull_request').status_code == 401
+    assert post_webhook(
+        server=webhook_server, payload=payload, event_name='pull_request', secret='wrong').status_code == 401
+    assert post_webhook(
+        server=webhook_server, payload=payload, event_name='pull_request', secret='s3cret').status_code == 200
+
+
+def test_webhook_server_concurrent(webhook_server, fake_github_api):
+    payload = dict(pull_request=dict(head=dict(sha='abc123')), repository=dict(full_name=fake_github_api.repository))
+    in_flight = []
+    max_in_flight = []
+    plan = main.ReleasePlanner.plan
+
+    def slow_plan(self, **kwargs):
+        in_flight.append(None)
+        max_in_flight.append(len(in_flight))
+        time.sleep(0.1)
+        in_flight.pop()
+        return plan(self, **kwargs)
+
+    with patch('action.main.ReleasePlanner.plan', slow_plan), \
+            concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(post_webhook, server=webhook_server, payload=payload, event_name='pull_request')
+                   for _ in range(4)]
+        statuses = [future.result().status_code for future in futures]
+
+    assert statuses == [200] * 4
+    # the fixture allows 2 workers
+    assert max(max_in_flight) == 2
+
+
+def test_trace_span():
+    with patch('action.main.TRACE', []) as trace:
+        with main.trace_span(name='foo', bar=1) as span:
+            span['status'] = 200
+
+    assert len(trace) == 1
+    assert trace[0]['name'] == 'foo'
+    assert trace[0]['bar'] == 1
+    assert trace[0]['status'] == 200
+    assert trace[0]['duration'] >= 0
+
+
+def test_trace_span_outside_run():
+    assert main.TRACE.maxlen == main.TRACE_MAX_SPANS
+
+    with patch('action.main.TRACE', collections.deque(maxlen=2)) as trace:
+        for i in range(3):
+            with main.trace_span(name=f'span{i}'):
+                pass
+
+    assert [span['name'] for span in trace] == ['span1', 'span2']
+
+
+def test_format_trace_summary():
+    summary = main.format_trace_summary(spans=[
+        dict(name='process_release_body', start=2, duration=0.0015),
+        dict(name='api', start=1, duration=0.25, method='GET', endpoint='/repos/foo/bar', status=200, bytes=512,
+             rate_limit_remaining=4999),
+    ])
+
+    lines = summary.split('\n')
+    assert lines[4] == '| GET /repos/foo/bar | 200 | 250.0 | 512 | 4999 |'
+    assert lines[5] == '| process_release_body |  | 1.5 |  |  |'
+
+
+def test_main_function_trace(
+        dummy_github_push_event_path,
+        fake_github_api,
+        github_output_file,
+        github_step_summary_file,
+        tmp_path,
+):
+    fake_github_api.add_release(tag_name='v2024.101.1')
+    trace_file = tmp_path / 'trace.json'
+
+    with patch.dict(os.environ, INPUT_TRACE_FILE=str(trace_file)):
+        main.main()
+
+    with open(trace_file, 'r') as f:
+        spans = json.load(f)['spans']
+    api_spans = [span for span in spans if span['name'] == 'api']
+    assert {span['endpoint'] for span in api_spans} == {
+        f'/repos/{os.environ["GITHUB_REPOSITORY"]}',
+        f'/repos/{os.environ["GITHUB_REPOSITORY"]}/releases/latest',
+        f'/repos/{os.environ["GITHUB_REPOSITORY"]}/releases/generate-notes',
+    }
+    assert all(span['status'] == 200 and span['bytes'] for span in api_spans)
+    assert {'compute_job_outputs', 'get_push_event_details', 'generate_release_body', 'process_release_body'} <= {
+        span['name'] for span in spans}
+
+    with open(github_step_summary_file, 'r') as f:
+        summary = f.read()
+    assert '<details><summary>Timing</summary>' in summary
+    assert f'| POST /repos/{os.environ["GITHUB_REPOSITORY"]}/releases/generate-notes | 200 |' in summary
+
+
+@pytest.mark.parametrize('profile, expected_sections', [
+    ('cpu', ['CPU profile']),
+    ('memory', ['Memory profile']),
+    ('both', ['CPU profile', 'Memory profile']),
+])
+def test_main_function_profile(
+        profile,
+        expected_sections,
+        dummy_github_push_event_path,
+        fake_github_api,
+        github_output_file,
+        github_step_summary_file,
+        release_notes_sample,
+        tmp_path,
+):
+    fake_github_api.add_release(tag_name='v2024.101.1')
+    fake_github_api.release_notes_body = release_notes_sample[0]
+    profile_file = tmp_path / 'profile.md'
+
+    with patch.dict(os.environ, INPUT_PROFILE=profile, INPUT_PROFILE_FILE=str(profile_file)):
+        job_outputs = main.main()
+    assert job_outputs['release_body'] == release_notes_sample[1]
+    assert not main.tracemalloc.is_tracing()
+
+    report = profile_file.read_text()
+    assert [section for section in ('CPU profile', 'Memory profile') if section in report] == expected_sections
+    if 'CPU profile' in expected_sections:
+        hotspots = report.split('<summary>CPU profile</summary>')[1].split('</details>')[0]
+        assert hotspots.count('\n| ') == main.PROFILE_TOP + 1
+    if 'Memory profile' in expected_sections:
+        assert 'Largest allocations in use at the end of `' in report
+    with open(github_step_summary_file, 'r') as f:
+        assert report in f.read()
+
+
+def test_profile_run_threads():
+    def profiled_worker():
+        return sum(range(1000))
+
+    with main.profile_run(modes={'cpu'}) as profile:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [main.submit_in_context(executor, profiled_worker) for _ in range(4)]
+            assert [future.result() for future in futures] == [499500] * 4
+
+    calls = [stat[1] for (_, _, name), stat in profile['cpu_stats'].stats.items() if name == 'profiled_worker']
+    assert calls == [4]
+
+
+def test_profile_run_disabled():
+    with main.profile_run(modes=set()) as profile:
+        assert main.ACTIVE_PROFILE.get() is None
+    assert main.format_profile_report(profile=profile) == ''